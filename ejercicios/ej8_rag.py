@@ -1,140 +1,246 @@
 # ejercicios/ej8_rag.py
-import math
-import re
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Tuple
+from typing import Any, Callable, Dict, Iterator, List, Sequence, Tuple
 
-try:
-    from pypdf import PdfReader  # pip install pypdf
-except ImportError:  # mensaje más amigable si falta
-    PdfReader = None  # type: ignore
+import numpy as np
 
-from .llm_utils import call_llm, embed_text
+from .llm_tokens import estimar_tokens
+from .llm_utils import EmbeddingBackend, call_llm, get_embedding_backend
+from .rag_bm25 import IndiceBM25, vectores_terminos
+from .rag_cache import cache_embeddings, cache_respuestas
+from .rag_chunks import Fragmentos
+from .rag_contexto import empaquetar_contexto
+from .rag_corpus import DOCS_DIR, sincronizar_corpus
+from .rag_index import (
+    cargar_indice,
+    cargar_lexico,
+    clave_indice,
+    guardar_indice,
+    guardar_lexico,
+    hash_archivo,
+)
+from .rag_pipeline import ingerir_pdf
+from .rag_retrieval import buscar_hibrido, crear_indice, fusion_rrf, normalizar, seleccionar_mmr
 
+# Parámetros de troceado del ejercicio (forman parte de la clave del índice)
+_CHUNK_SIZE = 220
+_CHUNK_OVERLAP = 50
+_CHUNK_ORACIONES = os.getenv("RAG_CHUNK_ORACIONES", "0") == "1"
+
+# Quitar encabezados/pies repetidos y chunks duplicados antes de embeber
+_LIMPIEZA = os.getenv("RAG_LIMPIEZA", "1") == "1"
+_DEDUP_UMBRAL = float(os.getenv("RAG_DEDUP_UMBRAL", "0.9"))
+
+# Candidatos que se recuperan para llenar el presupuesto de tokens del contexto
+_MAX_FRAGMENTOS = int(os.getenv("RAG_MAX_FRAGMENTOS", "8"))
+# Candidatos de la búsqueda híbrida entre los que MMR elige los fragmentos (sin repetidos)
+_MMR_CANDIDATOS = int(os.getenv("RAG_MMR_CANDIDATOS", "20"))
+
+# Llamadas simultáneas al LLM en run_ej8_batch
+_BATCH_CONCURRENCIA = int(os.getenv("RAG_BATCH_CONCURRENCIA", "4"))
+
+# Backend de embeddings del índice y respaldo local (sin red) para cuando el principal falla
+# (por ejemplo, sin cuota). Cada backend tiene su propio índice: los vectores no se mezclan.
+_EMBED_BACKEND = os.getenv("RAG_EMBED_BACKEND") or None
+_EMBED_RESPALDO = os.getenv("RAG_EMBED_RESPALDO", "local")
+
+# Embeber durante la ingesta (en flujo, solapado con la extracción) o al primer uso
+_INGESTA_EMBEBER = os.getenv("RAG_INGESTA_EMBEBER", "1") == "1"
+
+# Progreso de la última ingesta: {"pdf", "etapas": {etapa: estadísticas}} (se actualiza en vivo)
+ultima_ingesta: Dict[str, Any] = {}
+
+# Resumen del último contexto enviado al LLM (fragmentos, tokens del contexto y del prompt)
+ultimo_contexto: Dict[str, Any] = {}
+
+# Índices de búsqueda ya construidos en este proceso (clave del documento -> índice)
+_INDICES_DENSOS: Dict[str, Any] = {}
+_INDICES_LEXICOS: Dict[str, IndiceBM25] = {}
+
+# Documentos ya preparados en este proceso: (ruta, backend) -> ((mtime_ns, tamaño), índice).
+# Evita re-hashear el PDF y releer el índice del disco en cada pregunta.
+_DOCUMENTOS: Dict[Tuple[str, str], Tuple[Tuple[int, int], Dict[str, Any]]] = {}
+
+
+def _backends() -> List[EmbeddingBackend]:
+    """
+    Backends de embeddings en orden de preferencia (principal y, si es otro, el de respaldo).
+    """
+    principal = get_embedding_backend(_EMBED_BACKEND)
+    if not _EMBED_RESPALDO:
+        return [principal]
+    respaldo = get_embedding_backend(_EMBED_RESPALDO)
+    return [principal] if respaldo.nombre == principal.nombre else [principal, respaldo]
 
-def _cargar_texto_pdf(pdf_path: str) -> str:
-    if PdfReader is None:
-        raise RuntimeError(
-            "Para usar el ejercicio 8 necesitas instalar 'pypdf':\n"
-            "    pip install pypdf"
-        )
-    p = Path(pdf_path)
-    if not p.exists():
-        raise FileNotFoundError(f"No se encontró el PDF: {pdf_path}")
 
-    reader = PdfReader(str(p))
-    textos: List[str] = []
-    for page in reader.pages:
+def _indice_lexico(clave: str, chunks: Sequence[str]) -> IndiceBM25:
+    """
+    Índice BM25 del documento: se construye una vez, se guarda junto al de
+    embeddings y queda en memoria del proceso.
+    """
+    bm25 = _INDICES_LEXICOS.get(clave)
+    if bm25 is not None:
+        return bm25
+    data = cargar_lexico(clave)
+    if data is not None:
         try:
-            txt = page.extract_text() or ""
+            bm25 = IndiceBM25.desde_dict(data)
         except Exception:
-            txt = ""
-        if txt:
-            textos.append(txt)
-    return "\n".join(textos)
+            bm25 = None
+    if bm25 is None:
+        bm25 = IndiceBM25.construir(chunks)
+        guardar_lexico(clave, bm25.a_dict())
+    _INDICES_LEXICOS[clave] = bm25
+    return bm25
 
 
-def _chunk_text(text: str, chunk_size: int = 900, overlap: int = 200) -> List[str]:
+def _preparar_documento(
+    pdf_path: str,
+    pdf_hash: str | None = None,
+    backend: EmbeddingBackend | None = None,
+) -> Dict[str, Any]:
     """
-    Divide un texto largo en chunks solapados.
+    Índice del documento: {"clave", "pdf_hash", "meta", "chunks", "vectores", "backend"}
+    ("vectores" es la matriz normalizada abierta con mmap desde el disco).
+    Si ya existe para este PDF + troceado + backend de embeddings se lee del
+    disco; si no, se ingiere en flujo (ver rag_pipeline.ingerir_pdf) y se
+    guardan los chunks, los vectores y el índice BM25. "vectores" queda en
+    None si los embeddings fallaron o RAG_INGESTA_EMBEBER=0: se calculan al primer uso.
+    Mientras el archivo no cambie (misma fecha y tamaño) se reusa el índice
+    ya preparado en este proceso.
     """
-    text = text.replace("\r", " ")
-    words = text.split()
-    chunks: List[str] = []
-    start = 0
-    n = len(words)
+    ruta = Path(pdf_path)
+    if not ruta.exists():
+        raise FileNotFoundError(f"No se encontró el PDF: {pdf_path}")
 
-    while start < n:
-        end = min(n, start + chunk_size)
-        chunk = " ".join(words[start:end])
-        chunks.append(chunk)
-        if end == n:
-            break
-        start = max(0, end - overlap)
+    principal = _backends()[0]
+    backend = backend or principal
+    st = ruta.stat()
+    firma = (st.st_mtime_ns, st.st_size)
+    memo = (str(ruta.resolve()), backend.nombre)
+    previo = _DOCUMENTOS.get(memo)
+    if previo is not None and previo[0] == firma:
+        return previo[1]
 
-    return chunks
+    pdf_hash = pdf_hash or hash_archivo(pdf_path)
+    clave = clave_indice(pdf_hash, _CHUNK_SIZE, _CHUNK_OVERLAP, backend.nombre, _CHUNK_ORACIONES, _LIMPIEZA)
+    indice = cargar_indice(clave)
+    if indice is not None and indice["meta"].get("embed_backend") != backend.nombre:
+        indice = None
 
+    if indice is None:
+        # Extraer → limpiar → trocear → deduplicar → embeber, todo en flujo
+        nombre = Path(pdf_path).name
+        ultima_ingesta.clear()
+        ultima_ingesta.update({"pdf": nombre, "etapas": {}})
+        ingesta = ingerir_pdf(
+            pdf_path,
+            pdf_hash,
+            _CHUNK_SIZE,
+            _CHUNK_OVERLAP,
+            _CHUNK_ORACIONES,
+            _LIMPIEZA,
+            _DEDUP_UMBRAL,
+            embeber=backend.embed_texts if _INGESTA_EMBEBER else None,
+            progreso=lambda etapas: ultima_ingesta.update({"pdf": nombre, "etapas": etapas}),
+        )
+        chunks = ingesta["chunks"]
+        indice = {
+            "meta": {
+                "pdf": nombre,
+                "chunk_size": _CHUNK_SIZE,
+                "overlap": _CHUNK_OVERLAP,
+                "oraciones": _CHUNK_ORACIONES,
+                "embed_backend": backend.nombre,
+                "limpieza": ingesta["limpieza"],
+                "ingesta": ingesta["etapas"],
+            },
+            "chunks": chunks,
+            "vectores": None,
+        }
+        if len(chunks):
+            indice["clave"] = clave
+            # Si los embeddings fallaron en la ingesta, se reintentan al primer uso
+            _guardar_vectores(indice, ingesta["vectores"])
+            if backend is principal:
+                # El índice lexical se deja listo desde ya: es el que se usa sin cuota de embeddings
+                _indice_lexico(clave, chunks)
 
-def _cosine_similarity(a: List[float], b: List[float]) -> float:
-    if not a or not b or len(a) != len(b):
-        return 0.0
-    dot = sum(x * y for x, y in zip(a, b))
-    na = math.sqrt(sum(x * x for x in a))
-    nb = math.sqrt(sum(y * y for y in b))
-    if na == 0.0 or nb == 0.0:
-        return 0.0
-    return dot / (na * nb)
+    indice["clave"] = clave
+    indice["pdf_hash"] = pdf_hash
+    indice["backend"] = backend
+    _DOCUMENTOS[memo] = (firma, indice)
+    return indice
 
 
-def _lexical_score(question: str, chunk: str) -> float:
+def _guardar_vectores(indice: Dict[str, Any], vectores: np.ndarray | None) -> None:
     """
-    Puntaje simple por coincidencia de palabras clave
-    (fallback cuando los embeddings no están disponibles).
+    Guarda el índice del documento (con los vectores, si los hay) y deja en
+    "vectores" la matriz abierta con mmap desde disco; si no se pudo guardar,
+    queda en memoria.
     """
-    def norm(t: str) -> List[str]:
-        t = t.lower()
-        t = re.sub(r"[^a-záéíóúñ0-9]+", " ", t)
-        return t.split()
-
-    q_tokens = set(norm(question))
-    c_tokens = set(norm(chunk))
-    if not q_tokens or not c_tokens:
-        return 0.0
-    inter = len(q_tokens & c_tokens)
-    return inter / (len(q_tokens) + 1e-6)
+    guardar_indice(indice["clave"], indice["chunks"], vectores, indice["meta"])
+    if vectores is None:
+        return
+    guardado = cargar_indice(indice["clave"])
+    if guardado is not None and guardado["vectores"] is not None:
+        indice["vectores"] = guardado["vectores"]
+    else:
+        indice["vectores"] = normalizar(vectores)
 
 
-def run_ej8(pregunta: str, pdf_path: str) -> str:
+def _embeber_documentos(indices: List[Dict[str, Any]]) -> None:
     """
-    Ejercicio 8: RAG sobre un PDF.
-    - Intenta usar embeddings para buscar los fragmentos relevantes.
-    - Si falla (por ejemplo, error de cuota 429), hace búsqueda por palabras clave.
+    Calcula (y guarda) los vectores de los documentos que aún no los tienen,
+    todos en una sola llamada por lotes al backend de embeddings de los índices.
     """
-    pregunta = (pregunta or "").strip()
-    if not pregunta:
-        return "No se recibió ninguna pregunta."
+    faltan = [ind for ind in indices if ind["vectores"] is None]
+    if not faltan:
+        return
+    backend: EmbeddingBackend = faltan[0]["backend"]
+    if any(ind["backend"].nombre != backend.nombre for ind in faltan):
+        raise RuntimeError("No se pueden embeber juntos índices de backends de embeddings distintos.")
+    vectores = backend.embed_texts([ch for ind in faltan for ch in ind["chunks"]])
+    pos = 0
+    for ind in faltan:
+        n = len(ind["chunks"])
+        _guardar_vectores(ind, vectores[pos:pos + n])
+        pos += n
 
-    texto_pdf = _cargar_texto_pdf(pdf_path)
-    if not texto_pdf.strip():
-        return "No se pudo extraer texto del PDF."
 
-    chunks = _chunk_text(texto_pdf, chunk_size=220, overlap=50)
-    if not chunks:
-        return "No se pudieron generar fragmentos de texto para el PDF."
+def _embeber_documento(indice: Dict[str, Any]) -> np.ndarray:
+    """
+    Vectores (normalizados) de los chunks del documento; sólo se calculan la primera vez.
+    """
+    _embeber_documentos([indice])
+    return indice["vectores"]
 
-    scores: List[Tuple[float, str]] = []
-    uso_embeddings = True
-    error_embeddings = ""
 
-    # 1) Intentar con embeddings
-    try:
-        emb_q = embed_text(pregunta)
-        for ch in chunks:
-            emb_ch = embed_text(ch)
-            score = _cosine_similarity(emb_q, emb_ch)
-            scores.append((score, ch))
-    except Exception as e:
-        # Fallback: búsqueda lexical
-        uso_embeddings = False
-        error_embeddings = str(e)
-        scores = []
-        for ch in chunks:
-            score = _lexical_score(pregunta, ch)
-            scores.append((score, ch))
+def _indice_denso(indice: Dict[str, Any]):
+    """
+    Índice de búsqueda del documento (backend según RAG_BACKEND / RAG_CUANTIZACION).
+    Se construye una vez por proceso: IVF y cuantizado tienen costo de preparación.
+    """
+    clave = indice["clave"]
+    if clave not in _INDICES_DENSOS:
+        _INDICES_DENSOS[clave] = crear_indice(_embeber_documento(indice), normalizado=True)
+    return _INDICES_DENSOS[clave]
 
-    # Si todos los scores son cero, al menos toma los primeros fragmentos
-    scores.sort(key=lambda x: x[0], reverse=True)
-    if not scores or all(s <= 0 for s, _ in scores):
-        top_chunks = chunks[:3]
-    else:
-        top_chunks = [ch for _, ch in scores[:3]]
 
-    contexto = "\n\n---\n\n".join(top_chunks)
+def _armar_prompt(
+    pregunta: str, fragmentos: List[str], uso_embeddings: bool, error_embeddings: str
+) -> Tuple[str, Dict[str, Any]]:
+    # Los fragmentos llegan ordenados por relevancia; se empacan hasta el presupuesto de tokens
+    empaque = empaquetar_contexto(fragmentos)
+    contexto = empaque["contexto"]
 
     nota_fallback = ""
     if not uso_embeddings:
         nota_fallback = (
-            "\n\nNOTA: No se pudieron usar embeddings (probablemente por límite de cuota). "
+            "\n\nNOTA: No se pudieron usar embeddings (por límite de cuota o porque no respondieron a tiempo). "
             "Los fragmentos se seleccionaron por coincidencia de palabras clave."
             f"\nDetalle técnico: {error_embeddings[:200]}"
         )
@@ -153,5 +259,311 @@ Usa exclusivamente la información de estos fragmentos para responder.
 Si la respuesta no está en el documento, dilo claramente.
 Responde en español, de forma clara y breve.
 """
+    empaque["tokens_prompt"] = estimar_tokens(prompt)
+    return prompt, empaque
+
+
+def _responder(pregunta: str, fragmentos: List[str], uso_embeddings: bool, error_embeddings: str) -> str:
+    prompt, empaque = _armar_prompt(pregunta, fragmentos, uso_embeddings, error_embeddings)
+    ultimo_contexto.clear()
+    ultimo_contexto.update(empaque)
+
     respuesta = call_llm(prompt)
     return respuesta
+
+
+def _seleccionar(
+    idx: np.ndarray,
+    scores: np.ndarray,
+    emb_q: np.ndarray | None,
+    total: int,
+    chunk: Callable[[int], str],
+    vectores: Callable[[np.ndarray], np.ndarray],
+    puntajes_lexicos: Callable[[np.ndarray], np.ndarray],
+) -> np.ndarray:
+    """
+    Fragmentos finales entre los candidatos: MMR (relevantes y no redundantes,
+    porque los chunks se solapan). Con embeddings (emb_q de la pregunta) la
+    relevancia es el coseno con la pregunta y se comparan por embeddings; sin
+    ellos, BM25 y vectores de términos. (El puntaje RRF sólo sirve para elegir
+    los candidatos: entre ellos es casi constante.)
+    """
+    # Si todos los scores son cero, al menos toma los primeros fragmentos
+    if not np.any(scores > 0):
+        return np.arange(min(_MAX_FRAGMENTOS, total))
+    idx = np.asarray(idx)
+    if len(idx) <= 1:
+        return idx
+    if emb_q is not None:
+        cand = np.asarray(vectores(idx), dtype=np.float32)
+        relevancia = cand @ normalizar(np.asarray(emb_q, dtype=np.float32).reshape(1, -1))[0]
+    else:
+        cand = vectores_terminos([chunk(i) for i in idx])
+        relevancia = puntajes_lexicos(idx)
+    return idx[seleccionar_mmr(relevancia, cand, _MAX_FRAGMENTOS)]
+
+
+def _rag(
+    pregunta: str,
+    version: str,
+    total: int,
+    backends: List[EmbeddingBackend],
+    buscar_denso: Callable[[EmbeddingBackend, np.ndarray, int], Tuple[np.ndarray, np.ndarray]],
+    buscar_lexico: Callable[[int], Tuple[np.ndarray, np.ndarray]],
+    chunk: Callable[[int], str],
+    cita: Callable[[int], str],
+    vectores: Callable[[EmbeddingBackend, np.ndarray], np.ndarray],
+    puntajes_lexicos: Callable[[np.ndarray], np.ndarray],
+) -> str:
+    """
+    Flujo común del ejercicio 8 sobre un índice (un PDF o el corpus):
+    - el embedding de la pregunta sale de una caché LRU si ya se calculó;
+    - si una pregunta igual o muy parecida ya se respondió sobre la misma
+      versión del índice, se devuelve esa respuesta sin llamar al LLM;
+    - si no, búsqueda híbrida (embeddings + BM25 en paralelo, unidas con RRF);
+      si el backend de embeddings principal falla (p. ej. cuota 429) se prueba
+      el siguiente de `backends`; si ninguno responde a tiempo, queda sólo BM25;
+    - entre los candidatos, MMR elige los fragmentos (ver _seleccionar).
+    """
+    principal = backends[0]
+    emb_q = cache_embeddings.get((principal.nombre, pregunta))
+    if emb_q is not None:
+        previa = cache_respuestas.buscar(f"{version}|{principal.nombre}", emb_q)
+        if previa is not None:
+            return previa
+
+    usado: Dict[str, Any] = {}
+
+    def _denso(n: int):
+        errores: List[str] = []
+        for backend in backends:
+            clave_emb = (backend.nombre, pregunta)
+            emb = emb_q if backend is principal else cache_embeddings.get(clave_emb)
+            try:
+                if emb is None:
+                    emb = backend.embed_text(pregunta)
+                    cache_embeddings.put(clave_emb, emb)
+                resultado = buscar_denso(backend, emb, n)
+            except Exception as e:
+                errores.append(f"{backend.nombre}: {e}")
+                continue
+            usado.update(backend=backend, emb=emb)
+            return resultado
+        raise RuntimeError("; ".join(errores))
+
+    idx, scores, estado = buscar_hibrido(_denso, buscar_lexico, k=max(_MMR_CANDIDATOS, _MAX_FRAGMENTOS))
+    uso_embeddings = estado["denso"] == "ok"
+    error_embeddings = estado["error_denso"]
+
+    backend = usado["backend"] if uso_embeddings else None
+    if backend is not None:
+        version = f"{version}|{backend.nombre}"
+        if emb_q is None or backend is not principal:
+            emb_q = usado["emb"]
+            previa = cache_respuestas.buscar(version, emb_q)
+            if previa is not None:
+                return previa
+
+    idx = _seleccionar(
+        idx,
+        scores,
+        usado["emb"] if uso_embeddings else None,
+        total,
+        chunk,
+        lambda sel: vectores(backend, sel),
+        puntajes_lexicos,
+    )
+    fragmentos = [f"[{cita(i)}]\n{chunk(i)}" for i in idx]
+    respuesta = _responder(pregunta, fragmentos, uso_embeddings, error_embeddings)
+    ultimo_contexto["embeddings"] = backend.nombre if backend is not None else ""
+    if backend is not None:
+        cache_respuestas.guardar(version, emb_q, respuesta)
+    return respuesta
+
+
+def _documento_por_backend(pdf_path: str, indice: Dict[str, Any]) -> Callable[[EmbeddingBackend], Dict[str, Any]]:
+    """
+    Índice del mismo PDF para cada backend de embeddings (se prepara al pedirlo:
+    el texto de las páginas ya está en caché, sólo se trocea y se embebe).
+    """
+    documentos = {indice["backend"].nombre: indice}
+
+    def _doc(backend: EmbeddingBackend) -> Dict[str, Any]:
+        if backend.nombre not in documentos:
+            documentos[backend.nombre] = _preparar_documento(pdf_path, indice["pdf_hash"], backend)
+        return documentos[backend.nombre]
+
+    return _doc
+
+
+def run_ej8(pregunta: str, pdf_path: str) -> str:
+    """
+    Ejercicio 8: RAG sobre un PDF.
+    - Busca los fragmentos relevantes con embeddings y con BM25 a la vez y une ambos rankings.
+    - Si los embeddings fallan (por ejemplo, error de cuota 429), usa los
+      embeddings locales de respaldo (RAG_EMBED_RESPALDO); si tampoco hay o
+      no responden a tiempo, sólo la búsqueda por palabras clave.
+    - Preguntas repetidas (o casi iguales) se responden desde caché.
+    """
+    pregunta = (pregunta or "").strip()
+    if not pregunta:
+        return "No se recibió ninguna pregunta."
+
+    indice = _preparar_documento(pdf_path)
+    chunks: Fragmentos = indice["chunks"]
+    if not len(chunks):
+        return "No se pudo extraer texto del PDF."
+
+    doc = _documento_por_backend(pdf_path, indice)
+    return _rag(
+        pregunta,
+        indice["clave"],
+        len(chunks),
+        _backends(),
+        lambda backend, emb, n: _indice_denso(doc(backend)).buscar(emb, k=n),
+        lambda n: _indice_lexico(indice["clave"], chunks).buscar(pregunta, k=n),
+        lambda i: chunks[i],
+        chunks.cita,
+        lambda backend, idx: doc(backend)["vectores"][idx],
+        lambda idx: _indice_lexico(indice["clave"], chunks).puntajes(pregunta, idx),
+    )
+
+
+def run_ej8_batch(
+    preguntas: Sequence[str],
+    pdf_path: str,
+    max_concurrencia: int | None = None,
+) -> Iterator[str]:
+    """
+    Ejercicio 8 para una lista de preguntas sobre el mismo PDF (por ejemplo,
+    una lista de verificación):
+    - el documento se prepara una sola vez;
+    - las preguntas se embeben en una sola llamada por lotes y se comparan con
+      todos los chunks en un solo producto matricial (preguntas × chunks);
+    - las respuestas se generan en paralelo (hasta max_concurrencia llamadas
+      al LLM a la vez) y se devuelven en el orden de las preguntas a medida
+      que están listas.
+    Si el backend de embeddings falla se usa el de respaldo; si también falla,
+    todas las preguntas usan sólo BM25.
+    """
+    preguntas = [(p or "").strip() for p in preguntas]
+    indice = _preparar_documento(pdf_path)
+    chunks: Fragmentos = indice["chunks"]
+    if not len(chunks):
+        for _ in preguntas:
+            yield "No se pudo extraer texto del PDF."
+        return
+
+    doc = _documento_por_backend(pdf_path, indice)
+    n_cand = max(_MMR_CANDIDATOS, _MAX_FRAGMENTOS)
+    bm25 = _indice_lexico(indice["clave"], chunks)
+    con_texto = [i for i, p in enumerate(preguntas) if p]
+
+    def _buscar_lote(backend: EmbeddingBackend) -> Tuple[Dict[int, np.ndarray], Dict[int, np.ndarray]]:
+        embs: Dict[int, np.ndarray] = {}
+        for i in con_texto:
+            emb = cache_embeddings.get((backend.nombre, preguntas[i]))
+            if emb is not None:
+                embs[i] = emb
+        unicas = list(dict.fromkeys(preguntas[i] for i in con_texto if i not in embs))
+        if unicas:
+            nuevos = dict(zip(unicas, backend.embed_texts(unicas)))
+            for p, emb in nuevos.items():
+                cache_embeddings.put((backend.nombre, p), emb)
+            for i in con_texto:
+                embs.setdefault(i, nuevos.get(preguntas[i]))
+        if not con_texto:
+            return embs, {}
+        consultas = np.asarray([embs[i] for i in con_texto], dtype=np.float32)
+        idx_densos, _ = _indice_denso(doc(backend)).buscar(consultas, k=n_cand)
+        return embs, dict(zip(con_texto, idx_densos))
+
+    backend: EmbeddingBackend | None = None
+    embs: Dict[int, np.ndarray] = {}
+    densos: Dict[int, np.ndarray] = {}
+    errores: List[str] = []
+    for candidato in _backends():
+        try:
+            embs, densos = _buscar_lote(candidato)
+        except Exception as e:
+            errores.append(f"{candidato.nombre}: {e}")
+            continue
+        backend = candidato
+        break
+    uso_embeddings, error_embeddings = backend is not None, "; ".join(errores)
+    version = f"{indice['clave']}|{backend.nombre}" if backend is not None else ""
+
+    def _tarea(i: int) -> str:
+        pregunta = preguntas[i]
+        if not pregunta:
+            return "No se recibió ninguna pregunta."
+        if uso_embeddings:
+            previa = cache_respuestas.buscar(version, embs[i])
+            if previa is not None:
+                return previa
+        lexico, _ = bm25.buscar(pregunta, k=n_cand)
+        idx, scores = fusion_rrf([densos[i], lexico] if uso_embeddings else [lexico], n_cand)
+        idx = _seleccionar(
+            idx,
+            scores,
+            embs[i] if uso_embeddings else None,
+            len(chunks),
+            lambda j: chunks[j],
+            lambda sel: doc(backend)["vectores"][sel],
+            lambda sel: bm25.puntajes(pregunta, sel),
+        )
+        fragmentos = [f"[{chunks.cita(j)}]\n{chunks[j]}" for j in idx]
+        prompt, _ = _armar_prompt(pregunta, fragmentos, uso_embeddings, error_embeddings)
+        respuesta = call_llm(prompt)
+        if uso_embeddings:
+            cache_respuestas.guardar(version, embs[i], respuesta)
+        return respuesta
+
+    pool = ThreadPoolExecutor(
+        max_workers=max(1, max_concurrencia or _BATCH_CONCURRENCIA), thread_name_prefix="rag-lote"
+    )
+    futuros = [pool.submit(_tarea, i) for i in range(len(preguntas))]
+    try:
+        for fut in futuros:
+            try:
+                yield fut.result()
+            except Exception as e:
+                yield f"Error al responder la pregunta: {e}"
+    finally:
+        # Si quien consume deja de leer, no se lanzan las preguntas pendientes
+        for fut in futuros:
+            fut.cancel()
+        pool.shutdown(wait=False)
+
+
+def run_ej8_corpus(pregunta: str, carpeta: str | None = None) -> str:
+    """
+    Ejercicio 8 en modo corpus: pregunta sobre todos los PDF de documentos/.
+    Sólo se re-extraen y re-embeben los PDF agregados o modificados.
+    Usa sólo el backend de embeddings principal (sin él, BM25).
+    """
+    pregunta = (pregunta or "").strip()
+    if not pregunta:
+        return "No se recibió ninguna pregunta."
+
+    corpus = sincronizar_corpus(carpeta or str(DOCS_DIR), _preparar_documento)
+    if not len(corpus):
+        return "No hay PDF con texto en la carpeta de documentos."
+
+    def _denso(backend: EmbeddingBackend, emb: np.ndarray, n: int):
+        _embeber_documentos(corpus.documentos)
+        return corpus.indice_denso().buscar(emb, k=n)
+
+    version = hashlib.sha256("|".join(doc["clave"] for doc in corpus.documentos).encode("utf-8")).hexdigest()
+    return _rag(
+        pregunta,
+        version,
+        len(corpus),
+        _backends()[:1],
+        _denso,
+        lambda n: corpus.indice_lexico(_indice_lexico).buscar(pregunta, k=n),
+        corpus.chunk,
+        lambda i: f"{corpus.origen(i)}, {corpus.cita(i)}",
+        lambda backend, idx: corpus.vectores(idx),
+        lambda idx: corpus.indice_lexico(_indice_lexico).puntajes(pregunta, idx),
+    )
@@ -0,0 +1,201 @@
+# ejercicios/llm_cache.py
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+
+# Caché de respuestas del LLM en disco (desactivada por defecto: LLM_CACHE=1 la activa)
+_ACTIVA = os.getenv("LLM_CACHE", "0") == "1"
+_RUTA = Path(os.getenv("LLM_CACHE_RUTA", str(BASE_DIR / "cache_llm.sqlite3")))
+_MAX_MB = float(os.getenv("LLM_CACHE_MAX_MB", "50"))
+_TTL_S = float(os.getenv("LLM_CACHE_TTL_S", str(7 * 24 * 3600)))
+# ¿Se guardan (y se sirven) respuestas del fallback de Groq para pedidos a Gemini?
+_MEZCLAR_FALLBACK = os.getenv("LLM_CACHE_FALLBACK", "0") == "1"
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS respuestas (
+    clave TEXT PRIMARY KEY,
+    proveedor TEXT NOT NULL,
+    modelo TEXT NOT NULL,
+    respuesta TEXT NOT NULL,
+    bytes INTEGER NOT NULL,
+    creada REAL NOT NULL,
+    usada REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS respuestas_usada ON respuestas (usada);
+"""
+
+
+class CacheLLM:
+    """
+    Caché de respuestas completas del LLM en un archivo SQLite (sobrevive
+    entre ejecuciones y la comparten varios procesos):
+    - clave: hash de (proveedor, modelo, system, prompt, parámetros de generación);
+    - TTL: las respuestas más viejas que ttl_s no se sirven;
+    - LRU: si el total supera max_bytes, se borran las menos usadas;
+    - cada respuesta guarda qué proveedor la generó: las del fallback de Groq
+      no se sirven a un pedido a Gemini salvo con mezclar_fallback=True.
+    Los errores del disco no rompen la llamada: se tratan como fallo de caché.
+    Segura entre hilos; desde un event loop se usa abuscar / aguardar, que
+    hacen el acceso al disco en un hilo aparte.
+    """
+
+    def __init__(
+        self,
+        ruta: Path | str | None = None,
+        max_bytes: int | None = None,
+        ttl_s: float | None = None,
+        activa: bool | None = None,
+        mezclar_fallback: bool | None = None,
+        reloj: Callable[[], float] = time.time,
+    ):
+        self.ruta = Path(ruta or _RUTA)
+        self.max_bytes = max(1, int(max_bytes or _MAX_MB * 1024 * 1024))
+        self.ttl_s = _TTL_S if ttl_s is None else ttl_s
+        self.activa = _ACTIVA if activa is None else activa
+        self.mezclar_fallback = _MEZCLAR_FALLBACK if mezclar_fallback is None else mezclar_fallback
+        self._reloj = reloj
+        self._lock = threading.Lock()
+        self._con: Optional[sqlite3.Connection] = None
+        self.aciertos = 0
+        self.fallos = 0
+        self.bytes_ahorrados = 0
+
+    def _conexion(self) -> sqlite3.Connection:
+        if self._con is None:
+            self.ruta.parent.mkdir(parents=True, exist_ok=True)
+            con = sqlite3.connect(str(self.ruta), check_same_thread=False, timeout=5.0)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.executescript(_ESQUEMA)
+            self._con = con
+        return self._con
+
+    @staticmethod
+    def clave(
+        proveedor: str,
+        modelo: str,
+        system: str | None,
+        prompt: str,
+        params: Dict[str, Any] | None = None,
+    ) -> str:
+        datos = {
+            "proveedor": proveedor,
+            "modelo": modelo,
+            "system": system or "",
+            "prompt": prompt,
+            "params": params or {},
+        }
+        return hashlib.sha256(json.dumps(datos, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    def buscar(self, clave: str, proveedor: str) -> Optional[str]:
+        """
+        Respuesta guardada para la clave (None si no hay, venció o la generó
+        otro proveedor y no se permite mezclar).
+        """
+        ahora = self._reloj()
+        with self._lock:
+            try:
+                con = self._conexion()
+                fila = con.execute(
+                    "SELECT proveedor, respuesta, bytes, creada FROM respuestas WHERE clave = ?", (clave,)
+                ).fetchone()
+                if fila is not None and ahora - fila[3] > self.ttl_s:
+                    con.execute("DELETE FROM respuestas WHERE clave = ?", (clave,))
+                    con.commit()
+                    fila = None
+                if fila is None or (fila[0] != proveedor and not self.mezclar_fallback):
+                    self.fallos += 1
+                    return None
+                con.execute("UPDATE respuestas SET usada = ? WHERE clave = ?", (ahora, clave))
+                con.commit()
+            except sqlite3.Error:
+                self.fallos += 1
+                return None
+            self.aciertos += 1
+            self.bytes_ahorrados += fila[2]
+            return fila[1]
+
+    def guardar(self, clave: str, proveedor_pedido: str, proveedor: str, modelo: str, respuesta: str) -> None:
+        """
+        Guarda la respuesta que dio `proveedor` a un pedido hecho a `proveedor_pedido`.
+        """
+        if not respuesta or (proveedor != proveedor_pedido and not self.mezclar_fallback):
+            return
+        ahora = self._reloj()
+        tam = len(respuesta.encode("utf-8"))
+        if tam > self.max_bytes:
+            return
+        with self._lock:
+            try:
+                con = self._conexion()
+                con.execute(
+                    "INSERT OR REPLACE INTO respuestas VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (clave, proveedor, modelo, respuesta, tam, ahora, ahora),
+                )
+                con.execute("DELETE FROM respuestas WHERE creada < ?", (ahora - self.ttl_s,))
+                self._expulsar(con)
+                con.commit()
+            except sqlite3.Error:
+                pass
+
+    async def abuscar(self, clave: str, proveedor: str) -> Optional[str]:
+        return await asyncio.to_thread(self.buscar, clave, proveedor)
+
+    async def aguardar(self, clave: str, proveedor_pedido: str, proveedor: str, modelo: str, respuesta: str) -> None:
+        await asyncio.to_thread(self.guardar, clave, proveedor_pedido, proveedor, modelo, respuesta)
+
+    def _expulsar(self, con: sqlite3.Connection) -> None:
+        # Se borran las menos usadas hasta volver a quedar bajo max_bytes
+        total = con.execute("SELECT COALESCE(SUM(bytes), 0) FROM respuestas").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        borrar = []
+        for clave, tam in con.execute("SELECT clave, bytes FROM respuestas ORDER BY usada"):
+            if total <= self.max_bytes:
+                break
+            borrar.append((clave,))
+            total -= tam
+        con.executemany("DELETE FROM respuestas WHERE clave = ?", borrar)
+
+    def limpiar(self) -> None:
+        with self._lock:
+            try:
+                con = self._conexion()
+                con.execute("DELETE FROM respuestas")
+                con.commit()
+            except sqlite3.Error:
+                pass
+
+    def estadisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.aciertos + self.fallos
+            datos = {
+                "activa": self.activa,
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "tasa_aciertos": self.aciertos / total if total else 0.0,
+                "bytes_ahorrados": self.bytes_ahorrados,
+                "tamano": 0,
+                "bytes": 0,
+                "max_bytes": self.max_bytes,
+            }
+            if self._con is not None or self.ruta.exists():
+                try:
+                    n, b = self._conexion().execute(
+                        "SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM respuestas"
+                    ).fetchone()
+                    datos["tamano"], datos["bytes"] = n, b
+                except sqlite3.Error:
+                    pass
+            return datos
+
+
+# Caché compartida por llm_utils
+cache_llm = CacheLLM()
@@ -0,0 +1,175 @@
+# ejercicios/llm_circuito.py
+import os
+import re
+import threading
+import time
+from typing import Any, Callable, Dict
+
+# google-api-core se usa para detectar errores de cuota de forma más fina
+try:
+    from google.api_core import exceptions as gexc  # type: ignore
+except Exception:  # por si en alguna instalación no viene
+    gexc = None  # type: ignore
+
+# Errores de cuota seguidos que abren el circuito y espera mínima antes de volver a probar
+_FALLOS = int(os.getenv("LLM_CIRCUITO_FALLOS", "3"))
+_ESPERA_S = float(os.getenv("LLM_CIRCUITO_ESPERA_S", "30"))
+# Tope para la espera que sugiera el proveedor (retry-after)
+_ESPERA_MAX_S = float(os.getenv("LLM_CIRCUITO_ESPERA_MAX_S", "600"))
+
+# "Please retry in 17.4s", "retry_delay { seconds: 17 }", "Retry-After: 20"
+_REINTENTO = re.compile(
+    r"retry[\s_-]*(?:in|after|delay)\D{0,20}?(\d+(?:\.\d+)?)\s*(ms)?",
+    re.IGNORECASE,
+)
+
+CERRADO = "cerrado"
+ABIERTO = "abierto"
+SEMIABIERTO = "semiabierto"
+
+
+def es_error_cuota(e: Exception) -> bool:
+    """
+    ¿El error es de cuota / rate-limit (429, ResourceExhausted)?
+    """
+    if gexc is not None and isinstance(e, gexc.ResourceExhausted):
+        return True
+    if getattr(e, "status_code", None) == 429:
+        return True
+    s = str(e).lower()
+    return "429" in s or "quota" in s or "rate limit" in s or "resourceexhausted" in s
+
+
+def espera_sugerida(e: Exception) -> float | None:
+    """
+    Segundos que el proveedor pide esperar antes de reintentar, si lo dice
+    (cabecera retry-after de Groq o el retry_delay / "retry in" de Gemini).
+    """
+    respuesta = getattr(e, "response", None)
+    cabeceras = getattr(respuesta, "headers", None)
+    if cabeceras is not None:
+        try:
+            valor = cabeceras.get("retry-after")
+            if valor is not None:
+                return float(valor)
+        except (TypeError, ValueError):
+            pass
+    m = _REINTENTO.search(str(e))
+    if m is None:
+        return None
+    segundos = float(m.group(1))
+    return segundos / 1000.0 if m.group(2) else segundos
+
+
+class Interruptor:
+    """
+    Circuit breaker de un proveedor para errores de cuota:
+    - cerrado: las peticiones pasan; tras `fallos` errores de cuota seguidos se abre;
+    - abierto: `permitir()` devuelve False (se va directo al fallback) hasta que
+      pasa la espera (la mayor entre `espera_s` y el retry-after del proveedor);
+    - semiabierto: deja pasar una sola petición de prueba; si sale bien se
+      cierra y si vuelve el error de cuota se abre otra vez.
+    Otros errores (red, petición inválida) no cuentan como cuota.
+    Seguro entre hilos.
+    """
+
+    def __init__(
+        self,
+        nombre: str,
+        fallos: int | None = None,
+        espera_s: float | None = None,
+        reloj: Callable[[], float] = time.monotonic,
+    ):
+        self.nombre = nombre
+        self.fallos = max(1, fallos or _FALLOS)
+        self.espera_s = _ESPERA_S if espera_s is None else espera_s
+        self._reloj = reloj
+        self._lock = threading.Lock()
+        self.estado = CERRADO
+        self._seguidos = 0
+        self._reabre = 0.0
+        self._sondeando = False
+        self.aperturas = 0
+        self.rechazadas = 0
+        self.sondeos = 0
+        self.ultimo_error = ""
+
+    def permitir(self) -> bool:
+        """
+        ¿Se puede intentar con este proveedor ahora? (Si devuelve True en
+        estado semiabierto, la llamada es la prueba: hay que reportar su resultado.)
+        """
+        with self._lock:
+            if self.estado == CERRADO:
+                return True
+            if self.estado == ABIERTO and self._reloj() >= self._reabre:
+                self.estado = SEMIABIERTO
+            if self.estado == SEMIABIERTO and not self._sondeando:
+                self._sondeando = True
+                self.sondeos += 1
+                return True
+            self.rechazadas += 1
+            return False
+
+    def exito(self) -> None:
+        with self._lock:
+            self.estado = CERRADO
+            self._seguidos = 0
+            self._sondeando = False
+
+    def fallo(self, e: Exception) -> None:
+        """
+        Reporta un error de la llamada; sólo los de cuota mueven el circuito.
+        """
+        with self._lock:
+            self._sondeando = False
+            if not es_error_cuota(e):
+                return
+            self._seguidos += 1
+            self.ultimo_error = str(e)[:300]
+            if self.estado == SEMIABIERTO or self._seguidos >= self.fallos:
+                espera = max(self.espera_s, min(espera_sugerida(e) or 0.0, _ESPERA_MAX_S))
+                if self.estado != ABIERTO:
+                    self.aperturas += 1
+                self.estado = ABIERTO
+                self._reabre = self._reloj() + espera
+
+    def segundos_para_probar(self) -> float:
+        with self._lock:
+            if self.estado != ABIERTO:
+                return 0.0
+            return max(0.0, self._reabre - self._reloj())
+
+    def metricas(self) -> Dict[str, Any]:
+        reabre = self.segundos_para_probar()
+        with self._lock:
+            return {
+                "estado": self.estado,
+                "errores_cuota_seguidos": self._seguidos,
+                "aperturas": self.aperturas,
+                "rechazadas": self.rechazadas,
+                "sondeos": self.sondeos,
+                "reabre_en_s": round(reabre, 1),
+                "ultimo_error": self.ultimo_error,
+            }
+
+
+_interruptores: Dict[str, Interruptor] = {}
+_lock = threading.Lock()
+
+
+def interruptor(proveedor: str) -> Interruptor:
+    """
+    Interruptor compartido del proveedor ("gemini", "groq"): lo usan
+    llm_utils y gemini_client, así todos ven el mismo estado.
+    """
+    with _lock:
+        if proveedor not in _interruptores:
+            _interruptores[proveedor] = Interruptor(proveedor)
+        return _interruptores[proveedor]
+
+
+def metricas_circuitos() -> Dict[str, Dict[str, Any]]:
+    with _lock:
+        copia = dict(_interruptores)
+    return {nombre: i.metricas() for nombre, i in copia.items()}
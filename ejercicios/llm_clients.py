@@ -0,0 +1,304 @@
+# ejercicios/llm_clients.py
+import asyncio
+import os
+import queue
+import threading
+from typing import Any, AsyncIterator, Awaitable, Dict, Iterable, Iterator, TypeVar
+
+import google.generativeai as genai
+from google.generativeai import client as genai_client
+
+# Groq es opcional (sólo se usa como fallback)
+try:
+    from groq import AsyncGroq
+except Exception:  # por si en alguna instalación no viene
+    AsyncGroq = None  # type: ignore
+
+try:
+    import httpx
+except Exception:
+    httpx = None  # type: ignore
+
+# Conexiones HTTP que se mantienen abiertas (keep-alive) por proveedor y timeout
+_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "10"))
+_HTTP_TIMEOUT_S = float(os.getenv("LLM_HTTP_TIMEOUT_S", "60"))
+
+# Llamadas async en vuelo como máximo por event loop
+_ASYNC_CONCURRENCIA = int(os.getenv("LLM_ASYNC_CONCURRENCIA", "64"))
+
+T = TypeVar("T")
+
+
+async def _en_hilo(iterable: Iterable[T]) -> AsyncIterator[T]:
+    """
+    Recorre un iterable bloqueante (p. ej. un stream REST del SDK) sin
+    frenar el event loop: cada elemento se pide en un hilo del pool.
+    """
+    it = iter(iterable)
+    fin = object()
+    while True:
+        item = await asyncio.to_thread(next, it, fin)
+        if item is fin:
+            return
+        yield item
+
+
+class RegistroClientes:
+    """
+    Clientes de los proveedores compartidos por todo el proceso (y por los
+    hilos de la interfaz): se crean una vez y se reutilizan, así cada llamada
+    aprovecha conexiones ya abiertas en vez de negociar TLS de nuevo.
+    - Gemini: un GenerativeModel por modelo; el SDK comparte un solo canal
+      persistente entre todos para las llamadas síncronas. Para las async hay
+      un cliente (canal grpc.aio) y un GenerativeModel por event loop: el
+      cliente async por defecto del SDK queda atado al primer loop que lo usa.
+      Con transporte REST (GEMINI_API_ENDPOINT) el SDK no tiene llamadas
+      async: se usan las síncronas en hilos del pool del loop.
+    - Groq: un AsyncGroq por API key y por event loop, con un pool httpx de
+      `pool_size` conexiones keep-alive (las conexiones async pertenecen a un loop).
+    - Un semáforo por event loop acota las llamadas en vuelo.
+    Las funciones síncronas corren sus corrutinas en un event loop propio, en
+    un hilo de fondo (`ejecutar`), así todas comparten clientes y conexiones.
+    Seguro entre hilos.
+    """
+
+    def __init__(self, pool_size: int | None = None, timeout_s: float | None = None):
+        self.pool_size = max(1, pool_size or _POOL_SIZE)
+        self.timeout_s = timeout_s or _HTTP_TIMEOUT_S
+        self._lock = threading.Lock()
+        self._gemini: Dict[str, Any] = {}
+        self._bucles: Dict[asyncio.AbstractEventLoop, Dict[str, Any]] = {}
+        self._fondo: asyncio.AbstractEventLoop | None = None
+        self.creados = 0
+        self.reusos = 0
+
+    def _del_bucle(self) -> Dict[str, Any]:
+        bucle = asyncio.get_running_loop()
+        with self._lock:
+            estado = self._bucles.get(bucle)
+            if estado is None:
+                # Se olvidan los loops ya cerrados (p. ej. los de asyncio.run)
+                for viejo in [b for b in self._bucles if b.is_closed()]:
+                    del self._bucles[viejo]
+                estado = {
+                    "groq": {},
+                    "gemini": {},
+                    "gemini_async": None,
+                    "semaforo": asyncio.Semaphore(_ASYNC_CONCURRENCIA),
+                }
+                self._bucles[bucle] = estado
+            return estado
+
+    def gemini(self, model_name: str):
+        """
+        GenerativeModel compartido para el modelo.
+        """
+        with self._lock:
+            modelo = self._gemini.get(model_name)
+            if modelo is None:
+                modelo = genai.GenerativeModel(model_name)
+                self._gemini[model_name] = modelo
+                self.creados += 1
+            else:
+                self.reusos += 1
+            return modelo
+
+    def gemini_rest(self) -> bool:
+        """
+        ¿El SDK de Gemini está configurado con transporte REST?
+        """
+        config = getattr(genai_client._client_manager, "client_config", None) or {}
+        return config.get("transport") == "rest"
+
+    def _gemini_async(self) -> Any:
+        """
+        Cliente async de Gemini del event loop actual (se crea en ese loop).
+        """
+        estado = self._del_bucle()
+        with self._lock:
+            if estado["gemini_async"] is None:
+                estado["gemini_async"] = genai_client._client_manager.make_client("generative_async")
+                self.creados += 1
+            else:
+                self.reusos += 1
+            return estado["gemini_async"]
+
+    def _gemini_del_bucle(self, model_name: str):
+        """
+        GenerativeModel del event loop actual, que usa el cliente async de ese loop.
+        """
+        cliente = self._gemini_async()
+        modelos = self._del_bucle()["gemini"]
+        with self._lock:
+            modelo = modelos.get(model_name)
+            if modelo is None:
+                modelo = genai.GenerativeModel(model_name)
+                # El SDK sólo lo crea si falta: así no toma el compartido por defecto
+                modelo._async_client = cliente
+                modelos[model_name] = modelo
+            return modelo
+
+    async def generar(self, model_name: str, contenido: Any) -> AsyncIterator[Any]:
+        """
+        Trozos de la respuesta de Gemini a `contenido` (generate_content en stream).
+        """
+        if self.gemini_rest():
+            respuesta = await asyncio.to_thread(self.gemini(model_name).generate_content, contenido, stream=True)
+            async for trozo in _en_hilo(respuesta):
+                yield trozo
+            return
+        respuesta = await self._gemini_del_bucle(model_name).generate_content_async(contenido, stream=True)
+        async for trozo in respuesta:
+            yield trozo
+
+    async def enviar_chat(self, chat: Any, model_name: str, contenido: Any) -> AsyncIterator[Any]:
+        """
+        Trozos de la respuesta de un ChatSession de Gemini (send_message en stream).
+        El chat pasa a usar el modelo del event loop actual.
+        """
+        if self.gemini_rest():
+            respuesta = await asyncio.to_thread(chat.send_message, contenido, stream=True)
+            async for trozo in _en_hilo(respuesta):
+                yield trozo
+            return
+        chat.model = self._gemini_del_bucle(model_name)
+        respuesta = await chat.send_message_async(contenido, stream=True)
+        async for trozo in respuesta:
+            yield trozo
+
+    async def embeber(self, model_name: str, contenido: Any) -> Any:
+        """
+        embed_content de Gemini (un texto o una lista) con el cliente del event loop actual.
+        """
+        if self.gemini_rest():
+            return await asyncio.to_thread(genai.embed_content, model=model_name, content=contenido)
+        return await genai.embed_content_async(model=model_name, content=contenido, client=self._gemini_async())
+
+    def groq_disponible(self, api_key: str | None = None) -> bool:
+        return AsyncGroq is not None and bool(api_key or os.getenv("GROQ_API_KEY"))
+
+    def groq(self, api_key: str | None = None):
+        """
+        Cliente AsyncGroq del event loop actual (None si no hay librería o API key).
+        Hay que llamarlo desde una corrutina.
+        """
+        api_key = api_key or os.getenv("GROQ_API_KEY")
+        if not self.groq_disponible(api_key):
+            return None
+        clientes_groq = self._del_bucle()["groq"]
+        with self._lock:
+            cliente = clientes_groq.get(api_key)
+            if cliente is None:
+                kwargs: Dict[str, Any] = {"api_key": api_key}
+                if httpx is not None:
+                    kwargs["http_client"] = httpx.AsyncClient(
+                        limits=httpx.Limits(
+                            max_connections=self.pool_size,
+                            max_keepalive_connections=self.pool_size,
+                        ),
+                        timeout=self.timeout_s,
+                    )
+                cliente = AsyncGroq(**kwargs)
+                clientes_groq[api_key] = cliente
+                self.creados += 1
+            else:
+                self.reusos += 1
+            return cliente
+
+    def semaforo(self) -> asyncio.Semaphore:
+        """
+        Semáforo del event loop actual (LLM_ASYNC_CONCURRENCIA llamadas en vuelo).
+        """
+        return self._del_bucle()["semaforo"]
+
+    def _bucle_fondo(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._fondo is None:
+                bucle = asyncio.new_event_loop()
+                threading.Thread(target=bucle.run_forever, name="llm-asyncio", daemon=True).start()
+                self._fondo = bucle
+            return self._fondo
+
+    def ejecutar(self, corrutina: Awaitable[T]) -> T:
+        """
+        Corre la corrutina en el event loop de fondo y espera su resultado
+        (es lo que usan las funciones síncronas).
+        """
+        bucle = self._bucle_fondo()
+        try:
+            actual = asyncio.get_running_loop()
+        except RuntimeError:
+            actual = None
+        if actual is bucle:
+            raise RuntimeError("No se puede usar la versión síncrona desde una corrutina; usa la async.")
+        return asyncio.run_coroutine_threadsafe(corrutina, bucle).result()
+
+    def iterar(self, generador: AsyncIterator[T]) -> Iterator[T]:
+        """
+        Recorre un generador async en el event loop de fondo y entrega sus
+        elementos a medida que llegan (para streaming desde código síncrono).
+        Si se deja de iterar antes del final, el generador se cancela.
+        """
+        cola: "queue.Queue" = queue.Queue()
+
+        async def _bombear() -> None:
+            try:
+                async for item in generador:
+                    cola.put(("dato", item))
+            except Exception as e:
+                cola.put(("error", e))
+            finally:
+                cola.put(("fin", None))
+
+        futuro = asyncio.run_coroutine_threadsafe(_bombear(), self._bucle_fondo())
+        try:
+            while True:
+                tipo, valor = cola.get()
+                if tipo == "dato":
+                    yield valor
+                elif tipo == "error":
+                    raise valor
+                else:
+                    return
+        finally:
+            if not futuro.done():
+                futuro.cancel()
+
+    def estadisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "modelos_gemini": len(self._gemini),
+                "clientes_gemini_async": sum(e["gemini_async"] is not None for e in self._bucles.values()),
+                "clientes_groq": sum(len(e["groq"]) for e in self._bucles.values()),
+                "event_loops": len(self._bucles),
+                "pool_size": self.pool_size,
+                "creados": self.creados,
+                "reusos": self.reusos,
+            }
+
+    def cerrar(self) -> None:
+        """
+        Cierra las conexiones del loop de fondo y olvida los clientes (se recrean al pedirlos).
+        """
+        with self._lock:
+            fondo = self._bucles.get(self._fondo) if self._fondo is not None else None
+            self._bucles.clear()
+            self._gemini.clear()
+        if fondo:
+            async def _cerrar() -> None:
+                for cliente in fondo["groq"].values():
+                    try:
+                        await cliente.close()
+                    except Exception:
+                        pass
+                if fondo["gemini_async"] is not None:
+                    try:
+                        await fondo["gemini_async"].transport.close()
+                    except Exception:
+                        pass
+
+            self.ejecutar(_cerrar())
+
+
+# Registro único del proceso (lo usan llm_utils y gemini_client)
+clientes = RegistroClientes()
@@ -0,0 +1,269 @@
+# ejercicios/llm_limite.py
+import asyncio
+import os
+import re
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Tuple
+
+from .llm_circuito import es_error_cuota
+
+# Cuotas por minuto (peticiones y tokens) y concurrencia. Se pueden fijar por
+# proveedor (LLM_RPM_GEMINI) o por modelo (LLM_RPM_GEMINI_2_5_FLASH).
+# Sin LLM_RPM / LLM_TPM no hay tope por minuto (depende del plan de cada usuario).
+_RPM = os.getenv("LLM_RPM")
+_TPM = os.getenv("LLM_TPM")
+_CONCURRENCIA = float(os.getenv("LLM_CONCURRENCIA", "4"))
+_CONCURRENCIA_MAX = float(os.getenv("LLM_CONCURRENCIA_MAX", "16"))
+
+# Cuánto espera una llamada en la cola antes de rendirse (sin valor: espera su turno)
+_ESPERA_MAX_S = float(os.getenv("LLM_LIMITE_ESPERA_S") or 0) or None
+
+# Al recibir un 429 la concurrencia se multiplica por este factor
+_REDUCCION = 0.5
+
+
+def _config(nombre: str, proveedor: str, modelo: str, defecto: Any) -> float | None:
+    for sufijo in (f"{proveedor}_{modelo}", proveedor):
+        valor = os.getenv(f"{nombre}_" + re.sub(r"[^A-Za-z0-9]+", "_", sufijo).upper())
+        if valor:
+            return float(valor)
+    return float(defecto) if defecto else None
+
+
+class Cubeta:
+    """
+    Token bucket: se rellena a `por_minuto / 60` unidades por segundo hasta
+    `por_minuto`. `tomar(n, limite)` reserva n unidades y espera lo que falte
+    para tenerlas. La reserva se hace al llegar (el saldo puede quedar
+    negativo), así que los turnos salen en orden de llegada. Con `limite` (un
+    instante de `reloj`) lanza TimeoutError sin esperar si no alcanzaría a tiempo.
+    Lo comparten todos los hilos y event loops del proceso.
+    """
+
+    def __init__(
+        self,
+        por_minuto: float,
+        reloj: Callable[[], float] = time.monotonic,
+        dormir: Callable[[float], Awaitable[Any]] = asyncio.sleep,
+    ):
+        self.capacidad = max(1.0, por_minuto)
+        self.ritmo = self.capacidad / 60.0
+        self.disponible = self.capacidad
+        self._reloj = reloj
+        self._dormir = dormir
+        self._t = reloj()
+        self._lock = threading.Lock()
+
+    def _rellenar(self, ahora: float) -> None:
+        self.disponible = min(self.capacidad, self.disponible + (ahora - self._t) * self.ritmo)
+        self._t = ahora
+
+    async def tomar(self, n: float, limite: float | None = None) -> float:
+        """
+        Devuelve los segundos que tuvo que esperar.
+        """
+        n = min(max(0.0, n), self.capacidad)  # una petición enorme no puede esperar para siempre
+        with self._lock:
+            ahora = self._reloj()
+            self._rellenar(ahora)
+            espera = max(0.0, (n - self.disponible) / self.ritmo)
+            if limite is not None and ahora + espera > limite:
+                raise TimeoutError("Se superó la espera máxima en la cola del proveedor.")
+            self.disponible -= n
+        if espera > 0:
+            try:
+                await self._dormir(espera)
+            except BaseException:
+                self.devolver(n)
+                raise
+        return espera
+
+    def devolver(self, n: float) -> None:
+        with self._lock:
+            self.disponible = min(self.capacidad, self.disponible + max(0.0, n))
+
+
+class ConcurrenciaAdaptativa:
+    """
+    Límite de llamadas simultáneas tipo AIMD: cada llamada que sale bien suma
+    1/límite (≈ +1 por cada ronda completa) y cada 429 lo multiplica por 0.5.
+    Así la concurrencia sube hasta donde la cuota aguanta y baja en cuanto
+    el proveedor empieza a rechazar. Las que no caben esperan en una cola
+    FIFO y se despiertan al liberarse un lugar (sin sondeo).
+    Se comparte entre hilos y event loops.
+    """
+
+    def __init__(self, inicial: float, maximo: float, minimo: float = 1.0):
+        self.minimo = minimo
+        self.maximo = max(minimo, maximo)
+        self.limite = min(self.maximo, max(minimo, inicial))
+        self.en_vuelo = 0
+        self._cola: deque = deque()  # turnos en espera: {"bucle", "futuro", "listo"}
+        self._lock = threading.Lock()
+
+    def _despachar(self) -> None:
+        # Con el lock tomado: da los lugares libres a los primeros de la cola
+        while self._cola and self.en_vuelo < int(self.limite):
+            turno = self._cola.popleft()
+            turno["listo"] = True
+            self.en_vuelo += 1
+            try:
+                turno["bucle"].call_soon_threadsafe(_avisar, turno["futuro"])
+            except RuntimeError:  # su event loop ya se cerró
+                turno["listo"] = False
+                self.en_vuelo -= 1
+
+    async def entrar(self, limite: float | None = None) -> float:
+        """
+        Espera un lugar (hasta `limite`, un instante de time.monotonic, si se da).
+        Devuelve los segundos que esperó.
+        """
+        inicio = time.monotonic()
+        with self._lock:
+            if not self._cola and self.en_vuelo < int(self.limite):
+                self.en_vuelo += 1
+                return 0.0
+            bucle = asyncio.get_running_loop()
+            turno = {"bucle": bucle, "futuro": bucle.create_future(), "listo": False}
+            self._cola.append(turno)
+        try:
+            if limite is None:
+                await turno["futuro"]
+            else:
+                await asyncio.wait_for(turno["futuro"], max(0.0, limite - time.monotonic()))
+        except BaseException as e:
+            with self._lock:
+                if turno["listo"]:
+                    # Se le dio el lugar justo al rendirse: se pasa al siguiente
+                    self.en_vuelo -= 1
+                    self._despachar()
+                else:
+                    self._cola.remove(turno)
+            if isinstance(e, (TimeoutError, asyncio.TimeoutError)):
+                raise TimeoutError("Se superó la espera máxima en la cola del proveedor.") from None
+            raise
+        return time.monotonic() - inicio
+
+    def salir(self, limitado: bool | None) -> None:
+        """
+        Libera el lugar. limitado=True (429) reduce el límite, False (salió
+        bien) lo sube y None (cancelada o abandonada) no lo toca.
+        """
+        with self._lock:
+            self.en_vuelo -= 1
+            if limitado:
+                self.limite = max(self.minimo, self.limite * _REDUCCION)
+            elif limitado is not None:
+                self.limite = min(self.maximo, self.limite + 1.0 / self.limite)
+            self._despachar()
+
+    def esperando(self) -> int:
+        with self._lock:
+            return len(self._cola)
+
+
+def _avisar(futuro: "asyncio.Future") -> None:
+    if not futuro.done():
+        futuro.set_result(None)
+
+
+class Limitador:
+    """
+    Limitador del lado del cliente para un (proveedor, modelo): cubetas de
+    peticiones y de tokens por minuto (si se configuraron) y concurrencia
+    adaptativa. Las llamadas que no caben esperan su turno en cola (como
+    mucho LLM_LIMITE_ESPERA_S, si se fijó) en vez de salir al API y volver con un 429.
+    """
+
+    def __init__(self, proveedor: str, modelo: str):
+        self.proveedor = proveedor
+        self.modelo = modelo
+        rpm = _config("LLM_RPM", proveedor, modelo, _RPM)
+        tpm = _config("LLM_TPM", proveedor, modelo, _TPM)
+        self.peticiones = Cubeta(rpm) if rpm else None
+        self.tokens = Cubeta(tpm) if tpm else None
+        self.concurrencia = ConcurrenciaAdaptativa(
+            _config("LLM_CONCURRENCIA", proveedor, modelo, _CONCURRENCIA),
+            _config("LLM_CONCURRENCIA_MAX", proveedor, modelo, _CONCURRENCIA_MAX),
+        )
+        self._lock = threading.Lock()
+        self.llamadas = 0
+        self.limitadas = 0
+        self.espera_s = 0.0
+
+    @asynccontextmanager
+    async def reservar(self, tokens: int = 0, peticiones: int = 1) -> AsyncIterator[None]:
+        """
+        Espera turno para una llamada de ~`tokens` tokens y la cuenta al salir
+        del bloque: si sale bien sube la concurrencia, si lanza un error de
+        cuota la reduce y si se cancela o se abandona sólo libera el lugar.
+        Uso: `async with limitador(...).reservar(tokens): ...`
+        """
+        limite = time.monotonic() + _ESPERA_MAX_S if _ESPERA_MAX_S else None
+        tomadas = []
+        espera = 0.0
+        try:
+            for cubeta, n in ((self.peticiones, peticiones), (self.tokens, tokens)):
+                if cubeta is not None:
+                    espera += await cubeta.tomar(n, limite)
+                    tomadas.append((cubeta, n))
+            espera += await self.concurrencia.entrar(limite)
+        except BaseException:
+            for cubeta, n in tomadas:
+                cubeta.devolver(n)
+            raise
+        with self._lock:
+            self.llamadas += 1
+            self.espera_s += espera
+
+        try:
+            yield
+        except Exception as e:
+            limitado = es_error_cuota(e)
+            if limitado:
+                with self._lock:
+                    self.limitadas += 1
+            self.concurrencia.salir(limitado)
+            raise
+        except BaseException:
+            # GeneratorExit / CancelledError: no dice nada de la cuota
+            self.concurrencia.salir(None)
+            raise
+        self.concurrencia.salir(False)
+
+    def metricas(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "llamadas": self.llamadas,
+                "limitadas_429": self.limitadas,
+                "espera_total_s": round(self.espera_s, 3),
+                "concurrencia": round(self.concurrencia.limite, 2),
+                "en_vuelo": self.concurrencia.en_vuelo,
+                "en_cola": self.concurrencia.esperando(),
+                "rpm": self.peticiones.capacidad if self.peticiones is not None else None,
+                "tpm": self.tokens.capacidad if self.tokens is not None else None,
+            }
+
+
+_limitadores: Dict[Tuple[str, str], Limitador] = {}
+_lock = threading.Lock()
+
+
+def limitador(proveedor: str, modelo: str) -> Limitador:
+    """
+    Limitador compartido por todo el proceso para el proveedor y el modelo.
+    """
+    with _lock:
+        clave = (proveedor, modelo)
+        if clave not in _limitadores:
+            _limitadores[clave] = Limitador(proveedor, modelo)
+        return _limitadores[clave]
+
+
+def metricas_limites() -> Dict[str, Dict[str, Any]]:
+    with _lock:
+        copia = dict(_limitadores)
+    return {f"{p}:{m}": lim.metricas() for (p, m), lim in copia.items()}
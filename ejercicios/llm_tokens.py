@@ -0,0 +1,13 @@
+# ejercicios/llm_tokens.py
+import math
+
+# Aproximación de tokens por carácter (Gemini y Llama rondan ~4 caracteres por token)
+CARACTERES_POR_TOKEN = 4.0
+
+
+def estimar_tokens(texto: str) -> int:
+    """
+    Estimación local (sin llamar al API) del número de tokens de un texto.
+    La usan los límites por proveedor de los clientes LLM y el armado del contexto del RAG.
+    """
+    return int(math.ceil(len(texto or "") / CARACTERES_POR_TOKEN))
@@ -1,15 +1,20 @@
 # ejercicios/llm_utils.py
+import asyncio
+import contextvars
 import os
-from typing import List, Dict, Any
+import re
+import unicodedata
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List
 
 import google.generativeai as genai
-from groq import Groq
+import numpy as np
 
-# google-api-core se usa para detectar errores de cuota de forma más fina
-try:
-    from google.api_core import exceptions as gexc  # type: ignore
-except Exception:  # por si en alguna instalación no viene
-    gexc = None  # type: ignore
+from .llm_cache import cache_llm
+from .llm_circuito import es_error_cuota, interruptor
+from .llm_clients import clientes
+from .llm_limite import limitador
+from .llm_tokens import estimar_tokens
 
 # ==============================
 # CONFIGURACIÓN GEMINI
@@ -32,7 +37,18 @@ if not _API_KEY:
         "  - GOOGLE_GENERATIVE_AI_API_KEY\n"
     )
 
-genai.configure(api_key=_API_KEY)
+# Endpoint alternativo (por ejemplo, un servidor falso local para pruebas).
+# Con endpoint propio se usa transporte REST, que es el que acepta http://host:puerto.
+_API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT")
+
+if _API_ENDPOINT:
+    genai.configure(
+        api_key=_API_KEY,
+        transport="rest",
+        client_options={"api_endpoint": _API_ENDPOINT},
+    )
+else:
+    genai.configure(api_key=_API_KEY)
 
 # Modelo de lenguaje por defecto (Gemini)
 _DEFAULT_LLM_MODEL = os.getenv("GEMINI_MODEL_NAME", "gemini-2.5-flash")
@@ -40,6 +56,15 @@ _DEFAULT_LLM_MODEL = os.getenv("GEMINI_MODEL_NAME", "gemini-2.5-flash")
 # Modelo de embeddings por defecto (Gemini)
 _DEFAULT_EMBED_MODEL = os.getenv("GEMINI_EMBED_MODEL", "gemini-embedding-001")
 
+# Lotes de embeddings: textos por petición (el API acepta hasta 100)
+# y peticiones simultáneas como máximo.
+_EMBED_BATCH_SIZE = int(os.getenv("GEMINI_EMBED_BATCH_SIZE", "100"))
+_EMBED_CONCURRENCY = int(os.getenv("GEMINI_EMBED_CONCURRENCY", "4"))
+
+# Backend de embeddings por defecto ("gemini" o "local") y dimensión del local
+_EMBED_BACKEND = os.getenv("EMBED_BACKEND", "gemini")
+_LOCAL_EMBED_DIM = int(os.getenv("LOCAL_EMBED_DIM", "512"))
+
 # ==============================
 # CONFIGURACIÓN GROQ (FALLBACK)
 # ==============================
@@ -48,87 +73,353 @@ _GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 _GROQ_MODEL_NAME = os.getenv("GROQ_MODEL_NAME", "llama-3.1-8b-instant")
 
 
-def _call_llm_groq(prompt: str, system: str | None = None) -> str:
+async def _astream_groq(prompt: str, system: str | None = None, parcial: str = "") -> AsyncIterator[str]:
     """
-    Llama a Groq como fallback cuando Gemini falla (por cuota, etc.).
+    Llama a Groq como fallback cuando Gemini falla (por cuota, etc.) y
+    entrega el texto a medida que llega. Con `parcial` (lo que Gemini alcanzó
+    a escribir antes de fallar), Groq continúa la respuesta desde ahí.
     """
     if not _GROQ_API_KEY:
         raise RuntimeError(
-            ""
+            "Gemini no tiene cuota disponible y no hay GROQ_API_KEY para el fallback."
         )
 
-    client = Groq(api_key=_GROQ_API_KEY)
+    client = clientes.groq(_GROQ_API_KEY)
+    if client is None:
+        raise RuntimeError("No está instalada la librería de Groq.")
+
+    circuito = interruptor("groq")
+    if not circuito.permitir():
+        raise RuntimeError(
+            f"Groq sin cuota (circuito abierto, se reintenta en "
+            f"{circuito.segundos_para_probar():.0f} s)."
+        )
 
     mensajes = []
     if system:
         mensajes.append({"role": "system", "content": system})
     mensajes.append({"role": "user", "content": prompt})
+    if parcial:
+        mensajes.append({"role": "assistant", "content": parcial})
 
     try:
-        chat = client.chat.completions.create(
-            model=_GROQ_MODEL_NAME,
-            messages=mensajes,
-        )
+        async with limitador("groq", _GROQ_MODEL_NAME).reservar(estimar_tokens((system or "") + prompt + parcial)):
+            stream = await client.chat.completions.create(
+                model=_GROQ_MODEL_NAME,
+                messages=mensajes,
+                stream=True,
+            )
+            async for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    yield delta
     except Exception as e:
+        circuito.fallo(e)
         raise RuntimeError(f"Error al llamar al modelo de Groq '{_GROQ_MODEL_NAME}': {e}")
+    except BaseException as e:  # se dejó de leer el stream antes del final
+        circuito.fallo(e)
+        raise
+    circuito.exito()
+
+
+def _texto(response: Any) -> str:
+    """
+    Texto de una respuesta (o de un trozo del stream) de Gemini, sin recortar.
+    """
+    try:
+        text = response.text
+    except Exception:  # sin partes de texto (p. ej. trozo final o bloqueo)
+        text = None
+    if not text and hasattr(response, "candidates"):
+        for cand in response.candidates:
+            if getattr(cand, "content", None) and getattr(cand.content, "parts", None):
+                piezas = []
+                for p in cand.content.parts:
+                    if hasattr(p, "text") and p.text:
+                        piezas.append(p.text)
+                if piezas:
+                    text = "".join(piezas)
+                    break
 
-    contenido = chat.choices[0].message.content
-    return f"\n{contenido.strip()}"
+    return text or ""
+
+
+def _vectores(res: Any) -> Any:
+    if isinstance(res, dict):
+        return res.get("embedding", [])
+    return getattr(res, "embedding", None)
+
+
+# Quién recibe los trozos de texto de las llamadas en curso (ver token_listener)
+_token_listener: contextvars.ContextVar[Callable[[str], Any] | None] = contextvars.ContextVar(
+    "token_listener", default=None
+)
+
+
+async def _juntar(deltas: AsyncIterator[str], oyente: Callable[[str], Any] | None) -> str:
+    piezas = []
+    async for delta in deltas:
+        piezas.append(delta)
+        if oyente is not None:
+            oyente(delta)
+    return "".join(piezas).strip()
+
+
+async def _astream_gemini(
+    prompt: str,
+    system: str | None,
+    model_id: str,
+    origen: Dict[str, str],
+) -> AsyncIterator[str]:
+    """
+    Stream de Gemini con circuito, límites y fallback a Groq (ver astream_llm).
+    Deja en origen["proveedor"] quién generó la respuesta.
+    """
+    parts = []
+    if system:
+        parts.append(system)
+    parts.append(prompt)
+
+    async with clientes.semaforo():
+        circuito = interruptor("gemini")
+        if not circuito.permitir():
+            origen["proveedor"] = "groq"
+            async for delta in _astream_groq(prompt, system):
+                yield delta
+            return
+
+        emitido = []
+        try:
+            async with limitador("gemini", model_id).reservar(estimar_tokens("".join(parts))):
+                async for chunk in clientes.generar(model_id, parts):
+                    delta = _texto(chunk)
+                    if delta:
+                        emitido.append(delta)
+                        yield delta
+        except Exception as e:
+            circuito.fallo(e)
+            if es_error_cuota(e):
+                # Intentamos fallback con Groq
+                origen["proveedor"] = "groq"
+                async for delta in _astream_groq(prompt, system, "".join(emitido)):
+                    yield delta
+                return
+
+            # Si es otro tipo de error, lo re-lanzamos
+            raise RuntimeError(f"Error al llamar al modelo '{model_id}': {e}")
+        except BaseException as e:  # se dejó de leer el stream antes del final
+            circuito.fallo(e)
+            raise
+        circuito.exito()
 
 
 # ==============================
-# FUNCIONES PÚBLICAS
+# FUNCIONES PÚBLICAS (ASYNC)
 # ==============================
 
-def call_llm(
+async def astream_llm(
     prompt: str,
     system: str | None = None,
     model_name: str | None = None,
+    use_cache: bool = True,
+) -> AsyncIterator[str]:
+    """
+    Llama a un modelo de lenguaje de Gemini y entrega el texto por trozos a
+    medida que se genera.
+    Si hay error de cuota (429 / ResourceExhausted), sigue con Groq: si
+    Gemini ya había escrito algo, Groq continúa desde ese punto.
+    Mientras el circuito de Gemini esté abierto (varios 429 seguidos) se va
+    directo a Groq, sin esperar otro 429.
+    Varias llamadas pueden ir a la vez en un mismo event loop (hasta
+    LLM_ASYNC_CONCURRENCIA, además del límite por proveedor).
+    Con la caché en disco activa (LLM_CACHE=1) una respuesta ya guardada
+    para el mismo pedido se entrega entera sin llamar al API;
+    use_cache=False la ignora.
+    """
+    model_id = model_name or _DEFAULT_LLM_MODEL
+
+    clave = None
+    if use_cache and cache_llm.activa:
+        clave = cache_llm.clave("gemini", model_id, system, prompt)
+        guardada = await cache_llm.abuscar(clave, "gemini")
+        if guardada is not None:
+            yield guardada
+            return
+
+    origen = {"proveedor": "gemini"}
+    piezas = []
+    async for delta in _astream_gemini(prompt, system, model_id, origen):
+        piezas.append(delta)
+        yield delta
+    if clave is not None:
+        await cache_llm.aguardar(clave, "gemini", origen["proveedor"], model_id, "".join(piezas))
+
+
+async def acall_llm(
+    prompt: str,
+    system: str | None = None,
+    model_name: str | None = None,
+    use_cache: bool = True,
 ) -> str:
     """
-    Llama a un modelo de lenguaje de Gemini.
-    Si hay error de cuota (429 / ResourceExhausted), intenta Groq como fallback.
+    Versión async de call_llm: la respuesta completa de astream_llm.
+    """
+    return await _juntar(astream_llm(prompt, system, model_name, use_cache), _token_listener.get())
+
+
+async def abatch(
+    prompts: List[str],
+    system: str | None = None,
+    model_name: str | None = None,
+    max_concurrency: int | None = None,
+    use_cache: bool = True,
+    return_exceptions: bool = False,
+) -> List[Any]:
+    """
+    Varias llamadas a acall_llm en paralelo, con hasta `max_concurrency` a la
+    vez (por defecto, la concurrencia máxima del limitador de Gemini: lanzar
+    más sólo alarga la cola). Devuelve las respuestas en el orden de los
+    prompts; si una falla, lanza su error, salvo con return_exceptions=True,
+    que deja el error en su lugar y conserva las demás respuestas.
     """
     model_id = model_name or _DEFAULT_LLM_MODEL
+    tope = max_concurrency or int(limitador("gemini", model_id).concurrencia.maximo)
+    workers = asyncio.Semaphore(max(1, tope))
+
+    async def _uno(prompt: str) -> str:
+        async with workers:
+            # Los trozos de varias respuestas a la vez no se pasan al token_listener
+            return await _juntar(astream_llm(prompt, system, model_id, use_cache), None)
+
+    return list(await asyncio.gather(*(_uno(p) for p in prompts), return_exceptions=return_exceptions))
 
-    parts = []
-    if system:
-        parts.append(system)
-    parts.append(prompt)
 
+async def aembed_text(
+    text: str,
+    model_name: str | None = None,
+) -> List[float]:
+    """
+    Versión async de embed_text.
+    """
+    model_id = model_name or _DEFAULT_EMBED_MODEL
+    text = (text or "").replace("\n", " ")
+
+    async with clientes.semaforo():
+        try:
+            async with limitador("gemini", model_id).reservar(estimar_tokens(text)):
+                res: Dict[str, Any] = await clientes.embeber(model_id, text)
+        except Exception as e:
+            raise RuntimeError(f"Error al llamar al modelo de embeddings '{model_id}': {e}")
+
+    return list(_vectores(res) or [])
+
+
+async def _aembed_batch(textos: List[str], model_id: str) -> List[List[float]]:
+    """
+    Una sola petición de embeddings para varios textos.
+    """
     try:
-        model = genai.GenerativeModel(model_id)
-        response = model.generate_content(parts)
+        async with limitador("gemini", model_id).reservar(sum(estimar_tokens(t) for t in textos)):
+            res: Dict[str, Any] = await clientes.embeber(model_id, textos)
     except Exception as e:
-        # ¿Es error de cuota / rate-limit?
-        msg = str(e)
-        is_quota = (
-            "429" in msg
-            or "rate limit" in msg.lower()
-            or "quota" in msg.lower()
-            or (gexc is not None and isinstance(e, gexc.ResourceExhausted))
+        raise RuntimeError(f"Error al llamar al modelo de embeddings '{model_id}': {e}")
+
+    embs = list(_vectores(res) or [])
+    if len(embs) != len(textos):
+        raise RuntimeError(
+            f"El modelo de embeddings '{model_id}' devolvió {len(embs)} vectores "
+            f"para {len(textos)} textos."
         )
-        if is_quota:
-            # Intentamos fallback con Groq
-            return _call_llm_groq(prompt, system)
+    return [list(e or []) for e in embs]
 
-        # Si es otro tipo de error, lo re-lanzamos
-        raise RuntimeError(f"Error al llamar al modelo '{model_id}': {e}")
 
-    # Si Gemini respondió bien:
-    text = getattr(response, "text", None)
-    if not text and hasattr(response, "candidates"):
-        for cand in response.candidates:
-            if getattr(cand, "content", None) and getattr(cand.content, "parts", None):
-                piezas = []
-                for p in cand.content.parts:
-                    if hasattr(p, "text") and p.text:
-                        piezas.append(p.text)
-                if piezas:
-                    text = "".join(piezas)
-                    break
+async def aembed_texts(
+    texts: List[str],
+    model_name: str | None = None,
+    batch_size: int | None = None,
+    max_concurrency: int | None = None,
+) -> List[List[float]]:
+    """
+    Versión async de embed_texts: lotes del tamaño que acepta el proveedor,
+    con hasta `max_concurrency` peticiones a la vez. Conserva el orden de la entrada.
+    """
+    model_id = model_name or _DEFAULT_EMBED_MODEL
+    size = max(1, batch_size or _EMBED_BATCH_SIZE)
+    workers = asyncio.Semaphore(max(1, max_concurrency or _EMBED_CONCURRENCY))
+
+    limpios = [(t or "").replace("\n", " ") for t in texts]
+    if not limpios:
+        return []
+
+    lotes = [limpios[i:i + size] for i in range(0, len(limpios), size)]
+
+    async def _lote(lote: List[str]) -> List[List[float]]:
+        async with workers, clientes.semaforo():
+            return await _aembed_batch(lote, model_id)
+
+    # gather() devuelve en el orden de los lotes, no en el de finalización
+    resultados = await asyncio.gather(*(_lote(lote) for lote in lotes))
+    return [emb for lote in resultados for emb in lote]
+
+
+# ==============================
+# FUNCIONES PÚBLICAS
+# ==============================
+
+@contextmanager
+def token_listener(callback: Callable[[str], Any]) -> Iterator[None]:
+    """
+    Mientras dure el bloque, cada call_llm / acall_llm de este hilo (o tarea)
+    pasa a `callback` los trozos de texto a medida que llegan, además de
+    devolver la respuesta completa. Así la interfaz puede ir mostrando la
+    respuesta de funciones que sólo llaman a call_llm.
+    """
+    token = _token_listener.set(callback)
+    try:
+        yield
+    finally:
+        _token_listener.reset(token)
+
 
-    return (text or "").strip()
+def call_llm(
+    prompt: str,
+    system: str | None = None,
+    model_name: str | None = None,
+    use_cache: bool = True,
+) -> str:
+    """
+    Llama a un modelo de lenguaje de Gemini (con fallback a Groq y caché, ver astream_llm).
+    Bloquea hasta tener la respuesta completa.
+    """
+    return clientes.ejecutar(
+        _juntar(astream_llm(prompt, system, model_name, use_cache), _token_listener.get())
+    )
+
+
+def stream_llm(
+    prompt: str,
+    system: str | None = None,
+    model_name: str | None = None,
+    use_cache: bool = True,
+) -> Iterator[str]:
+    """
+    Versión síncrona de astream_llm: itera los trozos de texto a medida que llegan.
+    """
+    return clientes.iterar(astream_llm(prompt, system, model_name, use_cache))
+
+
+def batch(
+    prompts: List[str],
+    system: str | None = None,
+    model_name: str | None = None,
+    max_concurrency: int | None = None,
+    use_cache: bool = True,
+    return_exceptions: bool = False,
+) -> List[Any]:
+    """
+    Versión síncrona de abatch: responde varios prompts en paralelo, en orden.
+    """
+    return clientes.ejecutar(abatch(prompts, system, model_name, max_concurrency, use_cache, return_exceptions))
 
 
 def embed_text(
@@ -141,20 +432,130 @@ def embed_text(
     de forma directa; si te quedas sin cuota de embeddings, el ej. 8
     marcará error y la interfaz lo mostrará.)
     """
-    model_id = model_name or _DEFAULT_EMBED_MODEL
-    text = (text or "").replace("\n", " ")
+    return clientes.ejecutar(aembed_text(text, model_name))
 
-    try:
-        res: Dict[str, Any] = genai.embed_content(
-            model=model_id,
-            content=text,
-        )  # type: ignore
-    except Exception as e:
-        raise RuntimeError(f"Error al llamar al modelo de embeddings '{model_id}': {e}")
 
-    if isinstance(res, dict):
-        emb = res.get("embedding", [])
-    else:
-        emb = getattr(res, "embedding", None)
+def embed_texts(
+    texts: List[str],
+    model_name: str | None = None,
+    batch_size: int | None = None,
+    max_concurrency: int | None = None,
+) -> List[List[float]]:
+    """
+    Embeddings de varios textos: los agrupa en lotes del tamaño que acepta
+    el proveedor y lanza los lotes en paralelo (con un máximo de peticiones
+    simultáneas). El resultado conserva el orden de la entrada.
+    """
+    return clientes.ejecutar(aembed_texts(texts, model_name, batch_size, max_concurrency))
+
+
+# ==============================
+# BACKENDS DE EMBEDDINGS
+# ==============================
+
+class EmbeddingBackend:
+    """
+    Interfaz de un proveedor de embeddings.
+    - nombre: identifica al backend Y a su espacio de vectores (modelo,
+      dimensión...). Los índices lo guardan para no mezclar vectores de
+      backends distintos.
+    - embed_texts(textos) -> matriz float32 (n, d), en el orden de la entrada.
+    """
+
+    nombre: str = ""
+
+    def embed_texts(self, texts: List[str]) -> np.ndarray:
+        raise NotImplementedError
+
+    def embed_text(self, text: str) -> np.ndarray:
+        return self.embed_texts([text])[0]
+
+
+class GeminiEmbeddings(EmbeddingBackend):
+    """
+    Embeddings del API de Gemini (por lotes y en paralelo, ver embed_texts).
+    """
 
-    return list(emb or [])
+    def __init__(self, model_name: str | None = None):
+        self.model_id = model_name or _DEFAULT_EMBED_MODEL
+        self.nombre = f"gemini:{self.model_id}"
+
+    def embed_texts(self, texts: List[str]) -> np.ndarray:
+        return np.asarray(embed_texts(texts, model_name=self.model_id), dtype=np.float32)
+
+    def embed_text(self, text: str) -> np.ndarray:
+        return np.asarray(embed_text(text, model_name=self.model_id), dtype=np.float32)
+
+
+class LocalEmbeddings(EmbeddingBackend):
+    """
+    Embeddings locales, sin red: n-gramas de caracteres (por defecto de 3 a 5)
+    llevados a `dim` columnas con hashing con signo (una proyección aleatoria
+    del espacio de n-gramas), con frecuencia sublineal y norma 1.
+    No captura sinónimos como un modelo neuronal, pero tolera variaciones de
+    escritura (acentos, plurales, conjugaciones) mejor que las palabras exactas.
+    """
+
+    def __init__(self, dim: int | None = None, n_min: int = 3, n_max: int = 5):
+        self.dim = dim or _LOCAL_EMBED_DIM
+        self.n_min = n_min
+        self.n_max = n_max
+        self.nombre = f"local:ngramas{n_min}-{n_max}:{self.dim}"
+
+    @staticmethod
+    def _preparar(texto: str) -> bytes:
+        # Minúsculas, sin acentos y con un espacio en los bordes de cada palabra
+        t = unicodedata.normalize("NFKD", (texto or "").lower())
+        t = "".join(c for c in t if not unicodedata.combining(c))
+        return (" " + " ".join(re.findall(r"\w+", t)) + " ").encode("utf-8")
+
+    def _vector(self, texto: str) -> np.ndarray:
+        b = np.frombuffer(self._preparar(texto), dtype=np.uint8).astype(np.uint64)
+        v = np.zeros(self.dim, dtype=np.float64)
+        for n in range(self.n_min, self.n_max + 1):
+            m = len(b) - n + 1
+            if m <= 0:
+                continue
+            # Hash polinomial de todos los n-gramas a la vez (uint64 se desborda a propósito)
+            h = np.full(m, n, dtype=np.uint64)
+            for j in range(n):
+                h = h * np.uint64(1000003) + b[j:j + m]
+            h ^= h >> np.uint64(33)
+            h *= np.uint64(0xFF51AFD7ED558CCD)
+            h ^= h >> np.uint64(33)
+            signos = np.where(h >> np.uint64(63), -1.0, 1.0)
+            v += np.bincount((h % np.uint64(self.dim)).astype(np.int64), weights=signos, minlength=self.dim)
+        v = np.sign(v) * np.log1p(np.abs(v))
+        norma = np.linalg.norm(v)
+        return (v / norma if norma > 0 else v).astype(np.float32)
+
+    def embed_texts(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.stack([self._vector(t) for t in texts])
+
+
+_EMBEDDING_BACKENDS: Dict[str, EmbeddingBackend] = {
+    "gemini": GeminiEmbeddings(),
+    "local": LocalEmbeddings(),
+}
+
+
+def register_embedding_backend(alias: str, backend: EmbeddingBackend) -> None:
+    """
+    Agrega (o reemplaza) un backend de embeddings con el alias indicado.
+    """
+    _EMBEDDING_BACKENDS[alias] = backend
+
+
+def get_embedding_backend(alias: str | None = None) -> EmbeddingBackend:
+    """
+    Backend de embeddings por alias; sin alias, el de EMBED_BACKEND (por defecto "gemini").
+    """
+    alias = alias or _EMBED_BACKEND
+    if alias not in _EMBEDDING_BACKENDS:
+        raise RuntimeError(
+            f"Backend de embeddings desconocido: '{alias}'. "
+            f"Disponibles: {', '.join(sorted(_EMBEDDING_BACKENDS))}"
+        )
+    return _EMBEDDING_BACKENDS[alias]
@@ -0,0 +1,142 @@
+# ejercicios/rag_bm25.py
+import math
+import re
+from collections import Counter
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from .rag_retrieval import top_k
+
+_TOKEN_RE = re.compile(r"[^a-záéíóúüñ0-9]+")
+
+
+def tokenizar(texto: str) -> List[str]:
+    """
+    Minúsculas y sólo letras/dígitos (incluye acentos y ñ).
+    """
+    return _TOKEN_RE.sub(" ", (texto or "").lower()).split()
+
+
+def vectores_terminos(textos: List[str]) -> np.ndarray:
+    """
+    Matriz (n, vocabulario) de frecuencias de términos de unos pocos textos
+    (por ejemplo, los candidatos de una búsqueda) para compararlos entre sí
+    cuando no hay embeddings.
+    """
+    tokens = [tokenizar(t) for t in textos]
+    vocab = {t: i for i, t in enumerate(sorted({t for ts in tokens for t in ts}))}
+    m = np.zeros((len(textos), max(1, len(vocab))), dtype=np.float32)
+    for i, ts in enumerate(tokens):
+        for t, tf in Counter(ts).items():
+            m[i, vocab[t]] = tf
+    return m
+
+
+class IndiceBM25:
+    """
+    Índice invertido con puntaje BM25.
+    - postings: término -> (ids de chunk, frecuencia en cada chunk)
+    - el peso BM25 de cada posting no depende de la pregunta, así que se
+      precalcula; una búsqueda sólo recorre los postings de sus términos.
+    """
+
+    def __init__(
+        self,
+        postings: Dict[str, Tuple[List[int], List[int]]],
+        longitudes: List[int],
+        k1: float = 1.5,
+        b: float = 0.75,
+    ):
+        self.k1 = k1
+        self.b = b
+        self.longitudes = np.asarray(longitudes, dtype=np.float32)
+        self.n_docs = len(longitudes)
+        self.avgdl = float(self.longitudes.mean()) if self.n_docs else 0.0
+        self._postings = postings
+        self._pesos: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+
+        norma = self.k1 * (1.0 - self.b + self.b * self.longitudes / (self.avgdl or 1.0))
+        for termino, (docs, tfs) in postings.items():
+            d = np.asarray(docs, dtype=np.int64)
+            tf = np.asarray(tfs, dtype=np.float32)
+            df = len(d)
+            idf = math.log(1.0 + (self.n_docs - df + 0.5) / (df + 0.5))
+            self._pesos[termino] = (d, idf * tf * (self.k1 + 1.0) / (tf + norma[d]))
+
+    @classmethod
+    def construir(cls, chunks: List[str], k1: float = 1.5, b: float = 0.75) -> "IndiceBM25":
+        postings: Dict[str, Tuple[List[int], List[int]]] = {}
+        longitudes: List[int] = []
+        for i, ch in enumerate(chunks):
+            tokens = tokenizar(ch)
+            longitudes.append(len(tokens))
+            for termino, tf in Counter(tokens).items():
+                docs, tfs = postings.setdefault(termino, ([], []))
+                docs.append(i)
+                tfs.append(tf)
+        return cls(postings, longitudes, k1=k1, b=b)
+
+    @classmethod
+    def unir(cls, indices: List["IndiceBM25"]) -> "IndiceBM25":
+        """
+        Un solo índice a partir de varios (por ejemplo, uno por PDF) sin re-tokenizar:
+        los ids de chunk de cada índice se desplazan detrás de los del anterior.
+        """
+        postings: Dict[str, Tuple[List[int], List[int]]] = {}
+        longitudes: List[int] = []
+        base = 0
+        for ind in indices:
+            for termino, (docs, tfs) in ind._postings.items():
+                d, tf = postings.setdefault(termino, ([], []))
+                d.extend(base + i for i in docs)
+                tf.extend(tfs)
+            longitudes.extend(ind.longitudes.astype(int).tolist())
+            base += ind.n_docs
+        k1 = indices[0].k1 if indices else 1.5
+        b = indices[0].b if indices else 0.75
+        return cls(postings, longitudes, k1=k1, b=b)
+
+    def __len__(self) -> int:
+        return self.n_docs
+
+    def buscar(self, pregunta: str, k: int = 3) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Devuelve (índices, puntajes) de los k chunks con mejor BM25.
+        Sólo aparecen chunks que contienen algún término de la pregunta,
+        así que puede devolver menos de k.
+        """
+        terminos = [t for t in set(tokenizar(pregunta)) if t in self._pesos]
+        if not terminos:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        docs = np.concatenate([self._pesos[t][0] for t in terminos])
+        pesos = np.concatenate([self._pesos[t][1] for t in terminos])
+        candidatos, inversa = np.unique(docs, return_inverse=True)
+        puntajes = np.bincount(inversa, weights=pesos).astype(np.float32)
+        sel = top_k(puntajes, k)
+        return candidatos[sel], puntajes[sel]
+
+    def puntajes(self, pregunta: str, ids: np.ndarray) -> np.ndarray:
+        """
+        Puntaje BM25 de la pregunta para los chunks indicados (0 si no comparten términos).
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        terminos = [t for t in set(tokenizar(pregunta)) if t in self._pesos]
+        if not terminos or not len(ids):
+            return np.zeros(len(ids), dtype=np.float32)
+        docs = np.concatenate([self._pesos[t][0] for t in terminos])
+        pesos = np.concatenate([self._pesos[t][1] for t in terminos])
+        return np.bincount(docs, weights=pesos, minlength=self.n_docs)[ids].astype(np.float32)
+
+    def a_dict(self) -> Dict[str, Any]:
+        return {
+            "k1": self.k1,
+            "b": self.b,
+            "longitudes": self.longitudes.astype(int).tolist(),
+            "postings": self._postings,
+        }
+
+    @classmethod
+    def desde_dict(cls, data: Dict[str, Any]) -> "IndiceBM25":
+        postings = {t: (p[0], p[1]) for t, p in data["postings"].items()}
+        return cls(postings, data["longitudes"], k1=data.get("k1", 1.5), b=data.get("b", 0.75))
@@ -0,0 +1,133 @@
+# ejercicios/rag_cache.py
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .rag_retrieval import normalizar
+
+_EMB_MAX = int(os.getenv("RAG_CACHE_EMB_MAX", "1024"))
+_EMB_TTL_S = float(os.getenv("RAG_CACHE_EMB_TTL_S", "3600"))
+_RESP_MAX = int(os.getenv("RAG_CACHE_RESP_MAX", "256"))
+_RESP_TTL_S = float(os.getenv("RAG_CACHE_RESP_TTL_S", "3600"))
+_RESP_UMBRAL = float(os.getenv("RAG_CACHE_RESP_UMBRAL", "0.95"))
+
+
+class CacheLRU:
+    """
+    Caché en memoria con tamaño máximo (se expulsa lo menos usado) y TTL.
+    Segura entre hilos. Lleva contadores de aciertos y fallos.
+    """
+
+    def __init__(self, max_items: int, ttl_s: float):
+        self.max_items = max(1, max_items)
+        self.ttl_s = ttl_s
+        self._datos: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def get(self, clave: Hashable) -> Optional[Any]:
+        with self._lock:
+            item = self._datos.get(clave)
+            if item is None or time.monotonic() - item[0] > self.ttl_s:
+                if item is not None:
+                    del self._datos[clave]
+                self.fallos += 1
+                return None
+            self._datos.move_to_end(clave)
+            self.aciertos += 1
+            return item[1]
+
+    def put(self, clave: Hashable, valor: Any) -> None:
+        with self._lock:
+            self._datos[clave] = (time.monotonic(), valor)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_items:
+                self._datos.popitem(last=False)
+
+    def estadisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.aciertos + self.fallos
+            return {
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "tasa_aciertos": self.aciertos / total if total else 0.0,
+                "tamano": len(self._datos),
+            }
+
+
+class CacheSemantica:
+    """
+    Caché de respuestas por similitud: si una pregunta nueva está a coseno
+    >= umbral de una ya respondida sobre la misma versión del índice, se
+    devuelve la respuesta guardada sin llamar al LLM.
+    """
+
+    def __init__(self, umbral: float, max_items: int, ttl_s: float):
+        self.umbral = umbral
+        self.max_items = max(1, max_items)
+        self.ttl_s = ttl_s
+        # versión del índice -> lista de (instante, vector normalizado, respuesta)
+        self._datos: Dict[str, List[Tuple[float, np.ndarray, str]]] = {}
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def _vigentes(self, version: str) -> List[Tuple[float, np.ndarray, str]]:
+        ahora = time.monotonic()
+        items = [it for it in self._datos.get(version, []) if ahora - it[0] <= self.ttl_s]
+        self._datos[version] = items
+        return items
+
+    def buscar(self, version: str, emb: Sequence[float] | np.ndarray) -> Optional[str]:
+        with self._lock:
+            items = self._vigentes(version)
+            if items:
+                q = normalizar(emb)[0]
+                sims = np.stack([it[1] for it in items]) @ q
+                mejor = int(np.argmax(sims))
+                if sims[mejor] >= self.umbral:
+                    self.aciertos += 1
+                    return items[mejor][2]
+            self.fallos += 1
+            return None
+
+    def guardar(self, version: str, emb: Sequence[float] | np.ndarray, respuesta: str) -> None:
+        with self._lock:
+            items = self._vigentes(version)
+            items.append((time.monotonic(), normalizar(emb)[0], respuesta))
+            # Tope global: se descartan las respuestas más antiguas
+            total = sum(len(v) for v in self._datos.values())
+            while total > self.max_items:
+                version_vieja = min(
+                    (v for v in self._datos if self._datos[v]), key=lambda v: self._datos[v][0][0]
+                )
+                self._datos[version_vieja].pop(0)
+                total -= 1
+
+    def estadisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.aciertos + self.fallos
+            return {
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "tasa_aciertos": self.aciertos / total if total else 0.0,
+                "tamano": sum(len(v) for v in self._datos.values()),
+                "umbral": self.umbral,
+            }
+
+
+# Cachés compartidas por el ejercicio 8
+cache_embeddings = CacheLRU(_EMB_MAX, _EMB_TTL_S)
+cache_respuestas = CacheSemantica(_RESP_UMBRAL, _RESP_MAX, _RESP_TTL_S)
+
+
+def estadisticas_cache() -> Dict[str, Dict[str, Any]]:
+    return {
+        "embeddings": cache_embeddings.estadisticas(),
+        "respuestas": cache_respuestas.estadisticas(),
+    }
@@ -0,0 +1,166 @@
+# ejercicios/rag_chunks.py
+import bisect
+import re
+from collections import deque
+from typing import Any, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+import numpy as np
+
+_PALABRA = re.compile(r"\S+")
+_FIN_ORACION = (".", "!", "?", ":", ";")
+
+# Con oraciones=True, el corte se mueve al último fin de oración que esté
+# en el tramo final de la ventana (a partir de esta fracción del tamaño).
+_FRACCION_MIN_ORACION = 0.7
+
+
+def iterar_chunks(
+    piezas: Iterable[str],
+    chunk_size: int = 900,
+    overlap: int = 200,
+    oraciones: bool = False,
+) -> Iterator[Tuple[int, int]]:
+    """
+    Trocea en una sola pasada y genera (inicio, fin) de cada chunk como
+    posiciones de carácter en el texto que resulta de concatenar las piezas
+    (por ejemplo, las páginas del PDF a medida que se extraen).
+    Cada chunk tiene hasta chunk_size palabras y comparte `overlap` palabras
+    con el anterior. No se copia el texto: sólo se guardan posiciones.
+    """
+    overlap = max(0, min(overlap, chunk_size - 1))
+    ventana: deque = deque()  # (inicio, fin, ¿cierra oración?) de cada palabra de la ventana
+    nuevas = 0  # palabras que todavía no salieron en ningún chunk
+    base = 0
+
+    for pieza in piezas:
+        for m in _PALABRA.finditer(pieza):
+            ventana.append((base + m.start(), base + m.end(), m.group().endswith(_FIN_ORACION)))
+            nuevas += 1
+            if len(ventana) < chunk_size:
+                continue
+
+            corte = len(ventana)
+            if oraciones:
+                # Un corte en la palabra `overlap` o antes no haría avanzar la ventana
+                desde = max(int(chunk_size * _FRACCION_MIN_ORACION), overlap)
+                for j in range(len(ventana) - 1, desde - 1, -1):
+                    if ventana[j][2]:
+                        corte = j + 1
+                        break
+
+            yield ventana[0][0], ventana[corte - 1][1]
+            # El siguiente chunk empieza `overlap` palabras antes del corte
+            for _ in range(max(0, corte - overlap)):
+                ventana.popleft()
+            nuevas = len(ventana) - overlap
+        base += len(pieza)
+
+    if ventana and nuevas > 0:
+        yield ventana[0][0], ventana[-1][1]
+
+
+class Fragmentos(Sequence[str]):
+    """
+    Chunks de un documento guardados como posiciones en un único texto:
+    - texto: el texto completo (una sola copia);
+    - offsets: matriz (n, 2) con (inicio, fin) de cada chunk;
+    - paginas: (posición donde empieza, número de página) de cada página con texto.
+    Se comporta como una lista de strings (len, índice, iteración).
+    """
+
+    def __init__(
+        self,
+        texto: str,
+        offsets: np.ndarray | Sequence[Sequence[int]],
+        paginas: Sequence[Sequence[int]] = (),
+    ):
+        self.texto = texto
+        self.offsets = np.asarray(offsets, dtype=np.int64).reshape(-1, 2)
+        self._inicio_pag = [int(p[0]) for p in paginas]
+        self._num_pag = [int(p[1]) for p in paginas]
+
+    def __len__(self) -> int:
+        return int(self.offsets.shape[0])
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        ini, fin = self.offsets[i]
+        return self.texto[ini:fin]
+
+    def __iter__(self) -> Iterator[str]:
+        for ini, fin in self.offsets.tolist():
+            yield self.texto[ini:fin]
+
+    def span(self, i: int) -> Tuple[int, int]:
+        ini, fin = self.offsets[i]
+        return int(ini), int(fin)
+
+    def pagina(self, i: int) -> int | None:
+        """
+        Número de página (empezando en 1) donde comienza el chunk.
+        """
+        if not self._inicio_pag:
+            return None
+        j = bisect.bisect_right(self._inicio_pag, int(self.offsets[i][0])) - 1
+        return self._num_pag[max(0, j)] + 1
+
+    def cita(self, i: int) -> str:
+        ini, fin = self.span(i)
+        pag = self.pagina(i)
+        pref = f"pág. {pag}, " if pag is not None else ""
+        return f"{pref}caracteres {ini}-{fin}"
+
+    def a_dict(self) -> Dict[str, Any]:
+        return {
+            "texto": self.texto,
+            "offsets": self.offsets.tolist(),
+            "paginas": [[i, n] for i, n in zip(self._inicio_pag, self._num_pag)],
+        }
+
+    @classmethod
+    def desde_dict(cls, data: Dict[str, Any]) -> "Fragmentos":
+        return cls(data["texto"], data["offsets"], data.get("paginas", []))
+
+
+class TroceoEnFlujo:
+    """
+    Troceo incremental de páginas (número, texto): `offsets(paginas)` genera
+    el (inicio, fin) de cada chunk a medida que llegan las páginas y
+    `texto(inicio, fin)` devuelve su contenido en ese momento. Al terminar,
+    `fragmentos(offsets)` arma los Fragmentos sobre el texto completo.
+    Las páginas se unen con un salto de línea.
+    """
+
+    def __init__(self, chunk_size: int, overlap: int, oraciones: bool = False):
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self.oraciones = oraciones
+        self._partes: List[str] = []
+        self._inicios: List[Tuple[int, int]] = []  # (posición, número de página)
+        self._posiciones: List[int] = []
+
+    def _piezas(self, paginas: Iterable[Tuple[int, str]]) -> Iterator[str]:
+        pos = 0
+        for n, txt in paginas:
+            if not txt:
+                continue
+            pieza = txt + "\n"
+            self._inicios.append((pos, n))
+            self._posiciones.append(pos)
+            self._partes.append(pieza)
+            pos += len(pieza)
+            yield pieza
+
+    def offsets(self, paginas: Iterable[Tuple[int, str]]) -> Iterator[Tuple[int, int]]:
+        return iterar_chunks(self._piezas(paginas), self.chunk_size, self.overlap, self.oraciones)
+
+    def texto(self, inicio: int, fin: int) -> str:
+        a = bisect.bisect_right(self._posiciones, inicio) - 1
+        b = bisect.bisect_left(self._posiciones, fin)
+        base = self._posiciones[a]
+        return "".join(self._partes[a:b])[inicio - base:fin - base]
+
+    def fragmentos(self, offsets: Sequence[Sequence[int]]) -> Fragmentos:
+        return Fragmentos("".join(self._partes), offsets, self._inicios)
+
@@ -0,0 +1,68 @@
+# ejercicios/rag_contexto.py
+import os
+import re
+from typing import Any, Dict, List
+
+from .llm_tokens import CARACTERES_POR_TOKEN, estimar_tokens
+
+# Presupuesto de tokens para los fragmentos del prompt
+_PRESUPUESTO_TOKENS = int(os.getenv("RAG_CONTEXTO_TOKENS", "1200"))
+
+_SEPARADOR = "\n\n---\n\n"
+_FIN_ORACION = re.compile(r"(?<=[.!?;:])\s+")
+
+
+def _recortar_a_oraciones(texto: str, max_tokens: int) -> str:
+    """
+    Las oraciones iniciales del texto que caben en max_tokens (puede ser "").
+    """
+    limite = int(max_tokens * CARACTERES_POR_TOKEN)
+    corte = ""
+    for m in _FIN_ORACION.finditer(texto):
+        if m.start() > limite:
+            break
+        corte = texto[:m.start()]
+    return corte.strip()
+
+
+def empaquetar_contexto(fragmentos: List[str], presupuesto_tokens: int | None = None) -> Dict[str, Any]:
+    """
+    Llena el presupuesto de tokens con los fragmentos en el orden recibido
+    (de mayor a menor puntaje). El primero que no cabe entero se recorta en
+    un fin de oración y ahí se detiene.
+    Devuelve {"contexto", "fragmentos" (usados), "recortado", "tokens"}.
+    """
+    presupuesto = presupuesto_tokens or _PRESUPUESTO_TOKENS
+    sep_tokens = estimar_tokens(_SEPARADOR)
+    partes: List[str] = []
+    usados = 0
+    recortado = False
+
+    for frag in fragmentos:
+        frag = (frag or "").strip()
+        if not frag:
+            continue
+        costo_sep = sep_tokens if partes else 0
+        restante = presupuesto - usados - costo_sep
+        tokens = estimar_tokens(frag)
+        if tokens <= restante:
+            partes.append(frag)
+            usados += costo_sep + tokens
+            continue
+        parcial = _recortar_a_oraciones(frag, restante)
+        if not parcial and not partes:
+            # Ni una oración del mejor fragmento cabe: se corta en un límite de palabra
+            parcial = frag[:int(restante * CARACTERES_POR_TOKEN)].rsplit(" ", 1)[0].strip()
+        if parcial:
+            partes.append(parcial)
+            usados += costo_sep + estimar_tokens(parcial)
+            recortado = True
+        break
+
+    contexto = _SEPARADOR.join(partes)
+    return {
+        "contexto": contexto,
+        "fragmentos": len(partes),
+        "recortado": recortado,
+        "tokens": estimar_tokens(contexto),
+    }
@@ -0,0 +1,207 @@
+# ejercicios/rag_corpus.py
+import bisect
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from .rag_bm25 import IndiceBM25
+from .rag_index import BASE_DIR, INDEX_DIR, borrar_indice, hash_archivo
+from .rag_pdf import borrar_paginas
+from .rag_retrieval import crear_indice
+
+# Carpeta de documentos del proyecto
+DOCS_DIR = BASE_DIR / "documentos"
+
+# Documentos ya preparados en este proceso (hash del PDF -> índice del documento)
+_DOCUMENTOS: Dict[str, Dict[str, Any]] = {}
+
+# Índices globales del corpus en este proceso, con las claves de los documentos que cubren
+_DENSO: Dict[str, Any] = {"claves": (), "indice": None}
+_LEXICO: Dict[str, Any] = {"claves": (), "indice": None}
+_LOCK = threading.Lock()
+
+
+def _ruta_manifiesto(carpeta: Path) -> Path:
+    h = hashlib.sha256(str(carpeta.resolve()).encode("utf-8")).hexdigest()[:12]
+    return INDEX_DIR / f"corpus_{h}.json"
+
+
+def _leer_manifiesto(ruta: Path) -> Dict[str, Dict[str, Any]]:
+    """
+    Formato: {nombre_pdf: {"mtime_ns", "size", "hash", "clave"}}, en orden de alta.
+    """
+    if not ruta.exists():
+        return {}
+    try:
+        with ruta.open("r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except Exception:
+        return {}
+
+
+def _guardar_manifiesto(ruta: Path, manifiesto: Dict[str, Dict[str, Any]]) -> None:
+    try:
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        tmp = ruta.with_name(ruta.name + ".tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump(manifiesto, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, ruta)
+    except Exception:
+        pass
+
+
+class Corpus:
+    """
+    Los documentos del corpus (cada uno con sus chunks y vectores) vistos como
+    una sola lista de chunks: el chunk global i pertenece al documento cuyo
+    rango de posiciones lo contiene.
+    """
+
+    def __init__(self, nombres: List[str], documentos: List[Dict[str, Any]]):
+        self.nombres = nombres
+        self.documentos = documentos
+        self._inicios: List[int] = []
+        total = 0
+        for doc in documentos:
+            self._inicios.append(total)
+            total += len(doc["chunks"])
+        self._total = total
+
+    def __len__(self) -> int:
+        return self._total
+
+    def _ubicar(self, i: int) -> Tuple[int, int]:
+        d = bisect.bisect_right(self._inicios, int(i)) - 1
+        return d, int(i) - self._inicios[d]
+
+    def chunk(self, i: int) -> str:
+        d, j = self._ubicar(i)
+        return self.documentos[d]["chunks"][j]
+
+    def cita(self, i: int) -> str:
+        d, j = self._ubicar(i)
+        return self.documentos[d]["chunks"].cita(j)
+
+    def origen(self, i: int) -> str:
+        return self.nombres[self._ubicar(i)[0]]
+
+    def vectores(self, indices: Sequence[int]) -> np.ndarray:
+        """
+        Vectores (ya embebidos) de los chunks globales indicados.
+        """
+        return np.stack([np.asarray(self.documentos[d]["vectores"][j]) for d, j in map(self._ubicar, indices)])
+
+    def _claves(self) -> Tuple[str, ...]:
+        return tuple(doc["clave"] for doc in self.documentos)
+
+    def indice_denso(self):
+        """
+        Índice de vectores de todo el corpus. Si desde la última consulta sólo se
+        agregaron documentos al final, se insertan en el índice existente;
+        si se modificó o quitó alguno, se reconstruye con los vectores ya
+        guardados (sin volver a llamar al API de embeddings).
+        """
+        claves = self._claves()
+        with _LOCK:
+            previas = _DENSO["claves"]
+            if _DENSO["indice"] is not None and claves[:len(previas)] == previas:
+                for doc in self.documentos[len(previas):]:
+                    _DENSO["indice"].agregar(doc["vectores"])
+            else:
+                vectores = np.concatenate([np.asarray(doc["vectores"]) for doc in self.documentos])
+                _DENSO["indice"] = crear_indice(vectores, normalizado=True)
+            _DENSO["claves"] = claves
+            return _DENSO["indice"]
+
+    def indice_lexico(self, cargar: Callable[[str, List[str]], IndiceBM25]) -> IndiceBM25:
+        """
+        BM25 de todo el corpus, uniendo los índices guardados de cada documento.
+        """
+        claves = self._claves()
+        with _LOCK:
+            if _LEXICO["indice"] is None or _LEXICO["claves"] != claves:
+                _LEXICO["indice"] = IndiceBM25.unir(
+                    [cargar(doc["clave"], doc["chunks"]) for doc in self.documentos]
+                )
+                _LEXICO["claves"] = claves
+            return _LEXICO["indice"]
+
+
+def sincronizar_corpus(
+    carpeta: str,
+    preparar: Callable[[str, str], Dict[str, Any]],
+) -> Corpus:
+    """
+    Revisa los PDF de la carpeta contra el manifiesto guardado:
+    - sin cambios de mtime/tamaño se confía en el hash guardado;
+    - si cambiaron, se recalcula el hash y sólo se re-indexa si el contenido cambió;
+    - los PDF que ya no están se quitan (junto con su índice y sus páginas en disco).
+    `preparar(ruta, hash)` devuelve el índice del documento (ver ej8_rag._preparar_documento).
+    """
+    dir_docs = Path(carpeta)
+    ruta_man = _ruta_manifiesto(dir_docs)
+    previo = _leer_manifiesto(ruta_man)
+    en_disco = {p.name: p for p in sorted(dir_docs.glob("*.pdf"))} if dir_docs.exists() else {}
+
+    manifiesto: Dict[str, Dict[str, Any]] = {}
+    obsoletas: List[str] = []
+    hashes_obsoletos: List[str] = []
+
+    # Se respeta el orden de alta: los nuevos quedan al final
+    nombres = [n for n in previo if n in en_disco] + [n for n in en_disco if n not in previo]
+    for nombre in nombres:
+        st = en_disco[nombre].stat()
+        info = previo.get(nombre)
+        if info and info.get("mtime_ns") == st.st_mtime_ns and info.get("size") == st.st_size:
+            pdf_hash = info["hash"]
+        else:
+            pdf_hash = hash_archivo(str(en_disco[nombre]))
+            if info and info.get("hash") != pdf_hash:
+                hashes_obsoletos.append(info["hash"])
+                if info.get("clave"):
+                    obsoletas.append(info["clave"])
+        manifiesto[nombre] = {
+            "mtime_ns": st.st_mtime_ns,
+            "size": st.st_size,
+            "hash": pdf_hash,
+            "clave": info.get("clave") if info and info.get("hash") == pdf_hash else None,
+        }
+    for nombre, info in previo.items():
+        if nombre not in en_disco:
+            hashes_obsoletos.append(info.get("hash"))
+            if info.get("clave"):
+                obsoletas.append(info["clave"])
+
+    documentos: List[Dict[str, Any]] = []
+    usados: List[str] = []
+    for nombre, info in manifiesto.items():
+        doc = _DOCUMENTOS.get(info["hash"])
+        if doc is None:
+            doc = preparar(str(en_disco[nombre]), info["hash"])
+            _DOCUMENTOS[info["hash"]] = doc
+        info["clave"] = doc["clave"]
+        if len(doc["chunks"]):
+            documentos.append(doc)
+            usados.append(nombre)
+
+    vigentes = {info["clave"] for info in manifiesto.values()}
+    for clave in obsoletas:
+        if clave not in vigentes:
+            borrar_indice(clave)
+    hashes = {info["hash"] for info in manifiesto.values()}
+    for h in hashes_obsoletos:
+        if h and h not in hashes:
+            borrar_paginas(h)
+    for h in [h for h in _DOCUMENTOS if h not in hashes]:
+        del _DOCUMENTOS[h]
+
+    if manifiesto != previo:
+        _guardar_manifiesto(ruta_man, manifiesto)
+
+    return Corpus(usados, documentos)
@@ -0,0 +1,180 @@
+# ejercicios/rag_index.py
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+
+from .rag_chunks import Fragmentos
+from .rag_store import abrir_vectores, escribir_vectores
+
+# Carpeta raíz del proyecto (donde está main.py)
+BASE_DIR = Path(__file__).resolve().parents[1]
+
+# Carpeta donde se guardan los índices de embeddings por PDF
+INDEX_DIR = Path(os.getenv("RAG_INDEX_DIR", str(BASE_DIR / "indices_rag")))
+
+# Tipo con el que se guardan los vectores en disco (float32 o float16)
+_VECTOR_DTYPE = os.getenv("RAG_VECTOR_DTYPE", "float32")
+
+# Versión del formato del índice en disco (JSON + .vec); otra versión se reconstruye
+FORMATO = 3
+
+
+def hash_archivo(path: str) -> str:
+    """
+    SHA-256 del contenido del archivo (leído por bloques).
+    """
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for bloque in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def clave_indice(
+    pdf_hash: str,
+    chunk_size: int,
+    overlap: int,
+    embed_backend: str,
+    oraciones: bool = False,
+    limpieza: bool = False,
+) -> str:
+    """
+    Clave del índice: cambia si cambia el PDF, el troceado, la limpieza o el backend de embeddings
+    (nombre del backend, que incluye el modelo: vectores de backends distintos no se mezclan).
+    """
+    datos = json.dumps(
+        {
+            "pdf": pdf_hash,
+            "chunk_size": chunk_size,
+            "overlap": overlap,
+            "oraciones": oraciones,
+            "limpieza": limpieza,
+            "embed_backend": embed_backend,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(datos.encode("utf-8")).hexdigest()[:32]
+
+
+def _ruta_indice(clave: str) -> Path:
+    return INDEX_DIR / f"{clave}.json"
+
+
+def _ruta_vectores(clave: str) -> Path:
+    return INDEX_DIR / f"{clave}.vec"
+
+
+def _ruta_lexico(clave: str) -> Path:
+    return INDEX_DIR / f"{clave}.bm25.json"
+
+
+def _leer_json(ruta: Path) -> Optional[Dict[str, Any]]:
+    if not ruta.exists():
+        return None
+    try:
+        with ruta.open("r", encoding="utf-8") as f:
+            data = json.load(f)
+    except Exception:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def _escribir_json(ruta: Path, data: Dict[str, Any]) -> None:
+    """
+    Escritura atómica (archivo temporal + reemplazo).
+    """
+    try:
+        INDEX_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = ruta.with_name(ruta.name + ".tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, ruta)
+    except Exception:
+        # Si no se puede escribir el índice, el ejercicio sigue funcionando sin caché.
+        pass
+
+
+def cargar_indice(clave: str) -> Optional[Dict[str, Any]]:
+    """
+    Lee un índice guardado. Devuelve None si no existe, está corrupto o es de
+    otro formato (en ese caso se vuelve a construir).
+    - {clave}.json: {"formato", "meta", "fragmentos", "vectores": bool}
+      ("fragmentos": texto completo + posiciones de cada chunk, ver rag_chunks.Fragmentos)
+    - {clave}.vec: matriz de vectores normalizados (ver rag_store), abierta con mmap.
+    "vectores" es None si los embeddings todavía no se pudieron calcular.
+    """
+    data = _leer_json(_ruta_indice(clave))
+    if data is None or data.get("formato") != FORMATO:
+        return None
+    try:
+        chunks = Fragmentos.desde_dict(data["fragmentos"])
+    except Exception:
+        return None
+    vectores = None
+    if data.get("vectores"):
+        try:
+            vectores = abrir_vectores(_ruta_vectores(clave))
+        except Exception:
+            return None
+        if len(vectores) != len(chunks):
+            return None
+    del data["fragmentos"]
+    data["chunks"] = chunks
+    data["vectores"] = vectores
+    return data
+
+
+def guardar_indice(
+    clave: str,
+    chunks: Fragmentos,
+    vectores: Optional[Sequence[Sequence[float]] | np.ndarray],
+    meta: Dict[str, Any],
+    dtype: str | None = None,
+) -> None:
+    """
+    Guarda los vectores (normalizados, en binario) y luego los chunks + metadatos.
+    El JSON se escribe al final: sólo apunta a vectores que ya están completos en disco.
+    """
+    if vectores is not None:
+        try:
+            INDEX_DIR.mkdir(parents=True, exist_ok=True)
+            escribir_vectores(_ruta_vectores(clave), vectores, dtype=dtype or _VECTOR_DTYPE)
+        except Exception:
+            return
+    _escribir_json(
+        _ruta_indice(clave),
+        {
+            "formato": FORMATO,
+            "meta": meta,
+            "fragmentos": chunks.a_dict(),
+            "vectores": vectores is not None,
+        },
+    )
+
+
+def cargar_lexico(clave: str) -> Optional[Dict[str, Any]]:
+    """
+    Índice BM25 guardado junto al de embeddings (ver rag_bm25.IndiceBM25.a_dict).
+    """
+    return _leer_json(_ruta_lexico(clave))
+
+
+def guardar_lexico(clave: str, data: Dict[str, Any]) -> None:
+    _escribir_json(_ruta_lexico(clave), data)
+
+
+def borrar_indice(clave: str) -> None:
+    """
+    Elimina los archivos del índice (embeddings y BM25) de una clave.
+    """
+    for ruta in (_ruta_indice(clave), _ruta_vectores(clave), _ruta_lexico(clave)):
+        try:
+            ruta.unlink()
+        except FileNotFoundError:
+            pass
+        except Exception:
+            pass
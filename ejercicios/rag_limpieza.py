@@ -0,0 +1,147 @@
+# ejercicios/rag_limpieza.py
+import hashlib
+import math
+import re
+import zlib
+from collections import Counter
+from typing import Dict, Iterable, Iterator, List, Set, Tuple
+
+import numpy as np
+
+# Páginas que se miran para aprender qué líneas se repiten (encabezados, pies, avisos)
+_MUESTRA_PAGINAS = 12
+# Una línea es "de plantilla" si aparece en al menos esta fracción de las páginas de la muestra
+_FRACCION_REPETIDA = 0.5
+_MIN_PAGINAS = 3
+# Sólo se consideran las primeras y últimas líneas de cada página (donde van encabezados y pies)
+_LINEAS_BORDE = 3
+
+# MinHash: número de permutaciones y bandas LSH (filas por banda = permutaciones / bandas)
+_PERMUTACIONES = 128
+_BANDAS = 32
+_SHINGLE = 3
+_PRIMO = 4294967311  # primo > 2**32
+
+_rng = np.random.default_rng(20240607)
+_A = _rng.integers(1, 2**32 - 1, size=_PERMUTACIONES, dtype=np.uint64)
+_B = _rng.integers(0, 2**32 - 1, size=_PERMUTACIONES, dtype=np.uint64)
+
+
+def _normalizar_linea(linea: str) -> str:
+    """
+    Forma canónica para comparar líneas entre páginas: sin espacios extra,
+    en minúsculas y con los dígitos igualados (así "Página 3 de 10" y
+    "Página 4 de 10" cuentan como la misma línea).
+    """
+    return re.sub(r"\d+", "0", " ".join(linea.split()).lower())
+
+
+def _bordes(lineas: List[str]) -> Set[int]:
+    """
+    Posiciones de las primeras y últimas _LINEAS_BORDE líneas no vacías.
+    """
+    con_texto = [i for i, l in enumerate(lineas) if l.strip()]
+    return set(con_texto[:_LINEAS_BORDE] + con_texto[-_LINEAS_BORDE:])
+
+
+def limpiar_paginas(
+    paginas: Iterable[Tuple[int, str]],
+    estadisticas: Dict[str, int] | None = None,
+) -> Iterator[Tuple[int, str]]:
+    """
+    Quita de cada página los encabezados y pies: líneas del borde superior o
+    inferior que se repiten en muchas páginas.
+    Aprende el conjunto de líneas con las primeras páginas y luego sigue
+    limpiando el resto a medida que llegan (no espera a todo el documento).
+    Si se pasa `estadisticas`, se llena con {"lineas_repetidas", "lineas_quitadas"}.
+    """
+    stats = estadisticas if estadisticas is not None else {}
+    stats.setdefault("lineas_repetidas", 0)
+    stats.setdefault("lineas_quitadas", 0)
+    it = iter(paginas)
+
+    muestra: List[Tuple[int, str]] = []
+    for pag in it:
+        muestra.append(pag)
+        if len(muestra) >= _MUESTRA_PAGINAS:
+            break
+
+    repetidas: Set[str] = set()
+    con_texto = [txt for _, txt in muestra if txt]
+    if len(con_texto) >= _MIN_PAGINAS:
+        conteo: Counter = Counter()
+        for txt in con_texto:
+            lineas = txt.splitlines()
+            conteo.update({_normalizar_linea(lineas[i]) for i in _bordes(lineas)})
+        minimo = max(2, math.ceil(_FRACCION_REPETIDA * len(con_texto)))
+        repetidas = {l for l, c in conteo.items() if c >= minimo}
+    stats["lineas_repetidas"] = len(repetidas)
+
+    def _limpiar(txt: str) -> str:
+        if not repetidas or not txt:
+            return txt
+        lineas = txt.splitlines()
+        borde = _bordes(lineas)
+        quedan = [
+            l for i, l in enumerate(lineas) if i not in borde or _normalizar_linea(l) not in repetidas
+        ]
+        stats["lineas_quitadas"] += len(lineas) - len(quedan)
+        return "\n".join(quedan)
+
+    for n, txt in muestra:
+        yield n, _limpiar(txt)
+    for n, txt in it:
+        yield n, _limpiar(txt)
+
+
+def _firma_minhash(texto: str) -> np.ndarray | None:
+    palabras = texto.lower().split()
+    if len(palabras) < _SHINGLE:
+        return None
+    shingles = {" ".join(palabras[i:i + _SHINGLE]) for i in range(len(palabras) - _SHINGLE + 1)}
+    x = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64)
+    # (a * x + b) mod p, sin desbordar uint64 porque a, x < 2**32
+    return ((np.outer(_A, x) + _B[:, None]) % _PRIMO).min(axis=1)
+
+
+class Deduplicador:
+    """
+    Detecta, en orden de llegada, chunks idénticos (hash del texto normalizado)
+    y casi idénticos (Jaccard estimado con MinHash >= umbral, candidatos por LSH).
+    """
+
+    def __init__(self, umbral: float = 0.9):
+        self.umbral = umbral
+        self._vistos: Set[str] = set()
+        self._buckets: Dict[Tuple[int, bytes], List[int]] = {}
+        self._firmas: List[np.ndarray] = []
+        self.exactos = 0
+        self.parecidos = 0
+
+    def repetido(self, texto: str) -> bool:
+        """
+        True si el texto repite uno ya visto; si no, lo registra y devuelve False.
+        """
+        h = hashlib.sha1(" ".join(texto.lower().split()).encode("utf-8")).hexdigest()
+        if h in self._vistos:
+            self.exactos += 1
+            return True
+        self._vistos.add(h)
+
+        firma = _firma_minhash(texto)
+        if firma is None:
+            return False
+        filas = _PERMUTACIONES // _BANDAS
+        claves = [(b, firma[b * filas:(b + 1) * filas].tobytes()) for b in range(_BANDAS)]
+        candidatos = {j for c in claves for j in self._buckets.get(c, [])}
+        if any(np.mean(self._firmas[j] == firma) >= self.umbral for j in candidatos):
+            self.parecidos += 1
+            return True
+        self._firmas.append(firma)
+        for c in claves:
+            self._buckets.setdefault(c, []).append(len(self._firmas) - 1)
+        return False
+
+    def estadisticas(self) -> Dict[str, int]:
+        return {"chunks_duplicados": self.exactos, "chunks_casi_duplicados": self.parecidos}
+
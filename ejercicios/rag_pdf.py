@@ -0,0 +1,149 @@
+# ejercicios/rag_pdf.py
+import multiprocessing as mp
+import os
+import shutil
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+try:
+    from pypdf import PdfReader  # pip install pypdf
+except ImportError:  # mensaje más amigable si falta
+    PdfReader = None  # type: ignore
+
+from .rag_index import INDEX_DIR, hash_archivo
+
+# Caché de texto extraído: una carpeta por hash de PDF, un archivo por página
+PAGES_DIR = INDEX_DIR / "paginas"
+
+# Procesos para extraer texto (1 = en el mismo proceso)
+_PDF_WORKERS = int(os.getenv("RAG_PDF_WORKERS", str(os.cpu_count() or 1)))
+
+# "spawn" evita heredar hilos y locks del proceso principal (la app usa varios hilos)
+_CONTEXTO = mp.get_context(os.getenv("RAG_PDF_INICIO", "spawn"))
+
+# Con pocas páginas pendientes no vale la pena levantar procesos
+_MIN_PAGINAS_PARALELO = 8
+
+
+def _verificar_pypdf() -> None:
+    if PdfReader is None:
+        raise RuntimeError(
+            "Para usar el ejercicio 8 necesitas instalar 'pypdf':\n"
+            "    pip install pypdf"
+        )
+
+
+def _extraer_paginas(pdf_path: str, paginas: List[int]) -> List[Tuple[int, str]]:
+    """
+    Extrae el texto de varias páginas abriendo el PDF una sola vez.
+    Se ejecuta dentro de los procesos del pool (por eso es una función de módulo).
+    """
+    reader = PdfReader(pdf_path)
+    return [(n, _texto_pagina(reader, n)) for n in paginas]
+
+
+def _texto_pagina(reader, n: int) -> str:
+    try:
+        return reader.pages[n].extract_text() or ""
+    except Exception:
+        return ""
+
+
+def _ruta_pagina(pdf_hash: str, n: int) -> Path:
+    return PAGES_DIR / pdf_hash / f"{n:05d}.txt"
+
+
+def _leer_cache(pdf_hash: str, n: int) -> Optional[str]:
+    ruta = _ruta_pagina(pdf_hash, n)
+    try:
+        return ruta.read_text(encoding="utf-8")
+    except Exception:
+        return None
+
+
+def _guardar_cache(pdf_hash: str, n: int, texto: str) -> None:
+    ruta = _ruta_pagina(pdf_hash, n)
+    try:
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        tmp = ruta.with_name(ruta.name + ".tmp")
+        tmp.write_text(texto, encoding="utf-8")
+        os.replace(tmp, ruta)
+    except Exception:
+        pass
+
+
+def borrar_paginas(pdf_hash: str) -> None:
+    """
+    Elimina el texto de páginas guardado para un PDF.
+    """
+    shutil.rmtree(PAGES_DIR / pdf_hash, ignore_errors=True)
+
+
+def _lotes(paginas: List[int], workers: int) -> List[List[int]]:
+    """
+    Reparte las páginas en lotes contiguos (unos 4 por proceso) para que
+    cada proceso abra el PDF pocas veces y el orden de llegada sea parejo.
+    """
+    n_lotes = max(1, min(len(paginas), workers * 4))
+    tam = -(-len(paginas) // n_lotes)
+    return [paginas[i:i + tam] for i in range(0, len(paginas), tam)]
+
+
+def iterar_paginas(
+    pdf_path: str,
+    pdf_hash: str | None = None,
+    workers: int | None = None,
+) -> Iterator[Tuple[int, str]]:
+    """
+    Genera (número de página, texto) en orden, en cuanto cada página está lista:
+    - las páginas ya extraídas se leen de la caché (clave: hash del PDF + página);
+    - las demás se extraen en un pool de procesos y se guardan en la caché.
+    Quien consume puede empezar a trocear antes de que termine la extracción.
+    """
+    _verificar_pypdf()
+    p = Path(pdf_path)
+    if not p.exists():
+        raise FileNotFoundError(f"No se encontró el PDF: {pdf_path}")
+
+    pdf_hash = pdf_hash or hash_archivo(str(p))
+    reader = PdfReader(str(p))
+    total = len(reader.pages)
+
+    listas: Dict[int, str] = {}
+    pendientes: List[int] = []
+    for n in range(total):
+        txt = _leer_cache(pdf_hash, n)
+        if txt is None:
+            pendientes.append(n)
+        else:
+            listas[n] = txt
+
+    workers = max(1, workers or _PDF_WORKERS)
+    siguiente = 0
+
+    def _vaciar() -> Iterator[Tuple[int, str]]:
+        nonlocal siguiente
+        while siguiente in listas:
+            yield siguiente, listas.pop(siguiente)
+            siguiente += 1
+
+    if workers == 1 or len(pendientes) < _MIN_PAGINAS_PARALELO:
+        yield from _vaciar()
+        for n in pendientes:
+            listas[n] = _texto_pagina(reader, n)
+            _guardar_cache(pdf_hash, n, listas[n])
+            yield from _vaciar()
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=_CONTEXTO) as pool:
+        futuros = {pool.submit(_extraer_paginas, str(p), lote) for lote in _lotes(pendientes, workers)}
+        yield from _vaciar()
+        while futuros:
+            hechos, futuros = wait(futuros, return_when=FIRST_COMPLETED)
+            for fut in hechos:
+                for n_pag, txt in fut.result():
+                    _guardar_cache(pdf_hash, n_pag, txt)
+                    listas[n_pag] = txt
+            yield from _vaciar()
+
@@ -0,0 +1,281 @@
+# ejercicios/rag_pipeline.py
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from .rag_chunks import Fragmentos, TroceoEnFlujo
+from .rag_limpieza import Deduplicador, limpiar_paginas
+from .rag_pdf import iterar_paginas
+
+# Tamaño de las colas entre etapas (si se llenan, la etapa anterior espera)
+_COLA = int(os.getenv("RAG_INGESTA_COLA", "64"))
+# Chunks por petición de embeddings y peticiones en vuelo a la vez
+_LOTE_EMBEDDINGS = int(os.getenv("RAG_INGESTA_LOTE", "100"))
+_HILOS_EMBEDDINGS = int(os.getenv("RAG_INGESTA_HILOS", "4"))
+
+# Cada cuánto (segundos) se avisa el progreso como máximo
+_INTERVALO_PROGRESO = 0.5
+
+_FIN = object()
+
+
+class Etapa:
+    """
+    Estadísticas de una etapa del pipeline:
+    - elementos: cuántos produjo;
+    - ocupado_s: tiempo trabajando (sin contar esperas);
+    - espera_entrada_s: tiempo esperando a la etapa anterior (la etapa va sobrada);
+    - espera_salida_s: tiempo bloqueada porque la cola siguiente está llena (contrapresión).
+    """
+
+    def __init__(self, nombre: str):
+        self.nombre = nombre
+        self.elementos = 0
+        self.espera_entrada_s = 0.0
+        self.espera_salida_s = 0.0
+        self.inicio: Optional[float] = None
+        self.fin: Optional[float] = None
+
+    def a_dict(self) -> Dict[str, Any]:
+        if self.inicio is None:
+            total = 0.0
+        else:
+            total = (self.fin or time.perf_counter()) - self.inicio
+        ocupado = max(0.0, total - self.espera_entrada_s - self.espera_salida_s)
+        return {
+            "elementos": self.elementos,
+            "ocupado_s": round(ocupado, 3),
+            "espera_entrada_s": round(self.espera_entrada_s, 3),
+            "espera_salida_s": round(self.espera_salida_s, 3),
+            "por_segundo": round(self.elementos / total, 1) if total > 0 else 0.0,
+            "terminada": self.fin is not None,
+        }
+
+
+def _leer(cola: "queue.Queue", etapa: Etapa) -> Iterator[Any]:
+    while True:
+        t = time.perf_counter()
+        item = cola.get()
+        etapa.espera_entrada_s += time.perf_counter() - t
+        if item is _FIN:
+            return
+        yield item
+
+
+def _poner(cola: "queue.Queue", item: Any, etapa: Etapa, cancelado: threading.Event) -> bool:
+    t = time.perf_counter()
+    try:
+        while not cancelado.is_set():
+            try:
+                cola.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+    finally:
+        etapa.espera_salida_s += time.perf_counter() - t
+
+
+def ejecutar_pipeline(
+    fuente: Iterable[Any],
+    etapas: List[Tuple[str, Callable[[Iterator[Any]], Iterator[Any]]]],
+    nombre_fuente: str = "fuente",
+    tamano_cola: int | None = None,
+    progreso: Callable[[Dict[str, Dict[str, Any]]], None] | None = None,
+) -> Iterator[Any]:
+    """
+    Encadena la fuente y las etapas, cada una en su propio hilo, unidas por
+    colas acotadas: si una etapa se atrasa, las anteriores se frenan en vez de
+    acumular todo en memoria. Cada etapa es una función que recibe un iterador
+    de entradas y genera sus salidas. Devuelve las salidas de la última etapa
+    (en el hilo que llama). Un error en cualquier etapa detiene el pipeline y
+    se vuelve a lanzar aquí. `progreso` recibe las estadísticas por etapa.
+    """
+    tam = tamano_cola or _COLA
+    stats = [Etapa(nombre_fuente)] + [Etapa(nombre) for nombre, _ in etapas]
+    colas = [queue.Queue(maxsize=tam) for _ in range(len(etapas) + 1)]
+    cancelado = threading.Event()
+    errores: List[BaseException] = []
+
+    def _trabajar(i: int, entrada: Iterable[Any]) -> None:
+        etapa = stats[i]
+        etapa.inicio = time.perf_counter()
+        try:
+            for item in entrada:
+                etapa.elementos += 1
+                if not _poner(colas[i], item, etapa, cancelado):
+                    return
+        except BaseException as e:
+            errores.append(e)
+            cancelado.set()
+        finally:
+            etapa.fin = time.perf_counter()
+            cerrar = getattr(entrada, "close", None)
+            if cerrar is not None:
+                cerrar()
+            # El fin se entrega aunque la cola esté llena (el consumidor sigue leyendo)
+            while True:
+                try:
+                    colas[i].put(_FIN, timeout=0.1)
+                    break
+                except queue.Full:
+                    if cancelado.is_set():
+                        try:
+                            colas[i].get_nowait()
+                        except queue.Empty:
+                            pass
+
+    def _estadisticas() -> Dict[str, Dict[str, Any]]:
+        return {e.nombre: e.a_dict() for e in stats}
+
+    hilos = [threading.Thread(target=_trabajar, args=(0, fuente), name=f"rag-{nombre_fuente}", daemon=True)]
+    for i, (nombre, funcion) in enumerate(etapas, start=1):
+        entrada = funcion(_leer(colas[i - 1], stats[i]))
+        hilos.append(threading.Thread(target=_trabajar, args=(i, entrada), name=f"rag-{nombre}", daemon=True))
+    for h in hilos:
+        h.start()
+
+    aviso = 0.0
+    try:
+        for item in _leer(colas[-1], Etapa("salida")):
+            yield item
+            if progreso is not None and time.perf_counter() - aviso >= _INTERVALO_PROGRESO:
+                aviso = time.perf_counter()
+                progreso(_estadisticas())
+    finally:
+        if errores or any(h.is_alive() for h in hilos):
+            cancelado.set()
+        for h in hilos:
+            h.join()
+        if progreso is not None:
+            progreso(_estadisticas())
+    if errores:
+        raise errores[0]
+
+
+def _embeber_en_flujo(
+    embeber: Callable[[List[str]], np.ndarray],
+    lote: int,
+    hilos: int,
+    error: Dict[str, str],
+) -> Callable[[Iterator[Tuple[int, int, str]]], Iterator[Tuple[int, int, Optional[np.ndarray]]]]:
+    """
+    Etapa de embeddings: agrupa chunks en lotes y mantiene hasta `hilos`
+    peticiones en vuelo; entrega (inicio, fin, vector) en el orden de llegada.
+    Si una petición falla, los chunks siguientes pasan sin vector (y no se
+    hacen más peticiones): el índice queda sólo con BM25 hasta reintentar.
+    """
+
+    def _etapa(chunks: Iterator[Tuple[int, int, str]]) -> Iterator[Tuple[int, int, Optional[np.ndarray]]]:
+        pendientes: deque = deque()  # (spans del lote, futuro)
+
+        def _vaciar(hasta: int) -> Iterator[Tuple[int, int, Optional[np.ndarray]]]:
+            while len(pendientes) > hasta:
+                spans, fut = pendientes.popleft()
+                vectores = None
+                if not error:
+                    try:
+                        vectores = fut.result()
+                    except Exception as e:
+                        error["embeddings"] = str(e)
+                for j, (ini, fin) in enumerate(spans):
+                    yield ini, fin, (vectores[j] if vectores is not None else None)
+
+        with ThreadPoolExecutor(max_workers=max(1, hilos), thread_name_prefix="rag-embed") as pool:
+            spans: List[Tuple[int, int]] = []
+            textos: List[str] = []
+            for ini, fin, texto in chunks:
+                spans.append((ini, fin))
+                textos.append(texto)
+                if len(textos) >= lote:
+                    fut: Future = pool.submit(embeber, textos) if not error else _sin_vectores()
+                    pendientes.append((spans, fut))
+                    spans, textos = [], []
+                    yield from _vaciar(max(0, hilos - 1))
+            if textos:
+                pendientes.append((spans, pool.submit(embeber, textos) if not error else _sin_vectores()))
+            yield from _vaciar(0)
+
+    return _etapa
+
+
+def _sin_vectores() -> Future:
+    fut: Future = Future()
+    fut.set_result(None)
+    return fut
+
+
+def ingerir_pdf(
+    pdf_path: str,
+    pdf_hash: str,
+    chunk_size: int,
+    overlap: int,
+    oraciones: bool = False,
+    limpieza: bool = True,
+    umbral_dedup: float = 0.9,
+    embeber: Callable[[List[str]], np.ndarray] | None = None,
+    progreso: Callable[[Dict[str, Dict[str, Any]]], None] | None = None,
+) -> Dict[str, Any]:
+    """
+    Ingesta en flujo de un PDF: extraer (procesos) → limpiar → trocear →
+    quitar duplicados → embeber (hilos) → índice. Las etapas trabajan a la vez,
+    así que el tiempo de CPU de la extracción se solapa con el de red de los
+    embeddings. Devuelve {"chunks", "vectores" (None si no se embebió o falló),
+    "limpieza", "etapas", "error_embeddings"}.
+    """
+    stats_limpieza: Dict[str, int] = {}
+    troceo = TroceoEnFlujo(chunk_size, overlap, oraciones)
+    dedup = Deduplicador(umbral_dedup)
+    error: Dict[str, str] = {}
+
+    def _limpiar(paginas: Iterator[Tuple[int, str]]) -> Iterator[Tuple[int, str]]:
+        return limpiar_paginas(paginas, stats_limpieza) if limpieza else paginas
+
+    def _trocear(paginas: Iterator[Tuple[int, str]]) -> Iterator[Tuple[int, int, str]]:
+        for ini, fin in troceo.offsets(paginas):
+            yield ini, fin, troceo.texto(ini, fin)
+
+    def _deduplicar(chunks: Iterator[Tuple[int, int, str]]) -> Iterator[Tuple[int, int, str]]:
+        for ini, fin, texto in chunks:
+            if not limpieza or not dedup.repetido(texto):
+                yield ini, fin, texto
+
+    etapas: List[Tuple[str, Callable[[Iterator[Any]], Iterator[Any]]]] = [
+        ("limpiar", _limpiar),
+        ("trocear", _trocear),
+        ("deduplicar", _deduplicar),
+    ]
+    if embeber is not None:
+        etapas.append(("embeber", _embeber_en_flujo(embeber, _LOTE_EMBEDDINGS, _HILOS_EMBEDDINGS, error)))
+
+    etapas_finales: Dict[str, Dict[str, Any]] = {}
+
+    def _progreso(estadisticas: Dict[str, Dict[str, Any]]) -> None:
+        etapas_finales.update(estadisticas)
+        if progreso is not None:
+            progreso(estadisticas)
+
+    offsets: List[Tuple[int, int]] = []
+    vectores: List[np.ndarray] = []
+    for item in ejecutar_pipeline(iterar_paginas(pdf_path, pdf_hash), etapas, "extraer", progreso=_progreso):
+        offsets.append((item[0], item[1]))
+        if embeber is not None and item[2] is not None and not error:
+            vectores.append(np.asarray(item[2], dtype=np.float32))
+
+    if limpieza:
+        stats_limpieza.update(dedup.estadisticas())
+    chunks: Fragmentos = troceo.fragmentos(offsets)
+    completos = embeber is not None and not error and len(vectores) == len(chunks) and len(chunks) > 0
+    return {
+        "chunks": chunks,
+        "vectores": np.stack(vectores) if completos else None,
+        "limpieza": stats_limpieza,
+        "etapas": etapas_finales,
+        "error_embeddings": error.get("embeddings", ""),
+    }
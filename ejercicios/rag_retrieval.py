@@ -0,0 +1,580 @@
+# ejercicios/rag_retrieval.py
+import math
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+
+def normalizar(vectores: Sequence[Sequence[float]] | np.ndarray) -> np.ndarray:
+    """
+    Convierte los vectores a una matriz float32 con filas de norma 1.
+    Así el coseno se reduce a un producto punto. Las filas nulas se quedan en cero.
+    """
+    m = np.asarray(vectores, dtype=np.float32)
+    if m.ndim == 1:
+        m = m.reshape(1, -1)
+    normas = np.linalg.norm(m, axis=1, keepdims=True)
+    normas[normas == 0.0] = 1.0
+    return m / normas
+
+
+def top_k(puntajes: np.ndarray, k: int) -> np.ndarray:
+    """
+    Índices de los k puntajes más altos (de mayor a menor) sin ordenar todo:
+    argpartition es O(n) y sólo se ordenan los k elegidos.
+    Acepta un vector (n,) o una matriz (q, n); en ese caso trabaja por fila.
+    """
+    n = puntajes.shape[-1]
+    k = max(0, min(k, n))
+    if k == 0:
+        return np.empty(puntajes.shape[:-1] + (0,), dtype=np.int64)
+    if k < n:
+        cand = np.argpartition(-puntajes, k - 1, axis=-1)[..., :k]
+    else:
+        cand = np.broadcast_to(np.arange(n), puntajes.shape).copy()
+    orden = np.argsort(-np.take_along_axis(puntajes, cand, axis=-1), axis=-1, kind="stable")
+    return np.take_along_axis(cand, orden, axis=-1)
+
+
+class IndiceExacto:
+    """
+    Búsqueda exacta por coseno sobre una matriz float32 ya normalizada.
+    Un producto matriz-vector (o matriz-matriz para varias preguntas) por consulta.
+    Si la matriz no es float32 (p. ej. un memmap float16) se puntúa por bloques,
+    sin convertirla entera a float32.
+    """
+
+    def __init__(
+        self,
+        vectores: Sequence[Sequence[float]] | np.ndarray,
+        normalizado: bool = False,
+        bloque: int = 16384,
+    ):
+        # Si los vectores ya vienen normalizados (p. ej. un np.memmap del almacén
+        # en disco) se usan tal cual, sin copiarlos a memoria.
+        self.matriz = np.asarray(vectores) if normalizado else normalizar(vectores)
+        self.bloque = bloque
+
+    def agregar(self, vectores: Sequence[Sequence[float]] | np.ndarray) -> None:
+        """
+        Inserta vectores nuevos al final (sus índices siguen a los existentes).
+        """
+        nuevos = normalizar(vectores)
+        if len(self) == 0:
+            self.matriz = nuevos
+        else:
+            self.matriz = np.vstack([self.matriz, nuevos])
+
+    def __len__(self) -> int:
+        return int(self.matriz.shape[0])
+
+    def puntajes(self, consultas: Sequence[float] | np.ndarray) -> np.ndarray:
+        """
+        Similitud coseno contra todos los vectores: (n,) para una consulta,
+        (q, n) para un lote de consultas.
+        """
+        q = np.asarray(consultas, dtype=np.float32)
+        unica = q.ndim == 1
+        qn = normalizar(q)
+        if qn.shape[1] != self.matriz.shape[1]:
+            raise ValueError(
+                f"Dimensión de la consulta ({qn.shape[1]}) distinta a la del índice "
+                f"({self.matriz.shape[1]})."
+            )
+        if self.matriz.dtype == np.float32:
+            s = qn @ self.matriz.T
+        else:
+            s = np.empty((len(qn), len(self)), dtype=np.float32)
+            for i in range(0, len(self), self.bloque):
+                s[:, i:i + self.bloque] = qn @ np.asarray(self.matriz[i:i + self.bloque], dtype=np.float32).T
+        return s[0] if unica else s
+
+    def buscar(
+        self, consultas: Sequence[float] | np.ndarray, k: int = 3
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Devuelve (índices, puntajes) de los k vecinos más cercanos,
+        con forma (k,) o (q, k) según se pase una consulta o un lote.
+        """
+        s = self.puntajes(consultas)
+        idx = top_k(s, k)
+        return idx, np.take_along_axis(s, idx, axis=-1)
+
+
+# ==============================
+# ÍNDICE APROXIMADO (IVF)
+# ==============================
+
+# Backend por defecto: "auto" usa IVF a partir de cierto número de vectores.
+_BACKEND = os.getenv("RAG_BACKEND", "auto")
+_AUTO_IVF_MIN = int(os.getenv("RAG_IVF_MIN_VECTORES", "20000"))
+_IVF_NPROBE = int(os.getenv("RAG_IVF_NPROBE", "8"))
+
+
+def _kmeans_esferico(
+    datos: np.ndarray, n_listas: int, iteraciones: int, rng: np.random.Generator
+) -> np.ndarray:
+    """
+    k-means sobre vectores normalizados (asignación por producto punto).
+    """
+    centroides = datos[rng.choice(len(datos), size=n_listas, replace=False)].copy()
+    for _ in range(iteraciones):
+        asignacion = _asignar(datos, centroides)
+        # Suma por lista: se ordena por asignación y se reduce por tramos
+        orden = np.argsort(asignacion, kind="stable")
+        listas, inicios = np.unique(asignacion[orden], return_index=True)
+        sumas = np.zeros_like(centroides)
+        sumas[listas] = np.add.reduceat(datos[orden], inicios, axis=0)
+        cuenta = np.bincount(asignacion, minlength=n_listas)
+        vacias = cuenta == 0
+        if np.any(vacias):
+            # Las listas vacías se re-siembran con puntos al azar
+            sumas[vacias] = datos[rng.choice(len(datos), size=int(vacias.sum()))]
+        centroides = normalizar(sumas)
+    return centroides
+
+
+def _asignar(datos: np.ndarray, centroides: np.ndarray, bloque: int = 8192) -> np.ndarray:
+    """
+    Centroide más cercano de cada vector, por bloques para acotar la memoria.
+    """
+    out = np.empty(len(datos), dtype=np.int64)
+    for i in range(0, len(datos), bloque):
+        out[i:i + bloque] = np.argmax(datos[i:i + bloque] @ centroides.T, axis=1)
+    return out
+
+
+class IndiceIVF:
+    """
+    Índice aproximado tipo IVF (inverted file) hecho con NumPy:
+    - los vectores se reparten en n_listas grupos con k-means;
+    - cada consulta sólo recorre las nprobe listas con centroide más cercano.
+    Más nprobe = más recall y más tiempo. buscar(..., exacto=True) recorre todo
+    (útil para verificar el recall). Los índices devueltos son los de inserción.
+    """
+
+    def __init__(
+        self,
+        vectores: Sequence[Sequence[float]] | np.ndarray | None = None,
+        n_listas: int | None = None,
+        nprobe: int | None = None,
+        iteraciones: int = 10,
+        semilla: int = 0,
+    ):
+        self.n_listas = n_listas
+        self.nprobe = nprobe or _IVF_NPROBE
+        self.iteraciones = iteraciones
+        self._rng = np.random.default_rng(semilla)
+        self.centroides: np.ndarray | None = None
+        self._listas_vec: List[np.ndarray] = []
+        self._listas_ids: List[np.ndarray] = []
+        self._n = 0
+        self._dim = 0
+        if vectores is not None and len(vectores) > 0:
+            self.agregar(vectores)
+
+    def __len__(self) -> int:
+        return self._n
+
+    def _entrenar(self, datos: np.ndarray) -> None:
+        n_listas = self.n_listas or max(1, int(math.sqrt(len(datos))))
+        n_listas = max(1, min(n_listas, len(datos)))
+        # Para entrenar basta una muestra (unos 64 puntos por lista)
+        muestra_max = 64 * n_listas
+        if len(datos) > muestra_max:
+            muestra = datos[self._rng.choice(len(datos), size=muestra_max, replace=False)]
+        else:
+            muestra = datos
+        self.centroides = _kmeans_esferico(muestra, n_listas, self.iteraciones, self._rng)
+        self.n_listas = n_listas
+        self._dim = datos.shape[1]
+        self._listas_vec = [np.empty((0, self._dim), dtype=np.float32) for _ in range(n_listas)]
+        self._listas_ids = [np.empty(0, dtype=np.int64) for _ in range(n_listas)]
+
+    def agregar(self, vectores: Sequence[Sequence[float]] | np.ndarray) -> None:
+        """
+        Inserción incremental: los vectores nuevos van a la lista de su centroide.
+        La primera inserción entrena los centroides.
+        """
+        datos = normalizar(vectores)
+        if len(datos) == 0:
+            return
+        if self.centroides is None:
+            self._entrenar(datos)
+        ids = np.arange(self._n, self._n + len(datos), dtype=np.int64)
+        asignacion = _asignar(datos, self.centroides)
+        orden = np.argsort(asignacion, kind="stable")
+        listas, inicios = np.unique(asignacion[orden], return_index=True)
+        fines = list(inicios[1:]) + [len(orden)]
+        for lista, ini, fin in zip(listas, inicios, fines):
+            sel = orden[ini:fin]
+            self._listas_vec[lista] = np.vstack([self._listas_vec[lista], datos[sel]])
+            self._listas_ids[lista] = np.concatenate([self._listas_ids[lista], ids[sel]])
+        self._n += len(datos)
+
+    def _buscar_una(self, q: np.ndarray, k: int, nprobe: int) -> Tuple[np.ndarray, np.ndarray]:
+        listas = top_k(self.centroides @ q, nprobe)
+        ids = [self._listas_ids[i] for i in listas if len(self._listas_ids[i])]
+        if not ids:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        s = np.concatenate([self._listas_vec[i] @ q for i in listas if len(self._listas_ids[i])])
+        ids_c = np.concatenate(ids)
+        sel = top_k(s, k)
+        return ids_c[sel], s[sel]
+
+    def buscar(
+        self,
+        consultas: Sequence[float] | np.ndarray,
+        k: int = 3,
+        nprobe: int | None = None,
+        exacto: bool = False,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Misma interfaz que IndiceExacto.buscar. Si hay menos de k candidatos en
+        las listas visitadas, el resultado trae menos de k elementos (y en lote
+        se rellena con índice -1 y puntaje -inf).
+        """
+        q = np.asarray(consultas, dtype=np.float32)
+        unica = q.ndim == 1
+        qn = normalizar(q)
+        if self.centroides is None:
+            vacio = np.empty((len(qn), 0))
+            return (vacio[0], vacio[0]) if unica else (vacio.astype(np.int64), vacio)
+        if qn.shape[1] != self._dim:
+            raise ValueError(
+                f"Dimensión de la consulta ({qn.shape[1]}) distinta a la del índice ({self._dim})."
+            )
+        probe = self.n_listas if exacto else min(nprobe or self.nprobe, self.n_listas)
+        resultados = [self._buscar_una(fila, k, probe) for fila in qn]
+        if unica:
+            return resultados[0]
+        kk = min(k, self._n)
+        idx = np.full((len(qn), kk), -1, dtype=np.int64)
+        sc = np.full((len(qn), kk), -np.inf, dtype=np.float32)
+        for j, (i, s) in enumerate(resultados):
+            idx[j, :len(i)] = i
+            sc[j, :len(s)] = s
+        return idx, sc
+
+
+# ==============================
+# ÍNDICE CUANTIZADO (int8 / float16)
+# ==============================
+
+_CUANTIZACION = os.getenv("RAG_CUANTIZACION", "")
+_FACTOR_CANDIDATOS = int(os.getenv("RAG_CUANT_CANDIDATOS", "4"))
+
+
+class IndiceCuantizado:
+    """
+    Búsqueda exacta en dos pasadas:
+    1) puntaje aproximado sobre una copia cuantizada en memoria
+       (int8 con escala y desplazamiento por dimensión, o float16);
+    2) sólo los k * factor mejores candidatos se re-puntúan con los vectores
+       completos (que pueden seguir en disco como np.memmap).
+    """
+
+    def __init__(
+        self,
+        vectores: Sequence[Sequence[float]] | np.ndarray,
+        modo: str = "int8",
+        factor_candidatos: int | None = None,
+        normalizado: bool = False,
+        bloque: int = 16384,
+    ):
+        if modo not in ("int8", "float16"):
+            raise ValueError(f"Cuantización desconocida: '{modo}' (usa int8 o float16).")
+        self.modo = modo
+        self.factor = max(1, factor_candidatos or _FACTOR_CANDIDATOS)
+        self.bloque = bloque
+        self.completos = np.asarray(vectores) if normalizado else normalizar(vectores)
+        self.minimo: np.ndarray | None = None
+        self.escala: np.ndarray | None = None
+        self._calibrar()
+        self.codigos = self._cuantizar(self.completos)
+
+    def _calibrar(self) -> None:
+        """
+        Rango por dimensión para int8, en bloques para no subir toda la matriz a float32.
+        """
+        if self.modo != "int8" or not len(self.completos):
+            return
+        mins, maxs = [], []
+        for i in range(0, len(self.completos), self.bloque):
+            b = np.asarray(self.completos[i:i + self.bloque], dtype=np.float32)
+            mins.append(b.min(axis=0))
+            maxs.append(b.max(axis=0))
+        self.minimo = np.min(mins, axis=0)
+        escala = (np.max(maxs, axis=0) - self.minimo) / 255.0
+        escala[escala == 0.0] = 1.0
+        self.escala = escala.astype(np.float32)
+
+    def __len__(self) -> int:
+        return int(self.completos.shape[0])
+
+    def _cuantizar(self, m: np.ndarray) -> np.ndarray:
+        if self.modo == "float16":
+            return np.asarray(m, dtype=np.float16)
+        out = np.empty(m.shape, dtype=np.int8)
+        for i in range(0, len(m), self.bloque):
+            b = np.asarray(m[i:i + self.bloque], dtype=np.float32)
+            q = np.rint((b - self.minimo) / self.escala) - 128.0
+            out[i:i + self.bloque] = np.clip(q, -128, 127)
+        return out
+
+    def agregar(self, vectores: Sequence[Sequence[float]] | np.ndarray) -> None:
+        """
+        Inserta vectores nuevos (con la misma escala: valores fuera de rango se recortan).
+        Los completos pasan a memoria.
+        """
+        nuevos = normalizar(vectores)
+        if not len(self):
+            self.completos = nuevos
+            self._calibrar()
+            self.codigos = self._cuantizar(nuevos)
+            return
+        self.completos = np.vstack([np.asarray(self.completos, dtype=np.float32), nuevos])
+        self.codigos = np.vstack([self.codigos, self._cuantizar(nuevos)])
+
+    def _aproximados(self, qn: np.ndarray) -> np.ndarray:
+        """
+        Puntajes aproximados (q, n). Para int8 se omiten los términos constantes
+        por consulta (q · mínimo), que no cambian el orden.
+        """
+        qs = qn * self.escala if self.modo == "int8" else qn
+        out = np.empty((len(qn), len(self)), dtype=np.float32)
+        for i in range(0, len(self), self.bloque):
+            out[:, i:i + self.bloque] = qs @ self.codigos[i:i + self.bloque].astype(np.float32).T
+        return out
+
+    def buscar(
+        self, consultas: Sequence[float] | np.ndarray, k: int = 3
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Misma interfaz que IndiceExacto.buscar; los puntajes devueltos son exactos.
+        """
+        q = np.asarray(consultas, dtype=np.float32)
+        unica = q.ndim == 1
+        qn = normalizar(q)
+        k = min(k, len(self))
+        candidatos = top_k(self._aproximados(qn), k * self.factor)
+        idx = np.empty((len(qn), k), dtype=np.int64)
+        sc = np.empty((len(qn), k), dtype=np.float32)
+        for j, cand in enumerate(candidatos):
+            cand = np.sort(cand)  # lectura ordenada del memmap
+            exactos = np.asarray(self.completos[cand], dtype=np.float32) @ qn[j]
+            sel = top_k(exactos, k)
+            idx[j], sc[j] = cand[sel], exactos[sel]
+        return (idx[0], sc[0]) if unica else (idx, sc)
+
+    def memoria(self) -> dict:
+        """
+        Bytes en memoria de la copia cuantizada frente a la matriz float32 completa.
+        """
+        completo = len(self) * self.completos.shape[1] * 4 if len(self) else 0
+        cuant = int(self.codigos.nbytes)
+        if self.escala is not None:
+            cuant += int(self.escala.nbytes + self.minimo.nbytes)
+        return {"modo": self.modo, "bytes": cuant, "bytes_float32": completo,
+                "proporcion": cuant / completo if completo else 0.0}
+
+
+def evaluar_cuantizacion(
+    vectores: Sequence[Sequence[float]] | np.ndarray,
+    consultas: np.ndarray,
+    k: int = 10,
+    factor_candidatos: int | None = None,
+) -> List[dict]:
+    """
+    Compara cada modo de cuantización contra la búsqueda exacta:
+    memoria usada, recall@k sólo con la pasada aproximada y recall@k tras re-puntuar.
+    Sirve para elegir el modo por despliegue.
+    """
+    referencia = IndiceExacto(vectores)
+    consultas = np.atleast_2d(np.asarray(consultas, dtype=np.float32))
+    idx_ref, _ = referencia.buscar(consultas, k)
+    resultados = []
+    for modo in ("float16", "int8"):
+        ind = IndiceCuantizado(referencia.matriz, modo, factor_candidatos, normalizado=True)
+        fila = ind.memoria()
+        fila["recall_aproximado"] = _recall(top_k(ind._aproximados(normalizar(consultas)), k), idx_ref)
+        fila["recall"] = _recall(ind.buscar(consultas, k)[0], idx_ref)
+        resultados.append(fila)
+    return resultados
+
+
+def crear_indice(
+    vectores: Sequence[Sequence[float]] | np.ndarray,
+    backend: str | None = None,
+    normalizado: bool = False,
+    cuantizacion: str | None = None,
+):
+    """
+    Crea el índice de búsqueda según el backend:
+    - "exacto": recorre todos los vectores (referencia para verificar);
+    - "ivf": índice aproximado;
+    - "auto": IVF sólo cuando hay muchos vectores;
+    - "shards": repartido en varios procesos (ver rag_shards.IndiceFragmentado).
+    normalizado=True indica que las filas ya tienen norma 1.
+    cuantizacion ("int8" / "float16", por defecto RAG_CUANTIZACION) aplica a la
+    búsqueda exhaustiva: primera pasada cuantizada y re-puntuación exacta.
+    """
+    backend = (backend or _BACKEND).lower()
+    if backend == "auto":
+        backend = "ivf" if len(vectores) >= _AUTO_IVF_MIN else "exacto"
+    if backend == "ivf":
+        return IndiceIVF(vectores)
+    if backend == "shards":
+        from .rag_shards import IndiceFragmentado
+
+        return IndiceFragmentado(vectores, normalizado=normalizado)
+    if backend == "exacto":
+        cuantizacion = _CUANTIZACION if cuantizacion is None else cuantizacion
+        if cuantizacion:
+            return IndiceCuantizado(vectores, cuantizacion, normalizado=normalizado)
+        return IndiceExacto(vectores, normalizado=normalizado)
+    raise ValueError(f"Backend de búsqueda desconocido: '{backend}' (usa exacto, ivf, auto o shards).")
+
+
+def recall_at_k(indice, referencia: IndiceExacto, consultas: np.ndarray, k: int = 10) -> float:
+    """
+    Fracción de los k vecinos exactos que también devuelve el índice aproximado.
+    """
+    idx_ref, _ = referencia.buscar(consultas, k)
+    idx_aprox, _ = indice.buscar(consultas, k)
+    return _recall(idx_aprox, idx_ref)
+
+
+def _recall(idx_aprox: np.ndarray, idx_ref: np.ndarray) -> float:
+    idx_ref = np.atleast_2d(idx_ref)
+    idx_aprox = np.atleast_2d(idx_aprox)
+    aciertos = sum(len(set(a.tolist()) & set(r.tolist())) for a, r in zip(idx_aprox, idx_ref))
+    return aciertos / max(1, idx_ref.size)
+
+
+# ==============================
+# BÚSQUEDA HÍBRIDA (denso + lexical)
+# ==============================
+
+# Presupuesto de latencia para la búsqueda híbrida y constante de RRF
+_PRESUPUESTO_MS = float(os.getenv("RAG_PRESUPUESTO_MS", "4000"))
+_K_RRF = int(os.getenv("RAG_K_RRF", "60"))
+
+# Hilos compartidos: si un lado se pasa del presupuesto sigue en segundo plano
+# (por ejemplo, terminando de embeber un documento nuevo) sin bloquear la respuesta.
+_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix="rag-hibrido")
+
+
+def fusion_rrf(rankings: List[np.ndarray], k: int = 3, k_rrf: int | None = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Reciprocal Rank Fusion: cada ranking aporta 1 / (k_rrf + posición) a sus elementos.
+    Devuelve (índices, puntajes) de los k mejores.
+    """
+    k_rrf = k_rrf or _K_RRF
+    puntajes: Dict[int, float] = {}
+    for ranking in rankings:
+        for pos, i in enumerate(np.asarray(ranking).tolist()):
+            if i < 0:
+                continue
+            puntajes[i] = puntajes.get(i, 0.0) + 1.0 / (k_rrf + pos + 1)
+    if not puntajes:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    ids = np.fromiter(puntajes.keys(), dtype=np.int64, count=len(puntajes))
+    vals = np.fromiter(puntajes.values(), dtype=np.float32, count=len(puntajes))
+    sel = top_k(vals, k)
+    return ids[sel], vals[sel]
+
+
+def buscar_hibrido(
+    denso: Callable[[int], Tuple[np.ndarray, np.ndarray]],
+    lexico: Callable[[int], Tuple[np.ndarray, np.ndarray]],
+    k: int = 3,
+    candidatos: int = 20,
+    presupuesto_ms: float | None = None,
+) -> Tuple[np.ndarray, np.ndarray, Dict[str, Any]]:
+    """
+    Lanza la búsqueda densa y la lexical a la vez (cada una recibe cuántos
+    candidatos devolver) y las une con RRF. Lo que no termine dentro del
+    presupuesto de latencia se descarta; si ninguna terminó a tiempo se usa
+    la primera que termine. Devuelve (índices, puntajes, estado), con
+    estado = {"denso": "ok"|"error"|"tiempo", "lexico": ..., "error_denso": str}.
+    """
+    presupuesto = (_PRESUPUESTO_MS if presupuesto_ms is None else presupuesto_ms) / 1000.0
+    futuros = {"denso": _POOL.submit(denso, candidatos), "lexico": _POOL.submit(lexico, candidatos)}
+
+    hechos, pendientes = wait(futuros.values(), timeout=presupuesto)
+    while not any(f.exception() is None for f in hechos) and pendientes:
+        # Nada útil a tiempo: se espera al primero que termine
+        nuevos, pendientes = wait(pendientes, return_when=FIRST_COMPLETED)
+        hechos |= nuevos
+
+    estado: Dict[str, Any] = {"error_denso": ""}
+    rankings: List[np.ndarray] = []
+    for lado, fut in futuros.items():
+        if fut not in hechos:
+            estado[lado] = "tiempo"
+            if lado == "denso":
+                estado["error_denso"] = f"sin respuesta dentro del presupuesto de {presupuesto * 1000:.0f} ms"
+            continue
+        if fut.exception() is not None:
+            estado[lado] = "error"
+            if lado == "denso":
+                estado["error_denso"] = str(fut.exception())
+            continue
+        estado[lado] = "ok"
+        rankings.append(fut.result()[0])
+
+    if not rankings:
+        raise RuntimeError(f"Falló la búsqueda densa y la lexical: {estado}")
+    idx, sc = fusion_rrf(rankings, k)
+    return idx, sc, estado
+
+
+# ==============================
+# SELECCIÓN DIVERSA (MMR)
+# ==============================
+
+# 1.0 = sólo relevancia; valores menores penalizan más los fragmentos parecidos a los ya elegidos
+_MMR_LAMBDA = float(os.getenv("RAG_MMR_LAMBDA", "0.7"))
+
+
+def seleccionar_mmr(
+    relevancia: Sequence[float] | np.ndarray,
+    vectores: Sequence[Sequence[float]] | np.ndarray,
+    k: int,
+    lambda_: float | None = None,
+) -> np.ndarray:
+    """
+    Maximal Marginal Relevance sobre n candidatos: elige k de a uno, cada vez
+    el que maximiza  λ·relevancia − (1−λ)·(similitud máxima con los ya elegidos).
+    - relevancia: puntajes de los candidatos contra la pregunta (coseno denso o
+      BM25); se reescalan a [0, 1] entre el peor y el mejor candidato, así
+      compiten en la misma escala que la similitud entre fragmentos;
+    - vectores: (n, d) de los candidatos (embeddings o vectores de términos).
+    La matriz de similitudes se calcula una vez; cada paso es vectorizado.
+    Devuelve las posiciones elegidas (dentro de los candidatos) en orden de selección.
+    """
+    lam = _MMR_LAMBDA if lambda_ is None else lambda_
+    r = np.asarray(relevancia, dtype=np.float32).reshape(-1)
+    n = r.shape[0]
+    k = max(0, min(k, n))
+    if k == 0:
+        return np.empty(0, dtype=np.int64)
+
+    rango = float(r.max() - r.min())
+    r = (r - r.min()) / rango if rango > 0 else np.ones_like(r)
+    v = normalizar(vectores)
+    similitud = v @ v.T
+
+    disponible = np.ones(n, dtype=bool)
+    max_sim = np.zeros(n, dtype=np.float32)
+    elegidos: List[int] = []
+    for _ in range(k):
+        puntaje = np.where(disponible, lam * r - (1.0 - lam) * max_sim, -np.inf)
+        j = int(np.argmax(puntaje))
+        elegidos.append(j)
+        disponible[j] = False
+        np.maximum(max_sim, similitud[j], out=max_sim)
+    return np.asarray(elegidos, dtype=np.int64)
@@ -0,0 +1,254 @@
+# ejercicios/rag_shards.py
+import itertools
+import math
+import mmap
+import multiprocessing as mp
+import os
+import threading
+import time
+import weakref
+from multiprocessing.connection import Connection, wait
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from .rag_retrieval import crear_indice, normalizar, top_k
+
+# Número de shards (procesos) y backend de búsqueda dentro de cada uno
+_SHARDS = int(os.getenv("RAG_SHARDS", str(os.cpu_count() or 1)))
+_SHARDS_BACKEND = os.getenv("RAG_SHARDS_BACKEND", "auto")
+
+# Política ante shards lentos: "parcial" responde con los shards que llegaron
+# a tiempo (si son al menos RAG_SHARDS_MIN_RESPUESTA de ellos); "completo" falla.
+_TIMEOUT_MS = float(os.getenv("RAG_SHARDS_TIMEOUT_MS", "500"))
+_POLITICA = os.getenv("RAG_SHARDS_POLITICA", "parcial")
+_MIN_RESPUESTA = float(os.getenv("RAG_SHARDS_MIN_RESPUESTA", "0.5"))
+
+# "spawn" evita heredar hilos y locks del proceso principal (la app usa varios hilos)
+_CONTEXTO = mp.get_context(os.getenv("RAG_SHARDS_INICIO", "spawn"))
+
+# Tiempo máximo para que un shard arranque o confirme una inserción
+_TIMEOUT_CONTROL_S = 120.0
+
+
+def _abrir_fuente(fuente: Dict[str, Any]) -> np.ndarray:
+    if fuente["tipo"] == "memmap":
+        return np.memmap(
+            fuente["ruta"], dtype=fuente["dtype"], mode="r", offset=fuente["offset"], shape=fuente["shape"]
+        )
+    return fuente["matriz"]
+
+
+def _servir(conexion: Connection, fuente: Dict[str, Any], ids: np.ndarray, backend: str) -> None:
+    """
+    Proceso de un shard: guarda su parte de los vectores en un índice local y
+    atiende mensajes ("buscar", n, consultas, k) / ("agregar", vectores, ids) / ("cerrar",).
+    Los resultados usan los índices globales del corpus.
+    """
+    try:
+        indice = crear_indice(_abrir_fuente(fuente), backend=backend, normalizado=True)
+        conexion.send(("listo", len(ids)))
+    except Exception as e:
+        conexion.send(("error", -1, str(e)))
+        return
+
+    while True:
+        try:
+            msg = conexion.recv()
+        except EOFError:
+            return
+        if msg[0] == "cerrar":
+            return
+        if msg[0] == "agregar":
+            try:
+                indice.agregar(msg[1])
+                ids = np.concatenate([ids, np.asarray(msg[2], dtype=np.int64)])
+                conexion.send(("ok", len(ids)))
+            except Exception as e:
+                conexion.send(("error", -1, str(e)))
+            continue
+        _, num, consultas, k = msg
+        try:
+            idx, sc = indice.buscar(consultas, k=k)
+            globales = np.where(idx >= 0, ids[np.clip(idx, 0, None)], -1)
+            conexion.send(("resultado", num, globales, sc))
+        except Exception as e:
+            conexion.send(("error", num, str(e)))
+
+
+def _cerrar_procesos(conexiones: List[Connection], procesos: List[Any]) -> None:
+    for con in conexiones:
+        try:
+            con.send(("cerrar",))
+        except Exception:
+            pass
+    for p in procesos:
+        p.join(timeout=1.0)
+        if p.is_alive():
+            p.terminate()
+
+
+class IndiceFragmentado:
+    """
+    Índice repartido en N shards, cada uno en su propio proceso:
+    - la consulta se envía a todos a la vez (scatter) y se unen sus top-k
+      parciales en un top-k global (gather);
+    - los shards que no responden dentro de timeout_ms se tratan según la
+      política ("parcial" / "completo"); sus respuestas tardías se descartan;
+    - si los vectores vienen de un .vec en disco (np.memmap), cada shard abre
+      su rango de filas directamente del archivo (no se copian entre procesos).
+    `ultimo_estado` describe la última consulta (qué shards respondieron).
+    """
+
+    def __init__(
+        self,
+        vectores: Sequence[Sequence[float]] | np.ndarray,
+        n_shards: int | None = None,
+        normalizado: bool = False,
+        timeout_ms: float | None = None,
+        politica: str | None = None,
+        backend: str | None = None,
+    ):
+        matriz = vectores if normalizado else normalizar(vectores)
+        n = len(matriz)
+        if n == 0:
+            raise ValueError("No se puede crear un índice por shards sin vectores.")
+        self.n_shards = max(1, min(n_shards or _SHARDS, n))
+        self.timeout_ms = _TIMEOUT_MS if timeout_ms is None else timeout_ms
+        self.politica = politica or _POLITICA
+        self.dim = int(matriz.shape[1])
+        self.ultimo_estado: Dict[str, Any] = {}
+        self._filas: List[int] = []
+        self._num = itertools.count(1)
+        self._lock = threading.Lock()
+        self._conexiones: List[Connection] = []
+        self._procesos: List[Any] = []
+
+        directo = isinstance(matriz, np.memmap) and isinstance(matriz.base, mmap.mmap)
+        limites = np.linspace(0, n, self.n_shards + 1).astype(np.int64)
+        for a, b in zip(limites[:-1], limites[1:]):
+            if directo:
+                fuente = {
+                    "tipo": "memmap",
+                    "ruta": matriz.filename,
+                    "dtype": matriz.dtype.str,
+                    "offset": int(matriz.offset + a * matriz.strides[0]),
+                    "shape": (int(b - a), self.dim),
+                }
+            else:
+                fuente = {"tipo": "matriz", "matriz": np.ascontiguousarray(matriz[a:b], dtype=np.float32)}
+            padre, hijo = _CONTEXTO.Pipe()
+            p = _CONTEXTO.Process(
+                target=_servir,
+                args=(hijo, fuente, np.arange(a, b, dtype=np.int64), backend or _SHARDS_BACKEND),
+                daemon=True,
+            )
+            p.start()
+            hijo.close()
+            self._conexiones.append(padre)
+            self._procesos.append(p)
+            self._filas.append(int(b - a))
+        self._cerrar = weakref.finalize(self, _cerrar_procesos, self._conexiones, self._procesos)
+
+        for con in self._conexiones:
+            self._esperar_control(con)
+
+    def _esperar_control(self, con: Connection) -> Any:
+        limite = time.perf_counter() + _TIMEOUT_CONTROL_S
+        while True:
+            if not con.poll(max(0.0, limite - time.perf_counter())):
+                raise TimeoutError("Un shard no respondió a tiempo.")
+            msg = con.recv()
+            if msg[0] == "resultado" or (msg[0] == "error" and msg[1] != -1):
+                continue  # respuesta tardía de una consulta que ya venció
+            if msg[0] == "error":
+                raise RuntimeError(f"Error en un shard: {msg[2]}")
+            return msg
+
+    def __len__(self) -> int:
+        return sum(self._filas)
+
+    def cerrar(self) -> None:
+        """
+        Detiene los procesos de los shards.
+        """
+        self._cerrar()
+
+    def agregar(self, vectores: Sequence[Sequence[float]] | np.ndarray) -> None:
+        """
+        Inserta vectores nuevos en el shard con menos filas (sus índices siguen a los existentes).
+        """
+        nuevos = normalizar(vectores)
+        with self._lock:
+            total = len(self)
+            s = int(np.argmin(self._filas))
+            con = self._conexiones[s]
+            con.send(("agregar", nuevos, np.arange(total, total + len(nuevos), dtype=np.int64)))
+            self._esperar_control(con)
+            self._filas[s] += len(nuevos)
+
+    def buscar(
+        self,
+        consultas: Sequence[float] | np.ndarray,
+        k: int = 3,
+        timeout_ms: float | None = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Devuelve (índices, puntajes) de los k vecinos más cercanos entre todos
+        los shards, con forma (k,) o (q, k) según se pase una consulta o un lote.
+        """
+        q = np.asarray(consultas, dtype=np.float32)
+        limite = (self.timeout_ms if timeout_ms is None else timeout_ms) / 1000.0
+
+        with self._lock:
+            num = next(self._num)
+            inicio = time.perf_counter()
+            pendientes: Dict[Connection, int] = {}
+            errores: Dict[int, str] = {}
+            for s, con in enumerate(self._conexiones):
+                try:
+                    con.send(("buscar", num, q, k))
+                    pendientes[con] = s
+                except (OSError, EOFError):
+                    errores[s] = "el proceso del shard terminó"
+
+            parciales: List[Tuple[np.ndarray, np.ndarray]] = []
+            tiempos: Dict[int, float] = {}
+            while pendientes:
+                restante = limite - (time.perf_counter() - inicio)
+                if restante <= 0:
+                    break
+                for con in wait(list(pendientes), timeout=restante):
+                    try:
+                        msg = con.recv()
+                    except (EOFError, OSError):
+                        errores[pendientes.pop(con)] = "el proceso del shard terminó"
+                        continue
+                    if msg[1] != num:
+                        continue  # respuesta tardía de una consulta anterior
+                    s = pendientes.pop(con)
+                    tiempos[s] = round((time.perf_counter() - inicio) * 1000.0, 2)
+                    if msg[0] == "error":
+                        errores[s] = msg[2]
+                    else:
+                        parciales.append((msg[2], msg[3]))
+
+        sin_respuesta = sorted(set(range(self.n_shards)) - set(tiempos))
+        self.ultimo_estado = {
+            "shards": self.n_shards,
+            "respondieron": len(parciales),
+            "sin_respuesta": sin_respuesta,
+            "errores": errores,
+            "ms_por_shard": tiempos,
+        }
+        minimo = self.n_shards if self.politica == "completo" else math.ceil(_MIN_RESPUESTA * self.n_shards)
+        if not parciales or len(parciales) < minimo:
+            raise TimeoutError(
+                f"Respondieron {len(parciales)} de {self.n_shards} shards "
+                f"(política '{self.politica}', límite {limite * 1000:.0f} ms)."
+            )
+
+        idx = np.concatenate([p[0] for p in parciales], axis=-1)
+        sc = np.concatenate([p[1] for p in parciales], axis=-1).astype(np.float32)
+        sel = top_k(sc, k)
+        return np.take_along_axis(idx, sel, axis=-1), np.take_along_axis(sc, sel, axis=-1)
@@ -0,0 +1,94 @@
+# ejercicios/rag_store.py
+import os
+import struct
+from pathlib import Path
+from typing import Sequence
+
+import numpy as np
+
+from .rag_retrieval import normalizar
+
+# Formato binario de vectores (.vec):
+#   cabecera de 64 bytes, little-endian:
+#     magic      8s   b"RAGVEC\0\0"
+#     version    u32  VERSION
+#     dtype      u32  1 = float32, 2 = float16
+#     filas      u64
+#     dim        u64
+#     flags      u32  bit 0: filas normalizadas (norma 1)
+#     (relleno hasta 64 bytes)
+#   matriz filas x dim en orden C, justo después de la cabecera.
+# Se abre con np.memmap: las consultas sólo tocan las páginas que usan y
+# varios procesos comparten la misma copia en la caché del sistema.
+MAGIC = b"RAGVEC\0\0"
+VERSION = 1
+HEADER_SIZE = 64
+_HEADER = struct.Struct("<8sIIQQI")
+
+_DTYPES = {1: np.dtype("<f4"), 2: np.dtype("<f2")}
+_CODIGOS = {v: k for k, v in _DTYPES.items()}
+
+FLAG_NORMALIZADO = 1
+
+
+def escribir_vectores(
+    ruta: Path,
+    vectores: Sequence[Sequence[float]] | np.ndarray,
+    dtype: str = "float32",
+    normalizado: bool = True,
+) -> None:
+    """
+    Escribe la matriz en formato .vec (de forma atómica).
+    Con normalizado=True las filas se guardan con norma 1.
+    """
+    dt = np.dtype(dtype).newbyteorder("<")
+    if dt not in _CODIGOS:
+        raise ValueError(f"Tipo no soportado para el almacén de vectores: {dtype}")
+    m = normalizar(vectores) if normalizado else np.atleast_2d(np.asarray(vectores, dtype=np.float32))
+    m = np.ascontiguousarray(m, dtype=dt)
+
+    cabecera = _HEADER.pack(
+        MAGIC, VERSION, _CODIGOS[dt], m.shape[0], m.shape[1],
+        FLAG_NORMALIZADO if normalizado else 0,
+    )
+    tmp = ruta.with_name(ruta.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(cabecera.ljust(HEADER_SIZE, b"\0"))
+        f.write(m.tobytes())
+    os.replace(tmp, ruta)
+
+
+def leer_cabecera(ruta: Path) -> dict:
+    with open(ruta, "rb") as f:
+        raw = f.read(HEADER_SIZE)
+    if len(raw) < HEADER_SIZE:
+        raise ValueError(f"Archivo de vectores truncado: {ruta}")
+    magic, version, codigo, filas, dim, flags = _HEADER.unpack_from(raw)
+    if magic != MAGIC:
+        raise ValueError(f"No es un archivo de vectores: {ruta}")
+    if version != VERSION:
+        raise ValueError(f"Versión de archivo de vectores no soportada ({version}): {ruta}")
+    if codigo not in _DTYPES:
+        raise ValueError(f"Tipo de dato desconocido ({codigo}) en {ruta}")
+    return {
+        "version": version,
+        "dtype": _DTYPES[codigo],
+        "filas": filas,
+        "dim": dim,
+        "normalizado": bool(flags & FLAG_NORMALIZADO),
+    }
+
+
+def abrir_vectores(ruta: Path) -> np.ndarray:
+    """
+    Abre un .vec como np.memmap de sólo lectura (no carga la matriz en memoria).
+    """
+    cab = leer_cabecera(ruta)
+    esperado = HEADER_SIZE + cab["filas"] * cab["dim"] * cab["dtype"].itemsize
+    if os.path.getsize(ruta) < esperado:
+        raise ValueError(f"Archivo de vectores truncado: {ruta}")
+    if cab["filas"] == 0:
+        return np.empty((0, cab["dim"]), dtype=cab["dtype"])
+    return np.memmap(
+        ruta, dtype=cab["dtype"], mode="r", offset=HEADER_SIZE, shape=(cab["filas"], cab["dim"])
+    )
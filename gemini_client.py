@@ -1,75 +1,164 @@
 # gemini_client.py
 import os
+from typing import AsyncIterator, Iterator
 from dotenv import load_dotenv
 import google.generativeai as genai
 
-# Fallback opcional: Groq (Llama 3)
-try:
-    from groq import Groq
-except Exception:
-    Groq = None
+from ejercicios.llm_circuito import es_error_cuota, interruptor
+from ejercicios.llm_clients import clientes
+from ejercicios.llm_limite import limitador
+from ejercicios.llm_tokens import estimar_tokens
 
 load_dotenv()
 
 GEMINI_KEY = os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY")
 DEFAULT_MODEL = os.getenv("LC_MODEL", "gemini-2.5-flash")
+# Endpoint alternativo (mismo que en llm_utils): va por transporte REST
+GEMINI_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT")
 
 if GEMINI_KEY:
-    genai.configure(api_key=GEMINI_KEY)
+    if GEMINI_ENDPOINT:
+        genai.configure(api_key=GEMINI_KEY, transport="rest", client_options={"api_endpoint": GEMINI_ENDPOINT})
+    else:
+        genai.configure(api_key=GEMINI_KEY)
 
-def _is_quota_error(e: Exception) -> bool:
-    s = str(e).lower()
-    return "429" in s or "quota" in s or "rate limit" in s or "resourceexhausted" in s
+def _texto(chunk) -> str:
+    try:
+        return chunk.text or ""
+    except Exception:  # trozo sin texto (p. ej. el último del stream)
+        return ""
+
+async def _juntar(deltas: AsyncIterator[str]) -> str:
+    return "".join([d async for d in deltas])
 
 # ------------ Fallback Groq ------------
 class _GroqOneShot:
     def __init__(self):
-        self.enabled = Groq is not None and bool(os.getenv("GROQ_API_KEY"))
+        self.enabled = clientes.groq_disponible(os.getenv("GROQ_API_KEY"))
         if self.enabled:
-            self.client = Groq(api_key=os.getenv("GROQ_API_KEY"))
             self.model = os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile")
 
-    def ask(self, prompt: str) -> str | None:
+    async def astream(self, prompt: str, parcial: str = "") -> AsyncIterator[str]:
+        """Trozos de la respuesta; con `parcial`, continúa una respuesta cortada."""
+        if not self.enabled:
+            return
+        circuito = interruptor("groq")
+        if not circuito.permitir():
+            raise RuntimeError(
+                f"Gemini y Groq sin cuota; se reintenta en {circuito.segundos_para_probar():.0f} s."
+            )
+        mensajes = [{"role": "user", "content": prompt}]
+        if parcial:
+            mensajes.append({"role": "assistant", "content": parcial})
+        try:
+            async with limitador("groq", self.model).reservar(estimar_tokens(prompt + parcial)):
+                stream = await clientes.groq(os.getenv("GROQ_API_KEY")).chat.completions.create(
+                    model=self.model,
+                    messages=mensajes,
+                    temperature=0.7,
+                    stream=True,
+                )
+                async for chunk in stream:
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if delta:
+                        yield delta
+        except BaseException as e:
+            circuito.fallo(e)
+            raise
+        circuito.exito()
+
+    async def aask(self, prompt: str) -> str | None:
         if not self.enabled:
             return None
-        r = self.client.chat.completions.create(
-            model=self.model,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.7,
-        )
-        return r.choices[0].message.content
+        return await _juntar(self.astream(prompt))
+
+    def ask(self, prompt: str) -> str | None:
+        return clientes.ejecutar(self.aask(prompt))
 
 _groq = _GroqOneShot()
 
+async def _astream_gemini(
+    model_name: str, enviar, prompt: str, prefijo_fallback: str, origen: dict | None = None
+) -> AsyncIterator[str]:
+    """Stream de Gemini (`enviar(prompt)` da los trozos de la respuesta) con circuito,
+    límites y fallback a Groq; si Gemini se corta por cuota a mitad, Groq sigue desde ahí.
+    Si responde Groq lo deja anotado en origen["proveedor"]."""
+    origen = origen if origen is not None else {}
+    async with clientes.semaforo():
+        circuito = interruptor("gemini")
+        if not circuito.permitir():
+            # Circuito abierto: directo a Groq, sin esperar otro 429
+            if not _groq.enabled:
+                raise RuntimeError(
+                    f"Gemini sin cuota; se reintenta en {circuito.segundos_para_probar():.0f} s."
+                )
+            origen["proveedor"] = "groq"
+            yield prefijo_fallback
+            async for delta in _groq.astream(prompt):
+                yield delta
+            return
+        emitido = []
+        try:
+            async with limitador("gemini", model_name).reservar(estimar_tokens(prompt)):
+                async for chunk in enviar(prompt):
+                    delta = _texto(chunk)
+                    if delta:
+                        emitido.append(delta)
+                        yield delta
+        except Exception as e:
+            circuito.fallo(e)
+            if es_error_cuota(e) and _groq.enabled:
+                origen["proveedor"] = "groq"
+                if not emitido:
+                    yield prefijo_fallback
+                async for delta in _groq.astream(prompt, "".join(emitido)):
+                    yield delta
+                return
+            raise
+        except BaseException as e:  # se dejó de leer el stream antes del final
+            circuito.fallo(e)
+            raise
+        circuito.exito()
+
 # ------------ Gemini (con fallback) ------------
 class GeminiOneShot:
-    """Modo sin memoria: pregunta-respuesta. Fallback automático si hay 429/quota."""
+    """Modo sin memoria: pregunta-respuesta. Fallback automático si hay 429/quota.
+    `stream`/`astream` entregan la respuesta por trozos; `aask` es la versión async."""
     def __init__(self, model_name: str = DEFAULT_MODEL):
         self.model_name = model_name
         if not GEMINI_KEY:
             # sin clave gemini -> intentar directo Groq
             self.model = None
         else:
-            self.model = genai.GenerativeModel(self.model_name)
+            self.model = clientes.gemini(self.model_name)
 
-    def ask(self, prompt: str) -> str:
+    async def astream(self, prompt: str) -> AsyncIterator[str]:
         if self.model is None:
-            alt = _groq.ask(prompt)
-            if alt:
-                return alt
-            raise RuntimeError("No hay clave de Gemini y no se configuró GROQ_API_KEY.")
-        try:
-            resp = self.model.generate_content(prompt)
-            return getattr(resp, "text", str(resp))
-        except Exception as e:
-            if _is_quota_error(e):
-                alt = _groq.ask(prompt)
-                if alt:
-                    return f"(fallback Groq)\n{alt}"
-            raise
+            if not _groq.enabled:
+                raise RuntimeError("No hay clave de Gemini y no se configuró GROQ_API_KEY.")
+            async for delta in _groq.astream(prompt):
+                yield delta
+            return
+
+        def _enviar(p: str):
+            return clientes.generar(self.model_name, p)
+
+        async for delta in _astream_gemini(self.model_name, _enviar, prompt, "(fallback Groq)\n"):
+            yield delta
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        return clientes.iterar(self.astream(prompt))
+
+    async def aask(self, prompt: str) -> str:
+        return await _juntar(self.astream(prompt))
+
+    def ask(self, prompt: str) -> str:
+        return clientes.ejecutar(self.aask(prompt))
 
 class GeminiChatSession:
-    """Chat con 'memoria'. Fallback a Groq si Gemini tira 429."""
+    """Chat con 'memoria'. Fallback a Groq si Gemini tira 429.
+    `send_stream`/`astream` entregan la respuesta por trozos y `asend` es la
+    versión async; una sesión atiende un mensaje a la vez."""
     def __init__(self, model_name: str = DEFAULT_MODEL, limit_turns: int | None = None):
         self.model_name = model_name
         self.limit_turns = limit_turns
@@ -78,28 +167,56 @@ class GeminiChatSession:
 
     def _new_chat(self):
         if GEMINI_KEY:
-            self.model = genai.GenerativeModel(self.model_name)
+            self.model = clientes.gemini(self.model_name)
             self.chat = self.model.start_chat(history=[])
         else:
             self.model = None
             self.chat = None
         self.turns = 0
 
-    def send(self, prompt: str) -> str:
+    async def astream(self, prompt: str) -> AsyncIterator[str]:
         if self.limit_turns is not None and self.turns >= self.limit_turns:
             self._new_chat()
         if self.chat is None:
-            alt = _groq.ask(prompt)
-            if alt:
-                return alt
-            raise RuntimeError("No hay clave de Gemini y no se configuró GROQ_API_KEY.")
+            if not _groq.enabled:
+                raise RuntimeError("No hay clave de Gemini y no se configuró GROQ_API_KEY.")
+            async for delta in _groq.astream(prompt):
+                yield delta
+            return
+
+        def _enviar(p: str):
+            return clientes.enviar_chat(self.chat, self.model_name, p)
+
+        historia = list(self.chat.history)
+        origen = {"proveedor": "gemini"}
+        piezas = []
+        completo = False
         try:
-            resp = self.chat.send_message(prompt)
-            self.turns += 1
-            return getattr(resp, "text", str(resp))
-        except Exception as e:
-            if _is_quota_error(e):
-                alt = _groq.ask(prompt)
-                if alt:
-                    return f"\n{alt}"
-            raise
+            async for delta in _astream_gemini(self.model_name, _enviar, prompt, "\n", origen):
+                piezas.append(delta)
+                yield delta
+            completo = True
+        finally:
+            if not completo or origen["proveedor"] != "gemini":
+                self._reponer_historia(historia, prompt, "".join(piezas).strip() if completo else "")
+        self.turns += 1
+
+    def _reponer_historia(self, historia: list, prompt: str, respuesta: str):
+        """Tras un stream de Gemini cortado (429, error o abandonado) el chat queda con
+        una respuesta a medias y ya no acepta mensajes: se vuelve a la historia previa
+        (como chat.rewind()) y, si respondió Groq, se agrega ese turno."""
+        if respuesta:
+            historia = historia + [
+                {"role": "user", "parts": [prompt]},
+                {"role": "model", "parts": [respuesta]},
+            ]
+        self.chat.history = historia
+
+    def send_stream(self, prompt: str) -> Iterator[str]:
+        return clientes.iterar(self.astream(prompt))
+
+    async def asend(self, prompt: str) -> str:
+        return await _juntar(self.astream(prompt))
+
+    def send(self, prompt: str) -> str:
+        return clientes.ejecutar(self.asend(prompt))
@@ -19,6 +19,7 @@ from ejercicios.ej5_varios_pasos import run_ej5
 from ejercicios.ej6_memoria import run_ej6
 from ejercicios.ej7_persistencia import run_ej7
 from ejercicios.ej8_rag import run_ej8
+from ejercicios.llm_utils import token_listener
 
 
 # =========================
@@ -27,6 +28,7 @@ from ejercicios.ej8_rag import run_ej8
 class TaskWorker(QThread):
     done = pyqtSignal(str)
     failed = pyqtSignal(str)
+    partial = pyqtSignal(str)  # trozos de texto a medida que el modelo los genera
 
     def __init__(self, fn, *args, **kwargs):
         super().__init__()
@@ -34,7 +36,8 @@ class TaskWorker(QThread):
 
     def run(self):
         try:
-            out = self.fn(*self.args, **self.kwargs)
+            with token_listener(self.partial.emit):
+                out = self.fn(*self.args, **self.kwargs)
             self.done.emit(out if isinstance(out, str) else str(out))
         except Exception as e:
             self.failed.emit(str(e))
@@ -121,6 +124,7 @@ class Load_ventana_langchain(QtWidgets.QDialog):
         self.textEdit_8.setReadOnly(True)
 
         self._workers = []
+        self._streams = {}  # textEdit -> posición donde empieza la respuesta en curso
         self._ej8_pdf_path = None
         self.show()
 
@@ -209,7 +213,7 @@ class Load_ventana_langchain(QtWidgets.QDialog):
 
     def _on_ej8(self):
         pregunta = (self.lineEdit_8.text() or "").strip()
-        if not pregunta:
+        if not pregunta or self._ocupado(self.pushButton_13):
             return
         if not self._ej8_pdf_path or not os.path.exists(self._ej8_pdf_path):
             self._seleccionar_pdf()
@@ -219,16 +223,25 @@ class Load_ventana_langchain(QtWidgets.QDialog):
         self._append(self.textEdit_8, "Tú", pregunta)
         self._set_wait(self.pushButton_13, True)
         w = TaskWorker(run_ej8, pregunta, self._ej8_pdf_path)
+        w.partial.connect(lambda t: self._on_partial(self.textEdit_8, t))
         w.done.connect(lambda t: self._on_done(self.textEdit_8, self.pushButton_13, self.lineEdit_8, t))
         w.failed.connect(lambda e: self._on_err(self.textEdit_8, self.pushButton_13, e))
         self._start(w)
 
     # ---------- helpers de ejecución ----------
+    def _ocupado(self, btn):
+        # Mientras el worker del panel corre, su botón está deshabilitado: Enter
+        # en la caja de texto no debe lanzar otro sobre el mismo textEdit
+        return not btn.isEnabled()
+
     def _run_two_inputs(self, te, btn, line_a, line_b, fn, a, b):
+        if self._ocupado(btn):
+            return
         # Aquí quitamos [Contexto]/[Instrucción] y usamos Prompt 1 / Prompt 2
         self._append(te, "Tú", f"Prompt 1: {a}\nPrompt 2: {b}")
         self._set_wait(btn, True)
         w = TaskWorker(fn, a, b)
+        w.partial.connect(lambda t: self._on_partial(te, t))
         w.done.connect(lambda t: self._on_done(te, btn, None, t))
         w.failed.connect(lambda e: self._on_err(te, btn, e))
         self._start(w)
@@ -238,9 +251,12 @@ class Load_ventana_langchain(QtWidgets.QDialog):
             line_b.clear()
 
     def _run_one_input(self, te, btn, line, fn, txt):
+        if self._ocupado(btn):
+            return
         self._append(te, "Tú", txt)
         self._set_wait(btn, True)
         w = TaskWorker(fn, txt)
+        w.partial.connect(lambda t: self._on_partial(te, t))
         w.done.connect(lambda t: self._on_done(te, btn, line, t))
         w.failed.connect(lambda e: self._on_err(te, btn, e))
         self._start(w)
@@ -259,13 +275,35 @@ class Load_ventana_langchain(QtWidgets.QDialog):
         w.finished.connect(lambda: self._workers.remove(w))
         w.start()
 
+    def _on_partial(self, te, delta):
+        # Primer trozo: abre el párrafo del modelo; los siguientes se agregan al final
+        cur = te.textCursor()
+        if te not in self._streams:
+            te.append("<p><b>Modelo:</b></p>")
+            cur.movePosition(QtGui.QTextCursor.End)
+            cur.insertText(" ")
+            self._streams[te] = cur.position()
+        cur.movePosition(QtGui.QTextCursor.End)
+        cur.insertText(delta)
+        te.verticalScrollBar().setValue(te.verticalScrollBar().maximum())
+
     def _on_done(self, te, btn, line, txt):
-        self._append(te, "Modelo", txt)
+        inicio = self._streams.pop(te, None)
+        if inicio is None:
+            self._append(te, "Modelo", txt)
+        else:
+            # El resultado final reemplaza lo que se fue mostrando (puede venir formateado)
+            cur = te.textCursor()
+            cur.setPosition(inicio)
+            cur.movePosition(QtGui.QTextCursor.End, QtGui.QTextCursor.KeepAnchor)
+            cur.insertText(txt)
+            te.verticalScrollBar().setValue(te.verticalScrollBar().maximum())
         self._set_wait(btn, False)
         if line:
             line.clear()
 
     def _on_err(self, te, btn, err):
+        self._streams.pop(te, None)
         self._append(te, "Error", err)
         self._set_wait(btn, False)
 
@@ -1,8 +1,29 @@
 import sys
 from PyQt5 import QtWidgets, uic, QtCore, QtGui
-from PyQt5.QtCore import QPropertyAnimation
+from PyQt5.QtCore import QPropertyAnimation, QThread, pyqtSignal
 from gemini_client import GeminiOneShot, GeminiChatSession
 
+
+class StreamWorker(QThread):
+    """Recorre el stream de la respuesta en otro hilo y avisa cada trozo (partial)."""
+    partial = pyqtSignal(str)
+    done = pyqtSignal(str)
+    failed = pyqtSignal(str)
+
+    def __init__(self, stream_fn, prompt):
+        super().__init__()
+        self.stream_fn, self.prompt = stream_fn, prompt
+
+    def run(self):
+        try:
+            piezas = []
+            for delta in self.stream_fn(self.prompt):
+                piezas.append(delta)
+                self.partial.emit(delta)
+            self.done.emit("".join(piezas))
+        except Exception as e:
+            self.failed.emit(str(e))
+
 class Load_ventana_modelos_basicos(QtWidgets.QDialog):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -40,6 +61,7 @@ class Load_ventana_modelos_basicos(QtWidgets.QDialog):
         self.lineEdit_3.returnPressed.connect(self._ask_limited)
         self.textEdit_3.setReadOnly(True)
 
+        self._workers = []
         self.show()
 
     # =====================
@@ -47,55 +69,76 @@ class Load_ventana_modelos_basicos(QtWidgets.QDialog):
     # =====================
     def _ask_basic(self):
         prompt = (self.lineEdit.text() or "").strip()
-        if not prompt:
+        if not prompt or self._ocupado(self.pushButton_6):
             return
         self._append_pair(self.textEdit, "Tú", prompt)
-        self._set_waiting(self.pushButton_6, True)
-        try:
-            answer = self.ai_basic.ask(prompt)
-            self._append_pair(self.textEdit, "Gemini", answer)
-        except Exception as e:
-            self._append_pair(self.textEdit, "Error", str(e))
-        finally:
-            self._set_waiting(self.pushButton_6, False)
-            self.lineEdit.clear()
+        self._stream(self.textEdit, self.pushButton_6, self.lineEdit, self.ai_basic.stream, prompt)
 
     def _ask_history(self):
         prompt = (self.lineEdit_2.text() or "").strip()
-        if not prompt:
+        if not prompt or self._ocupado(self.pushButton_7):
             return
         self._append_pair(self.textEdit_2, "Tú", prompt)
-        self._set_waiting(self.pushButton_7, True)
-        try:
-            answer = self.ai_history.send(prompt)
-            self._append_pair(self.textEdit_2, "Gemini", answer)
-        except Exception as e:
-            self._append_pair(self.textEdit_2, "Error", str(e))
-        finally:
-            self._set_waiting(self.pushButton_7, False)
-            self.lineEdit_2.clear()
+        self._stream(self.textEdit_2, self.pushButton_7, self.lineEdit_2, self.ai_history.send_stream, prompt)
 
     def _ask_limited(self):
         """Chat con memoria que se reinicia cada 5 preguntas."""
         prompt = (self.lineEdit_3.text() or "").strip()
-        if not prompt:
+        if not prompt or self._ocupado(self.pushButton_8):
             return
         self._append_pair(self.textEdit_3, "Tú", prompt)
-        self._set_waiting(self.pushButton_8, True)
-        try:
-            remaining = 5 - self.ai_limited.turns if self.ai_limited.turns < 5 else 0
-            answer = self.ai_limited.send(prompt)
-            self._append_pair(self.textEdit_3, "Gemini", answer)
+        remaining = 5 - self.ai_limited.turns if self.ai_limited.turns < 5 else 0
+
+        def _avisar_reinicio():
             # Avisar cuando se reinició la memoria
             if self.ai_limited.turns == 1 and remaining == 0:
                 self._append_pair(self.textEdit_3, "Sistema", "Memoria reiniciada (se cumplieron 5 interacciones).")
-        except Exception as e:
-            self._append_pair(self.textEdit_3, "Error", str(e))
-        finally:
-            self._set_waiting(self.pushButton_8, False)
-            self.lineEdit_3.clear()
+
+        self._stream(self.textEdit_3, self.pushButton_8, self.lineEdit_3, self.ai_limited.send_stream, prompt,
+                     al_terminar=_avisar_reinicio)
+
+    # Streaming: la respuesta se va escribiendo mientras llega
+    def _stream(self, text_edit, button, line, stream_fn, prompt, al_terminar=None):
+        self._set_waiting(button, True)
+        line.clear()
+        w = StreamWorker(stream_fn, prompt)
+        inicio = {}
+
+        def _parcial(delta):
+            cur = text_edit.textCursor()
+            if not inicio:
+                text_edit.append("<p><b>Gemini:</b></p>")
+                cur.movePosition(QtGui.QTextCursor.End)
+                cur.insertText(" ")
+                inicio["pos"] = cur.position()
+            cur.movePosition(QtGui.QTextCursor.End)
+            cur.insertText(delta)
+            text_edit.verticalScrollBar().setValue(text_edit.verticalScrollBar().maximum())
+
+        def _terminar(answer):
+            if not inicio:
+                self._append_pair(text_edit, "Gemini", answer)
+            self._set_waiting(button, False)
+            if al_terminar is not None:
+                al_terminar()
+
+        def _fallar(err):
+            self._append_pair(text_edit, "Error", err)
+            self._set_waiting(button, False)
+
+        w.partial.connect(_parcial)
+        w.done.connect(_terminar)
+        w.failed.connect(_fallar)
+        self._workers.append(w)
+        w.finished.connect(lambda: self._workers.remove(w))
+        w.start()
 
     # Helpers de UI
+    def _ocupado(self, button: QtWidgets.QPushButton) -> bool:
+        # Con una respuesta en curso el botón está deshabilitado; Enter en la
+        # caja de texto se ignora hasta que termine (si no, se pisan los streams)
+        return not button.isEnabled()
+
     def _append_pair(self, text_edit: QtWidgets.QTextEdit, speaker: str, text: str):
         html = f"<p><b>{speaker}:</b> {self._escape(text)}</p>"
         text_edit.append(html)
@@ -0,0 +1,134 @@
+# tests/conftest.py
+import importlib
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, Iterator
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+
+class EndpointFalso:
+    """
+    Servidor HTTP local que imita el API REST de Gemini (embedContent,
+    batchEmbedContents y streamGenerateContent). Guarda cada petición y
+    cuántas hubo en vuelo a la vez como máximo.
+    - el vector de un texto es [largo del texto, 1.0];
+    - la respuesta a un prompt es "eco: <último mensaje>", en dos trozos;
+    - un prompt que empieza con "falla" recibe un 404.
+    """
+
+    def __init__(self, demora_s: float = 0.05):
+        self.demora_s = demora_s
+        self.peticiones: list = []
+        self.en_vuelo = 0
+        self.max_en_vuelo = 0
+        self._lock = threading.Lock()
+        self._servidor = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._servidor.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._servidor.server_address[1]}"
+
+    def reiniciar(self) -> None:
+        with self._lock:
+            self.peticiones.clear()
+            self.max_en_vuelo = 0
+
+    def _responder(self, metodo: str, cuerpo: Dict[str, Any]) -> Any:
+        if metodo == "embedContent":
+            texto = cuerpo["content"]["parts"][0]["text"]
+            return {"embedding": {"values": [float(len(texto)), 1.0]}}
+        if metodo == "batchEmbedContents":
+            return {
+                "embeddings": [
+                    {"values": [float(len(r["content"]["parts"][0]["text"])), 1.0]} for r in cuerpo["requests"]
+                ]
+            }
+        if metodo == "streamGenerateContent":
+            ultimo = cuerpo["contents"][-1]["parts"][0]["text"]
+            if ultimo.startswith("falla"):
+                return None
+            trozos = [("eco: ", None), (ultimo, "STOP")]
+            return [
+                {"candidates": [{"content": {"role": "model", "parts": [{"text": t}]}, **({"finishReason": f} if f else {})}]}
+                for t, f in trozos
+            ]
+        return None
+
+    def _handler(self):
+        falso = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args: Any) -> None:
+                pass
+
+            def do_POST(self) -> None:
+                metodo = self.path.split("?")[0].rsplit(":", 1)[-1]
+                cuerpo = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+                with falso._lock:
+                    falso.peticiones.append((metodo, cuerpo))
+                    falso.en_vuelo += 1
+                    falso.max_en_vuelo = max(falso.max_en_vuelo, falso.en_vuelo)
+                try:
+                    time.sleep(falso.demora_s)
+                    respuesta = falso._responder(metodo, cuerpo)
+                finally:
+                    with falso._lock:
+                        falso.en_vuelo -= 1
+                datos = json.dumps(respuesta).encode("utf-8")
+                self.send_response(404 if respuesta is None else 200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(datos)))
+                self.end_headers()
+                self.wfile.write(datos)
+
+        return _Handler
+
+    def iniciar(self) -> None:
+        threading.Thread(target=self._servidor.serve_forever, daemon=True).start()
+
+    def detener(self) -> None:
+        self._servidor.shutdown()
+        self._servidor.server_close()
+
+
+@pytest.fixture(scope="session")
+def _endpoint_sesion() -> Iterator[EndpointFalso]:
+    pytest.importorskip("google.generativeai")
+    falso = EndpointFalso()
+    falso.iniciar()
+    previas = {k: os.environ.get(k) for k in ("GEMINI_API_KEY", "GEMINI_API_ENDPOINT", "LLM_CACHE")}
+    os.environ["GEMINI_API_KEY"] = "clave-de-prueba"
+    os.environ["GEMINI_API_ENDPOINT"] = falso.url
+    os.environ["LLM_CACHE"] = "0"
+    try:
+        yield falso
+    finally:
+        falso.detener()
+        for k, v in previas.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+
+
+@pytest.fixture
+def endpoint_gemini(_endpoint_sesion: EndpointFalso) -> EndpointFalso:
+    """
+    Endpoint falso de Gemini, ya configurado en llm_utils (transporte REST).
+    """
+    _endpoint_sesion.reiniciar()
+    return _endpoint_sesion
+
+
+@pytest.fixture
+def llm_utils(endpoint_gemini: EndpointFalso):
+    # Se (re)importa con el endpoint falso en el entorno: la configuración se lee al importar
+    import ejercicios.llm_utils as modulo
+
+    return importlib.reload(modulo)
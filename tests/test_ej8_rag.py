@@ -0,0 +1,37 @@
+# tests/test_ej8_rag.py
+import importlib
+import os
+
+import pytest
+
+
+@pytest.fixture
+def ej8(llm_utils, monkeypatch):
+    modulo = importlib.reload(importlib.import_module("ejercicios.ej8_rag"))
+    local = llm_utils.get_embedding_backend("local")
+    monkeypatch.setattr(modulo, "_backends", lambda: [local])
+    return modulo
+
+
+def test_documento_preparado_se_reusa_mientras_no_cambie(ej8, monkeypatch, tmp_path):
+    local = ej8._backends()[0]
+    pdf = tmp_path / "doc.pdf"
+    pdf.write_bytes(b"%PDF-1.4 uno")
+    hashes, lecturas = [], []
+    monkeypatch.setattr(ej8, "hash_archivo", lambda p: hashes.append(p) or f"h{len(hashes)}")
+
+    def _cargar(clave):
+        lecturas.append(clave)
+        return {"meta": {"embed_backend": local.nombre}, "chunks": [], "vectores": None}
+
+    monkeypatch.setattr(ej8, "cargar_indice", _cargar)
+
+    a = ej8._preparar_documento(str(pdf))
+    assert ej8._preparar_documento(str(pdf)) is a
+    assert len(hashes) == len(lecturas) == 1
+
+    pdf.write_bytes(b"%PDF-1.4 otro contenido")
+    os.utime(pdf, ns=(pdf.stat().st_atime_ns, pdf.stat().st_mtime_ns + 10**9))
+    b = ej8._preparar_documento(str(pdf))
+    assert b is not a and b["pdf_hash"] == "h2"
+    assert len(hashes) == len(lecturas) == 2
@@ -0,0 +1,33 @@
+# tests/test_embed_lotes.py
+
+
+def _textos(n):
+    # Largos distintos: el vector falso de cada texto es [largo, 1.0]
+    return ["x" * (i + 1) for i in range(n)]
+
+
+def test_lotes_del_tamano_pedido_y_en_orden(llm_utils, endpoint_gemini):
+    textos = _textos(250)
+    embs = llm_utils.embed_texts(textos, batch_size=100, max_concurrency=4)
+
+    assert embs == [[float(len(t)), 1.0] for t in textos]
+    lotes = [len(c["requests"]) for m, c in endpoint_gemini.peticiones]
+    assert sorted(lotes) == [50, 100, 100]
+
+
+def test_limite_de_concurrencia(llm_utils, endpoint_gemini):
+    llm_utils.embed_texts(_textos(60), batch_size=10, max_concurrency=2)
+    assert len(endpoint_gemini.peticiones) == 6
+    assert endpoint_gemini.max_en_vuelo == 2
+
+    endpoint_gemini.reiniciar()
+    llm_utils.embed_texts(_textos(30), batch_size=10, max_concurrency=1)
+    assert endpoint_gemini.max_en_vuelo == 1
+
+
+def test_saltos_de_linea_y_lista_vacia(llm_utils, endpoint_gemini):
+    assert llm_utils.embed_texts([]) == []
+    assert endpoint_gemini.peticiones == []
+
+    llm_utils.embed_texts(["a\nb"])
+    assert endpoint_gemini.peticiones[0][1]["requests"][0]["content"]["parts"][0]["text"] == "a b"
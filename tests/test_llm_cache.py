@@ -0,0 +1,74 @@
+# tests/test_llm_cache.py
+import asyncio
+
+from ejercicios.llm_cache import CacheLLM
+
+
+class Reloj:
+    def __init__(self):
+        self.t = 1000.0
+
+    def __call__(self) -> float:
+        return self.t
+
+
+def _cache(tmp_path, **kwargs):
+    return CacheLLM(ruta=tmp_path / "cache.sqlite3", activa=True, **kwargs)
+
+
+def test_ttl_vence_las_respuestas(tmp_path):
+    reloj = Reloj()
+    cache = _cache(tmp_path, ttl_s=60, reloj=reloj)
+    cache.guardar("k", "gemini", "gemini", "m", "hola")
+
+    reloj.t += 59
+    assert cache.buscar("k", "gemini") == "hola"
+    reloj.t += 2
+    assert cache.buscar("k", "gemini") is None
+    assert cache.estadisticas()["tamano"] == 0  # la vencida se borra al buscarla
+
+
+def test_lru_expulsa_las_menos_usadas(tmp_path):
+    reloj = Reloj()
+    cache = _cache(tmp_path, max_bytes=10, reloj=reloj)
+    for i, clave in enumerate(("a", "b")):
+        reloj.t += 1
+        cache.guardar(clave, "gemini", "gemini", "m", f"{i}" * 4)
+    reloj.t += 1
+    assert cache.buscar("a", "gemini") == "0000"  # "a" pasa a ser la más reciente
+
+    reloj.t += 1
+    cache.guardar("c", "gemini", "gemini", "m", "2222")  # 12 bytes > 10: sale "b"
+    assert cache.buscar("b", "gemini") is None
+    assert cache.buscar("a", "gemini") == "0000"
+    assert cache.buscar("c", "gemini") == "2222"
+    assert cache.estadisticas()["bytes"] == 8
+
+
+def test_respuestas_del_fallback_separadas(tmp_path):
+    cache = _cache(tmp_path)
+    cache.guardar("k", "gemini", "groq", "m", "de groq")
+    assert cache.buscar("k", "gemini") is None
+
+    mezcla = _cache(tmp_path, mezclar_fallback=True)
+    mezcla.guardar("k", "gemini", "groq", "m", "de groq")
+    assert mezcla.buscar("k", "gemini") == "de groq"
+    # Una caché que no mezcla tampoco sirve lo que guardó otra que sí
+    assert cache.buscar("k", "gemini") is None
+
+
+def test_acceso_async(tmp_path):
+    cache = _cache(tmp_path)
+
+    async def _ida_y_vuelta():
+        await cache.aguardar("k", "gemini", "gemini", "m", "hola")
+        return await cache.abuscar("k", "gemini")
+
+    assert asyncio.run(_ida_y_vuelta()) == "hola"
+
+
+def test_astream_llm_usa_la_cache(llm_utils, endpoint_gemini, tmp_path, monkeypatch):
+    monkeypatch.setattr(llm_utils, "cache_llm", _cache(tmp_path))
+    assert llm_utils.call_llm("hola") == "eco: hola"
+    assert llm_utils.call_llm("hola") == "eco: hola"
+    assert len(endpoint_gemini.peticiones) == 1
@@ -0,0 +1,93 @@
+# tests/test_llm_circuito.py
+import pytest
+
+from ejercicios.llm_circuito import ABIERTO, CERRADO, SEMIABIERTO, Interruptor, espera_sugerida
+
+
+class Reloj:
+    def __init__(self):
+        self.t = 1000.0
+
+    def __call__(self) -> float:
+        return self.t
+
+
+class Error429(Exception):
+    def __init__(self, mensaje="429 quota exceeded", cabeceras=None):
+        super().__init__(mensaje)
+        if cabeceras is not None:
+            self.response = type("Respuesta", (), {"headers": cabeceras})()
+
+
+def test_cerrado_abierto_semiabierto_cerrado():
+    reloj = Reloj()
+    c = Interruptor("prueba", fallos=3, espera_s=30, reloj=reloj)
+
+    for _ in range(2):
+        assert c.permitir()
+        c.fallo(Error429())
+    assert c.estado == CERRADO
+    c.fallo(ValueError("petición inválida"))  # no es de cuota: no cuenta
+    assert c.estado == CERRADO
+    c.fallo(Error429())
+    assert c.estado == ABIERTO and c.aperturas == 1
+    assert not c.permitir() and c.rechazadas == 1
+    assert c.segundos_para_probar() == pytest.approx(30)
+
+    reloj.t += 30
+    assert c.permitir()
+    assert c.estado == SEMIABIERTO
+    c.exito()
+    assert c.estado == CERRADO and c.metricas()["errores_cuota_seguidos"] == 0
+
+
+def test_sondeo_fallido_vuelve_a_abrir():
+    reloj = Reloj()
+    c = Interruptor("prueba", fallos=1, espera_s=10, reloj=reloj)
+    c.fallo(Error429())
+    reloj.t += 10
+    assert c.permitir()
+    c.fallo(Error429())
+    assert c.estado == ABIERTO and c.aperturas == 2
+    assert c.segundos_para_probar() == pytest.approx(10)
+
+
+def test_semiabierto_deja_pasar_una_sola_prueba():
+    reloj = Reloj()
+    c = Interruptor("prueba", fallos=1, espera_s=10, reloj=reloj)
+    c.fallo(Error429())
+    reloj.t += 10
+
+    assert c.permitir()
+    assert not c.permitir() and not c.permitir()
+    assert c.sondeos == 1 and c.rechazadas == 2
+    # Un error que no es de cuota libera la prueba sin cerrar ni reabrir
+    c.fallo(ValueError("red"))
+    assert c.estado == SEMIABIERTO
+    assert c.permitir() and c.sondeos == 2
+
+
+def test_retry_after_alarga_la_espera():
+    reloj = Reloj()
+    c = Interruptor("prueba", fallos=1, espera_s=5, reloj=reloj)
+    c.fallo(Error429("429 Please retry in 42.5s."))
+    assert c.segundos_para_probar() == pytest.approx(42.5)
+    reloj.t += 42
+    assert not c.permitir()
+    reloj.t += 0.5
+    assert c.permitir()
+
+
+@pytest.mark.parametrize(
+    "error, esperado",
+    [
+        (Error429("429 Please retry in 17.4s."), 17.4),
+        (Error429("429 quota\nretry_delay {\n  seconds: 17\n}"), 17.0),
+        (Error429("Retry after 250ms"), 0.25),
+        (Error429(cabeceras={"retry-after": "20"}), 20.0),
+        (Error429(cabeceras={"retry-after": "mañana"}), None),
+        (Error429("429 sin pista"), None),
+    ],
+)
+def test_espera_sugerida(error, esperado):
+    assert espera_sugerida(error) == (pytest.approx(esperado) if esperado is not None else None)
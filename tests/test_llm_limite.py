@@ -0,0 +1,154 @@
+# tests/test_llm_limite.py
+import asyncio
+import threading
+
+import pytest
+
+from ejercicios.llm_limite import ConcurrenciaAdaptativa, Cubeta, Limitador
+
+
+class RelojFalso:
+    """
+    Reloj manual: dormir(s) no espera, sólo adelanta el reloj y anota la espera.
+    """
+
+    def __init__(self):
+        self.t = 1000.0
+        self.esperas = []
+
+    def __call__(self) -> float:
+        return self.t
+
+    async def dormir(self, s: float) -> None:
+        self.esperas.append(s)
+        self.t += s
+
+    async def anotar(self, s: float) -> None:
+        # Como dormir, pero sin que pase el tiempo (llegadas simultáneas)
+        self.esperas.append(s)
+
+
+def test_cubeta_se_rellena_con_el_tiempo():
+    reloj = RelojFalso()
+    cubeta = Cubeta(60, reloj=reloj, dormir=reloj.dormir)  # 1 unidad por segundo
+
+    assert asyncio.run(cubeta.tomar(60)) == 0.0
+    assert asyncio.run(cubeta.tomar(1)) == pytest.approx(1.0)
+    reloj.t += 30
+    assert asyncio.run(cubeta.tomar(30)) == 0.0
+    reloj.t += 1000
+    cubeta._rellenar(reloj())
+    assert cubeta.disponible == 60  # nunca pasa de la capacidad
+
+
+def test_cubeta_atiende_en_orden_de_llegada():
+    reloj = RelojFalso()
+    cubeta = Cubeta(60, reloj=reloj, dormir=reloj.anotar)
+
+    async def _varios():
+        await cubeta.tomar(60)
+        return await asyncio.gather(*(cubeta.tomar(10) for _ in range(3)))
+
+    # Llegan juntos: cada uno espera detrás de los anteriores
+    assert asyncio.run(_varios()) == pytest.approx([10.0, 20.0, 30.0])
+
+
+def test_cubeta_timeout_sin_descontar():
+    reloj = RelojFalso()
+    cubeta = Cubeta(60, reloj=reloj, dormir=reloj.dormir)
+    asyncio.run(cubeta.tomar(60))
+
+    with pytest.raises(TimeoutError):
+        asyncio.run(cubeta.tomar(10, limite=reloj() + 5))
+    assert reloj.esperas == []
+    assert cubeta.disponible == pytest.approx(0.0)
+    assert asyncio.run(cubeta.tomar(5, limite=reloj() + 5)) == pytest.approx(5.0)
+
+
+def test_aimd_sube_con_exitos_y_baja_con_429():
+    c = ConcurrenciaAdaptativa(inicial=4, maximo=5, minimo=1)
+
+    async def _llamada(limitado):
+        await c.entrar()
+        c.salir(limitado)
+
+    asyncio.run(_llamada(False))
+    assert c.limite == pytest.approx(4.25)
+    asyncio.run(_llamada(True))
+    assert c.limite == pytest.approx(2.125)
+    asyncio.run(_llamada(None))  # cancelada: no cambia
+    assert c.limite == pytest.approx(2.125)
+    for _ in range(4):
+        asyncio.run(_llamada(True))
+    assert c.limite == 1.0
+    for _ in range(50):
+        asyncio.run(_llamada(False))
+    assert c.limite == 5.0
+    assert c.en_vuelo == 0
+
+
+def test_concurrencia_en_orden_de_llegada_y_timeout():
+    c = ConcurrenciaAdaptativa(inicial=1, maximo=1)
+    orden = []
+
+    async def _esperar(i):
+        await c.entrar()
+        orden.append(i)
+        await asyncio.sleep(0)
+        c.salir(None)
+
+    async def _escenario():
+        await c.entrar()
+        tareas = [asyncio.create_task(_esperar(i)) for i in range(5)]
+        await asyncio.sleep(0.01)
+        assert c.esperando() == 5
+        with pytest.raises(TimeoutError):
+            await c.entrar(limite=0)  # ya vencido: se rinde sin quedarse en la cola
+        cancelada = asyncio.create_task(_esperar(99))
+        await asyncio.sleep(0.01)
+        cancelada.cancel()
+        await asyncio.sleep(0.01)
+        assert c.esperando() == 5
+        c.salir(None)
+        await asyncio.gather(*tareas)
+
+    asyncio.run(_escenario())
+    assert orden == [0, 1, 2, 3, 4]
+    assert c.en_vuelo == 0 and c.esperando() == 0
+
+
+def test_concurrencia_entre_event_loops():
+    c = ConcurrenciaAdaptativa(inicial=1, maximo=1)
+    asyncio.run(c.entrar())
+    entro = threading.Event()
+
+    def _otro_hilo():
+        async def _esperar():
+            await c.entrar()
+            entro.set()
+            c.salir(None)
+
+        asyncio.run(_esperar())
+
+    hilo = threading.Thread(target=_otro_hilo)
+    hilo.start()
+    assert not entro.wait(0.1)
+    c.salir(None)  # libera desde este hilo: despierta al loop del otro
+    hilo.join(2)
+    assert entro.is_set() and c.en_vuelo == 0
+
+
+def test_rpm_y_tpm_opcionales(monkeypatch):
+    lim = Limitador("prueba", "modelo")
+    assert lim.peticiones is None and lim.tokens is None
+
+    monkeypatch.setenv("LLM_RPM_PRUEBA", "30")
+    lim = Limitador("prueba", "modelo")
+    assert lim.peticiones.capacidad == 30 and lim.tokens is None
+
+    async def _reservar():
+        async with lim.reservar(100):
+            pass
+
+    asyncio.run(_reservar())
+    assert lim.metricas()["llamadas"] == 1
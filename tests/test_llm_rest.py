@@ -0,0 +1,56 @@
+# tests/test_llm_rest.py
+import asyncio
+import importlib
+
+import pytest
+
+
+def test_embeddings_por_rest(llm_utils, endpoint_gemini):
+    assert llm_utils.embed_text("hola") == [4.0, 1.0]
+    assert llm_utils.embed_texts(["a", "bb", "ccc"]) == [[1.0, 1.0], [2.0, 1.0], [3.0, 1.0]]
+    assert [m for m, _ in endpoint_gemini.peticiones] == ["embedContent", "batchEmbedContents"]
+
+
+def test_llm_por_rest(llm_utils, endpoint_gemini):
+    assert llm_utils.call_llm("hola", use_cache=False) == "eco: hola"
+    assert list(llm_utils.stream_llm("uno", use_cache=False)) == ["eco: ", "uno"]
+    assert [m for m, _ in endpoint_gemini.peticiones] == ["streamGenerateContent"] * 2
+
+
+def test_async_por_rest_en_varios_event_loops(llm_utils, endpoint_gemini):
+    # Cada asyncio.run es un event loop nuevo; las versiones síncronas usan el de fondo
+    assert asyncio.run(llm_utils.acall_llm("uno", use_cache=False)) == "eco: uno"
+    assert asyncio.run(llm_utils.aembed_texts(["abcd"])) == [[4.0, 1.0]]
+    assert llm_utils.call_llm("dos", use_cache=False) == "eco: dos"
+    assert asyncio.run(llm_utils.abatch(["x", "y"], use_cache=False)) == ["eco: x", "eco: y"]
+
+
+def test_gemini_client_por_rest(llm_utils, endpoint_gemini):
+    pytest.importorskip("dotenv")
+    gemini_client = importlib.reload(importlib.import_module("gemini_client"))
+
+    assert gemini_client.GeminiOneShot().ask("uno") == "eco: uno"
+    chat = gemini_client.GeminiChatSession()
+    assert chat.send("hola") == "eco: hola"
+    assert asyncio.run(chat.asend("otra")) == "eco: otra"
+    # El segundo mensaje lleva la historia del primero
+    assert len(endpoint_gemini.peticiones[-1][1]["contents"]) == 3
+
+
+def test_abatch_grande_sin_perder_respuestas(llm_utils, endpoint_gemini):
+    prompts = [f"p{i}" for i in range(300)]
+    respuestas = asyncio.run(llm_utils.abatch(prompts, use_cache=False))
+
+    assert respuestas == [f"eco: {p}" for p in prompts]
+    # Por defecto no hay más llamadas en vuelo que la concurrencia máxima del limitador
+    tope = llm_utils.limitador("gemini", llm_utils._DEFAULT_LLM_MODEL).concurrencia.maximo
+    assert endpoint_gemini.max_en_vuelo <= tope
+
+
+def test_abatch_conserva_las_demas_respuestas_si_una_falla(llm_utils, endpoint_gemini):
+    with pytest.raises(RuntimeError):
+        llm_utils.batch(["uno", "falla", "dos"], use_cache=False)
+
+    respuestas = llm_utils.batch(["uno", "falla", "dos"], use_cache=False, return_exceptions=True)
+    assert respuestas[0] == "eco: uno" and respuestas[2] == "eco: dos"
+    assert isinstance(respuestas[1], RuntimeError)
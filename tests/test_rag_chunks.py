@@ -0,0 +1,69 @@
+# tests/test_rag_chunks.py
+import random
+
+import pytest
+
+from ejercicios.rag_chunks import iterar_chunks
+
+
+def _chunk_text(text, chunk_size=900, overlap=200):
+    # Troceador anterior (por lista de palabras), como referencia
+    words = text.replace("\r", " ").split()
+    chunks = []
+    start = 0
+    n = len(words)
+    while start < n:
+        end = min(n, start + chunk_size)
+        chunks.append(" ".join(words[start:end]))
+        if end == n:
+            break
+        start = max(0, end - overlap)
+    return chunks
+
+
+def _texto(n_palabras, semilla=0, puntuacion=True):
+    rng = random.Random(semilla)
+    palabras = []
+    for i in range(n_palabras):
+        p = "".join(rng.choice("abcdefghij") for _ in range(rng.randint(1, 8)))
+        if puntuacion and rng.random() < 0.1:
+            p += rng.choice(".!?;:")
+        palabras.append(p)
+    separadores = [rng.choice([" ", "  ", "\n", "\t", "\r\n"]) for _ in palabras]
+    return "".join(p + s for p, s in zip(palabras, separadores))
+
+
+@pytest.mark.parametrize(
+    "n, chunk_size, overlap",
+    [(0, 10, 2), (5, 10, 2), (10, 10, 2), (11, 10, 2), (1000, 220, 50), (997, 37, 0), (500, 10, 9)],
+)
+def test_mismos_chunks_que_el_troceador_anterior(n, chunk_size, overlap):
+    texto = _texto(n)
+    chunks = [" ".join(texto[a:b].split()) for a, b in iterar_chunks([texto], chunk_size, overlap)]
+    assert chunks == _chunk_text(texto, chunk_size, overlap)
+
+
+def test_piezas_dan_las_mismas_posiciones_que_el_texto_entero():
+    texto = _texto(800, semilla=1)
+    cortes = sorted({i for i, c in enumerate(texto) if c == "\n"})[::7]
+    piezas = [texto[a:b] for a, b in zip([0] + cortes, cortes + [len(texto)])]
+    assert list(iterar_chunks(piezas, 60, 15)) == list(iterar_chunks([texto], 60, 15))
+
+
+@pytest.mark.parametrize("overlap", [0, 5, 19, 20, 50])
+@pytest.mark.parametrize("puntuacion", [True, False])
+def test_con_oraciones_la_ventana_siempre_avanza(overlap, puntuacion):
+    texto = _texto(2000, semilla=2, puntuacion=puntuacion)
+    spans = list(iterar_chunks([texto], 20, overlap, oraciones=True))
+
+    assert spans
+    assert all(a[0] < b[0] and a[1] < b[1] for a, b in zip(spans, spans[1:]))
+    assert spans[0][0] == 0 and spans[-1][1] == len(texto.rstrip())
+
+
+def test_oraciones_en_cada_palabra_con_overlap_grande():
+    # Todo fin de oración cae dentro del overlap: aun así hay que avanzar
+    texto = " ".join(f"p{i}." for i in range(300))
+    spans = list(iterar_chunks([texto], 10, 10, oraciones=True))
+    assert all(a[0] < b[0] and a[1] < b[1] for a, b in zip(spans, spans[1:]))
+    assert spans[-1][1] == len(texto)
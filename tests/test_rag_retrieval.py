@@ -0,0 +1,21 @@
+# tests/test_rag_retrieval.py
+import numpy as np
+
+from ejercicios.rag_retrieval import IndiceExacto, normalizar
+
+
+def test_exacto_float16_por_bloques(tmp_path):
+    rng = np.random.default_rng(0)
+    vectores = normalizar(rng.normal(size=(1000, 16)))
+    disco = np.memmap(tmp_path / "v.f16", dtype=np.float16, mode="w+", shape=vectores.shape)
+    disco[:] = vectores
+    consultas = rng.normal(size=(3, 16))
+
+    ref = IndiceExacto(vectores, normalizado=True)
+    ind = IndiceExacto(disco, normalizado=True, bloque=128)
+    s = ind.puntajes(consultas)
+
+    assert s.dtype == np.float32 and s.shape == (3, 1000)
+    np.testing.assert_allclose(s, ref.puntajes(consultas), atol=1e-2)
+    assert ind.puntajes(consultas[0]).shape == (1000,)
+    assert ind.buscar(consultas, 5)[0].shape == (3, 5)